@@ -0,0 +1,207 @@
+import asyncio
+import copy
+from types import SimpleNamespace
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from graphene.utils.str_converters import to_snake_case
+from graphql import GraphQLError
+from graphql.error import format_error
+from graphql.execution import execute
+from graphql.execution.values import get_argument_values, get_variable_values
+from graphql.language import ast
+from graphql.utils.get_operation_ast import get_operation_ast
+
+from social.cache import get_post
+from users.auth import get_user_by_token
+from utils.complexity import CostAnalyzer
+from utils.persisted import InvalidDocument, document_cache
+from .schema import Subscription, event_schema, schema
+
+# subscriptions-transport-ws protocol (Apollo's `graphql-ws` subprotocol)
+SUBPROTOCOL = "graphql-ws"
+
+
+class ActiveSubscription:
+    """A started subscription: its document (rewritten as a query) and channel layer groups."""
+
+    def __init__(self, document_ast, operation_name, variables, groups):
+        self.document_ast = document_ast
+        self.operation_name = operation_name
+        self.variables = variables
+        self.groups = groups
+
+
+def _token(payload):
+    # `connection_init` payload: {"authToken": "<jwt>"} or {"Authorization": "JWT <jwt>"}
+    token = payload.get("authToken")
+    if token:
+        return token
+    header = payload.get("Authorization") or payload.get("authorization") or ""
+    _, _, token = header.partition(" ")
+    return token or None
+
+
+# The subscription operation as a query, so an event executes against `event_schema`
+def _as_query(document_ast, operation):
+    query = copy.copy(operation)
+    query.operation = "query"
+    definitions = [query if definition is operation else definition for definition in document_ast.definitions]
+    return ast.Document(definitions=definitions)
+
+
+class GraphQLSubscriptionConsumer(AsyncJsonWebsocketConsumer):
+    """
+    GraphQL subscriptions over WebSocket.
+
+    Clients authenticate with a JWT in the `connection_init` payload (no
+    session cookies, so other sites cannot open an authenticated socket).
+    Only subscriptions are served, under the /graphql/ depth and cost limits.
+    Each subscription joins channel layer groups (see social/events.py);
+    an event re-executes its selection with the changed post as root value.
+    Engagement events are delivered GRAPHQL_SUBSCRIPTION_COALESCE_SECONDS
+    after the first one of a burst, absorbing the rest.
+    """
+
+    async def connect(self):
+        if SUBPROTOCOL not in self.scope.get("subprotocols", []):
+            await self.close()
+            return
+        self.user = AnonymousUser()
+        self.subscriptions = {}
+        # Engagement groups with a delivery pending, and the tasks delivering them
+        self.pending = set()
+        self.tasks = set()
+        await self.accept(subprotocol=SUBPROTOCOL)
+
+    async def disconnect(self, code):
+        for task in getattr(self, "tasks", ()):
+            task.cancel()
+        for group in self.groups_in_use():
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive_json(self, content):
+        kind = content.get("type")
+        if kind == "connection_init":
+            await self.init(content.get("payload") or {})
+        elif kind == "start":
+            await self.start(content.get("id"), content.get("payload") or {})
+        elif kind == "stop":
+            await self.stop(content.get("id"))
+        elif kind == "connection_terminate":
+            await self.close()
+
+    async def init(self, payload):
+        token = _token(payload)
+        if token:
+            user = await database_sync_to_async(get_user_by_token)(token)
+            if user is None:
+                await self.send_json({"type": "connection_error", "payload": {"message": "Invalid or expired token"}})
+                await self.close(code=4401)
+                return
+            self.user = user
+        await self.send_json({"type": "connection_ack"})
+
+    async def start(self, operation_id, payload):
+        if operation_id is None or operation_id in self.subscriptions:
+            await self.send_error(operation_id, GraphQLError("Missing or duplicate operation id"))
+            return
+        try:
+            subscription = await database_sync_to_async(self.subscribe)(payload)
+        except GraphQLError as e:
+            await self.send_error(operation_id, e)
+            return
+        joined = self.groups_in_use()
+        self.subscriptions[operation_id] = subscription
+        for group in set(subscription.groups) - joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+
+    async def stop(self, operation_id):
+        subscription = self.subscriptions.pop(operation_id, None)
+        if subscription is None:
+            return
+        for group in set(subscription.groups) - self.groups_in_use():
+            await self.channel_layer.group_discard(group, self.channel_name)
+        await self.send_json({"type": "complete", "id": operation_id})
+
+    def groups_in_use(self):
+        return {group for subscription in getattr(self, "subscriptions", {}).values() for group in subscription.groups}
+
+    # Validate and price the operation, then work out its groups (runs in a worker thread)
+    def subscribe(self, payload):
+        try:
+            document = document_cache.compile(schema, payload.get("query") or "")
+        except InvalidDocument as e:
+            raise e.errors[0]
+        operation_name = payload.get("operationName")
+        operation = get_operation_ast(document.document_ast, operation_name)
+        if operation is None or operation.operation != "subscription":
+            raise GraphQLError("Only subscriptions are served over WebSocket; send queries and mutations to /graphql/")
+        selections = operation.selection_set.selections
+        if len(selections) != 1 or not isinstance(selections[0], ast.Field):
+            raise GraphQLError("A subscription must select exactly one field")
+
+        variables = payload.get("variables") or {}
+        cost = CostAnalyzer(schema, document.document_ast, variables).analyze(operation_name)
+        if cost.depth > settings.GRAPHQL_MAX_DEPTH or cost.cost > settings.GRAPHQL_MAX_COST:
+            raise GraphQLError("Subscription exceeds the maximum query depth or cost")
+
+        field = selections[0]
+        field_def = schema.get_subscription_type().fields[field.name.value]
+        values = get_variable_values(schema, operation.variable_definitions or [], variables)
+        arguments = get_argument_values(field_def.args, field.arguments, values)
+        groups = getattr(Subscription, f"groups_{to_snake_case(field.name.value)}")(self.user, **arguments)
+        return ActiveSubscription(_as_query(document.document_ast, operation), operation_name, variables, groups)
+
+    # Channel layer event handlers ("post.created" and "post.engagement")
+    async def post_created(self, event):
+        await self.deliver(event["group"], event)
+
+    async def post_engagement(self, event):
+        window = settings.GRAPHQL_SUBSCRIPTION_COALESCE_SECONDS
+        group = event["group"]
+        if window <= 0:
+            await self.deliver(group, event)
+        elif group not in self.pending:
+            self.pending.add(group)
+            task = asyncio.ensure_future(self.deliver_later(window, group, event))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def deliver_later(self, window, group, event):
+        await asyncio.sleep(window)
+        self.pending.discard(group)
+        await self.deliver(group, event)
+
+    async def deliver(self, group, event):
+        targets = [(operation_id, subscription) for operation_id, subscription in self.subscriptions.items()
+                   if group in subscription.groups]
+        if not targets:
+            return
+        results = await database_sync_to_async(self.execute)(event["post_id"], [sub for _, sub in targets])
+        for (operation_id, _), result in zip(targets, results):
+            payload = {"data": result.data}
+            if result.errors:
+                payload["errors"] = [format_error(error) for error in result.errors]
+            await self.send_json({"type": "data", "id": operation_id, "payload": payload})
+
+    def execute(self, post_id, subscriptions):
+        post = get_post(post_id)
+        if post is None:
+            return []
+        return [
+            execute(
+                event_schema,
+                subscription.document_ast,
+                root_value=post,
+                context_value=SimpleNamespace(user=self.user),
+                variable_values=subscription.variables,
+                operation_name=subscription.operation_name,
+            )
+            for subscription in subscriptions
+        ]
+
+    async def send_error(self, operation_id, error):
+        await self.send_json({"type": "error", "id": operation_id, "payload": format_error(error)})
@@ -2,7 +2,7 @@ import graphene
 import graphql_jwt
 
 from users.schema import UserQuery, UserMutation, CustomObtainJSONWebToken
-from social.schema import SocialQuery, SocialMutation
+from social.schema import SocialQuery, SocialMutation, SocialSubscription
 
 
 class UtilityQuery(graphene.ObjectType):
@@ -35,10 +35,21 @@ class Mutation(UserMutation, SocialMutation, graphene.ObjectType):
     )
     refresh_token = graphql_jwt.Refresh.Field()
     revoke_token = graphql_jwt.Revoke.Field()
-    
+
+
+class Subscription(SocialSubscription, graphene.ObjectType):
+    """
+    Root Subscription for the project (served over WebSocket, see config/consumers.py).
+    """
+    pass
+
 
 schema = graphene.Schema(
     query=Query,
     mutation=Mutation,
+    subscription=Subscription,
     auto_camelcase=True,  # set False if you prefer snake_case in GraphQL
 )
+
+# Subscription events run as queries against the Subscription type, with the event as root value
+event_schema = graphene.Schema(query=Subscription, auto_camelcase=True)
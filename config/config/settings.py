@@ -41,6 +41,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "users.auth.JWTAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -78,6 +79,63 @@ DATABASES = {
     )
 }
 
+# Read replicas (comma-separated URLs) serving the reads of GraphQL queries (utils/replicas.py).
+# Mutations, and the reads of a user for REPLICA_PIN_SECONDS after their last mutation, stay on
+# the primary; so do queries while every replica lags more than REPLICA_MAX_LAG_SECONDS.
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_URLS = config(
+    "DATABASE_REPLICA_URLS",
+    default="",
+    cast=lambda v: [s.strip() for s in v.split(",") if s.strip()],
+)
+for index, url in enumerate(DATABASE_REPLICA_URLS):
+    alias = f"replica_{index}"
+    DATABASES[alias] = dj_database_url.parse(url, conn_max_age=600, ssl_require=not DEBUG)
+    # Tests run against the primary's test database
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["utils.replicas.ReplicaRouter"]
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=5, cast=int)
+REPLICA_MAX_LAG_SECONDS = config("REPLICA_MAX_LAG_SECONDS", default=2, cast=float)
+# How often each process re-measures replica lag
+REPLICA_LAG_CHECK_SECONDS = config("REPLICA_LAG_CHECK_SECONDS", default=5, cast=float)
+
+# Cache
+# Shared Redis cache (pooled redis-py client) when REDIS_URL is set; per-process LocMem otherwise.
+# REDIS_URL=fakeredis:// runs the Redis backend against an in-memory fakeredis server (tests/dev).
+REDIS_URL = config("REDIS_URL", default="")
+
+if REDIS_URL:
+    REDIS_OPTIONS = {
+        "max_connections": config("REDIS_MAX_CONNECTIONS", default=50, cast=int),
+        "socket_connect_timeout": config("REDIS_CONNECT_TIMEOUT", default=2, cast=float),
+        "socket_timeout": config("REDIS_SOCKET_TIMEOUT", default=2, cast=float),
+        "retry_on_timeout": True,
+        "health_check_interval": 30,
+    }
+    if REDIS_URL.startswith("fakeredis://"):
+        from fakeredis import FakeRedisConnection
+
+        REDIS_URL = "redis://localhost:6379/0"
+        REDIS_OPTIONS["connection_class"] = FakeRedisConnection
+
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "social",
+            "TIMEOUT": 300,
+            "OPTIONS": REDIS_OPTIONS,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -104,9 +162,92 @@ GRAPHENE = {
     "SCHEMA": "config.schema.schema",  
     "MIDDLEWARE": [
         "graphql_jwt.middleware.JSONWebTokenMiddleware",
+        "utils.tracing.TracingMiddleware",
     ],
 }
 
+# Async GraphQL view for ASGI deployments (config.views.AsyncGraphQLView): requests run in a
+# pool of GRAPHQL_ASYNC_WORKERS threads, root fields of a query in GRAPHQL_ASYNC_FIELD_WORKERS.
+GRAPHQL_ASYNC_VIEW = config("GRAPHQL_ASYNC_VIEW", default=False, cast=bool)
+GRAPHQL_ASYNC_WORKERS = config("GRAPHQL_ASYNC_WORKERS", default=32, cast=int)
+GRAPHQL_ASYNC_FIELD_WORKERS = config("GRAPHQL_ASYNC_FIELD_WORKERS", default=32, cast=int)
+
+# GraphQL subscriptions over WebSocket (config/consumers.py). The in-memory channel layer only
+# reaches sockets of the same process; with several processes (or mutations served over WSGI)
+# set CHANNEL_LAYER_REDIS_URL, which needs the channels-redis package.
+CHANNEL_LAYER_REDIS_URL = config("CHANNEL_LAYER_REDIS_URL", default="")
+
+if CHANNEL_LAYER_REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [CHANNEL_LAYER_REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+# postEngagementChanged notifications of a post are coalesced over this many seconds (0 disables)
+GRAPHQL_SUBSCRIPTION_COALESCE_SECONDS = config("GRAPHQL_SUBSCRIPTION_COALESCE_SECONDS", default=1.0, cast=float)
+
+# Resolver tracing (utils/tracing.py): a fraction of operations is traced and logged to the
+# "graphql.tracing" logger; sending the header (staff users, or DEBUG) returns the trace
+# under extensions.tracing.
+GRAPHQL_TRACING_HEADER = config("GRAPHQL_TRACING_HEADER", default="X-GraphQL-Trace")
+GRAPHQL_TRACING_SAMPLE_RATE = config("GRAPHQL_TRACING_SAMPLE_RATE", default=0.01, cast=float)
+
+# /metrics (Prometheus): scrapers must send "Authorization: Bearer <token>"; without a token
+# the endpoint is only served when DEBUG is on
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+# Metrics are counted per process. With several workers, point this at a directory shared by
+# them (emptied whenever the deployment restarts): each worker writes its values there at most
+# every METRICS_FLUSH_SECONDS and /metrics reports the sum. Unset, only the worker that answers
+# the scrape is reported, which is only accurate with a single worker process.
+# Cron jobs run in separate processes: their runs are recorded in this directory when it is set
+# (it must then be shared with the cron host), in the cache otherwise, which must then be shared
+# (REDIS_URL). With the per-process LocMemCache they never reach /metrics, and a warning is logged.
+METRICS_MULTIPROC_DIR = config("METRICS_MULTIPROC_DIR", default="")
+METRICS_FLUSH_SECONDS = config("METRICS_FLUSH_SECONDS", default=5, cast=float)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        # One JSON document per traced operation
+        "graphql.tracing": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+# Query cost limits enforced by config.views.GraphQLView before execution (see utils/complexity.py)
+GRAPHQL_MAX_DEPTH = config("GRAPHQL_MAX_DEPTH", default=10, cast=int)
+GRAPHQL_MAX_COST = config("GRAPHQL_MAX_COST", default=5000, cast=int)
+
+# Rows fetched per round trip (and lines per written chunk) by the streaming exports (social/export.py)
+EXPORT_CHUNK_SIZE = config("EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# Largest id list accepted by the batch mutations (likePosts, sharePosts, followUsers)
+GRAPHQL_MAX_BATCH_SIZE = config("GRAPHQL_MAX_BATCH_SIZE", default=100, cast=int)
+
+# Automatic persisted queries and the in-process cache of validated documents (utils/persisted.py)
+GRAPHQL_DOCUMENT_CACHE_SIZE = config("GRAPHQL_DOCUMENT_CACHE_SIZE", default=256, cast=int)
+# Optional {"<sha256>": "<query>"} manifest of the operations shipped in our clients
+GRAPHQL_PERSISTED_QUERIES_FILE = config("GRAPHQL_PERSISTED_QUERIES_FILE", default="")
+# Allowlist mode: refuse any operation that is not in the manifest above
+GRAPHQL_PERSISTED_QUERIES_ONLY = config("GRAPHQL_PERSISTED_QUERIES_ONLY", default=False, cast=bool)
+# Operations registered by clients expire from the shared cache after this many seconds,
+# and texts longer than the cap are refused registration
+GRAPHQL_PERSISTED_QUERY_TTL = config("GRAPHQL_PERSISTED_QUERY_TTL", default=86400, cast=int)
+GRAPHQL_PERSISTED_QUERY_MAX_LENGTH = config("GRAPHQL_PERSISTED_QUERY_MAX_LENGTH", default=10000, cast=int)
+
+# JWT authentication (users/auth.py): user snapshots are cached per process for a few seconds
+# and in the shared cache for longer; saving a user invalidates both.
+AUTH_CACHE_TIMEOUT = config("AUTH_CACHE_TIMEOUT", default=300, cast=int)
+AUTH_LOCAL_CACHE_TIMEOUT = config("AUTH_LOCAL_CACHE_TIMEOUT", default=30, cast=int)
+AUTH_LOCAL_CACHE_SIZE = config("AUTH_LOCAL_CACHE_SIZE", default=1024, cast=int)
+
 AUTHENTICATION_BACKENDS = [
     "graphql_jwt.backends.JSONWebTokenBackend",
     "django.contrib.auth.backends.ModelBackend",
@@ -119,9 +260,59 @@ GRAPHQL_JWT = {
     "JWT_REFRESH_EXPIRATION_DELTA": timedelta(days=7),
 }
 
+# Personalized feed (fan-out-on-write inboxes, see social/feed.py)
+# Authors with more followers than this are merged in at read time instead
+FEED_FANOUT_MAX_FOLLOWERS = config("FEED_FANOUT_MAX_FOLLOWERS", default=5000, cast=int)
+# How many recent posts are copied into an inbox when a user follows someone
+FEED_BACKFILL_SIZE = config("FEED_BACKFILL_SIZE", default=200, cast=int)
+
+# Seconds a serialized post row stays in the post cache (social/cache.py)
+POST_CACHE_TIMEOUT = config("POST_CACHE_TIMEOUT", default=300, cast=int)
+# Seconds a post's cache version lives; well above POST_CACHE_TIMEOUT so rows never outlive it
+POST_VERSION_TIMEOUT = config("POST_VERSION_TIMEOUT", default=86400, cast=int)
+
+# Trending leaderboard (social/trending.py): engagement loses half its weight every N hours.
+# Changing it requires `manage.py rebuild_trending`.
+TRENDING_HALF_LIFE_HOURS = config("TRENDING_HALF_LIFE_HOURS", default=24, cast=float)
+
+# Analytics rollups (social/rollups.py): rows counted per job batch, seconds a new row waits
+# before it is counted (so rows committed out of id order are not skipped), and how long
+# hourly rollups are kept (daily ones live as long as their post or user)
+ROLLUP_BATCH_SIZE = config("ROLLUP_BATCH_SIZE", default=5000, cast=int)
+ROLLUP_SETTLE_SECONDS = config("ROLLUP_SETTLE_SECONDS", default=60, cast=int)
+ROLLUP_HOURLY_RETENTION_DAYS = config("ROLLUP_HOURLY_RETENTION_DAYS", default=3, cast=int)
+
+# Post search (social/search.py): Postgres text search configuration (changing it requires
+# `manage.py rebuild_search_index`) and how much popularity boosts relevance
+SEARCH_CONFIG = config("SEARCH_CONFIG", default="english")
+SEARCH_POPULARITY_WEIGHT = config("SEARCH_POPULARITY_WEIGHT", default=0.1, cast=float)
+
+# Retention job (social/cron.py): posts older than N days are purged in batches,
+# with a pause between batches to leave room for foreground traffic.
+POST_RETENTION_DAYS = config("POST_RETENTION_DAYS", default=90, cast=int)
+POST_RETENTION_BATCH_SIZE = config("POST_RETENTION_BATCH_SIZE", default=500, cast=int)
+POST_RETENTION_BATCH_SLEEP = config("POST_RETENTION_BATCH_SLEEP", default=0.1, cast=float)
+# Directory the retention job archives purged posts to before deleting them (social/archive.py);
+# empty to hard-delete
+POST_ARCHIVE_DIR = config("POST_ARCHIVE_DIR", default=str(BASE_DIR / "archive"))
+
+# Monthly partitions (social/partitions.py, Postgres): months created ahead of the current one.
+# Months past POST_RETENTION_DAYS are dropped by clean_old_posts after it has archived their
+# posts, or only detached (left as standalone tables) with PARTITION_DETACH_EXPIRED.
+PARTITION_MONTHS_AHEAD = config("PARTITION_MONTHS_AHEAD", default=3, cast=int)
+PARTITION_DETACH_EXPIRED = config("PARTITION_DETACH_EXPIRED", default=False, cast=bool)
+
+# Inactive-user job (users/cron.py): users without a login for N days are deactivated in batches
+USER_INACTIVE_DAYS = config("USER_INACTIVE_DAYS", default=180, cast=int)
+USER_DEACTIVATION_BATCH_SIZE = config("USER_DEACTIVATION_BATCH_SIZE", default=500, cast=int)
+USER_DEACTIVATION_BATCH_SLEEP = config("USER_DEACTIVATION_BATCH_SLEEP", default=0.1, cast=float)
+
 # 🔥 Cron jobs 
 CRONJOBS = [
     ("0 0 * * *", "social.cron.clean_old_posts"),          # daily at midnight
+    ("30 0 * * *", "social.cron.manage_partitions"),       # daily, creates upcoming months
+    ("*/5 * * * *", "social.cron.update_rollups"),         # every 5 minutes
+    ("*/10 * * * *", "social.cron.sync_pulled_authors"),   # every 10 minutes
     ("0 2 * * 0", "users.cron.deactivate_inactive_users"), # weekly on Sunday at 2am
 ]
 
@@ -0,0 +1,446 @@
+import json
+import os
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+
+from users.models import User
+from social.models import Post
+from utils import persisted
+from utils.persisted import query_hash
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    cache.clear()
+    persisted.document_cache.clear()
+
+
+def post_graphql(client, query, extensions=None, **variables):
+    payload = {"query": query, "variables": variables}
+    if extensions:
+        payload["extensions"] = extensions
+    response = client.post("/graphql/", data=json.dumps(payload), content_type="application/json")
+    return response.status_code, response.json()
+
+
+def apq(query):
+    return {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}}
+
+
+@pytest.mark.django_db
+def test_query_cost_is_reported_in_extensions(client):
+    user = User.objects.create(username="author")
+    Post.objects.create(author=user, content="hello")
+
+    status, body = post_graphql(client, "{ posts(limit: 10) { id author { username } } }")
+    assert status == 200
+    assert body["data"]["posts"][0]["author"]["username"] == "author"
+    # 10 posts, each with one author object
+    assert body["extensions"]["cost"]["cost"] == 20
+    assert body["extensions"]["cost"]["depth"] == 3
+
+
+@pytest.mark.django_db
+def test_over_budget_query_is_rejected_before_execution(client, settings, django_assert_num_queries):
+    settings.GRAPHQL_MAX_COST = 100
+    with django_assert_num_queries(0):
+        status, body = post_graphql(
+            client, "query($n: Int) { posts(limit: $n) { id author { id } } }", n=1000
+        )
+    assert status == 400
+    assert "data" not in body
+    assert "exceeds the maximum of 100" in body["errors"][0]["message"]
+    assert body["extensions"]["cost"]["cost"] == 2000
+
+
+@pytest.mark.django_db
+def test_too_deep_query_is_rejected(client, settings):
+    settings.GRAPHQL_MAX_DEPTH = 2
+    status, body = post_graphql(client, "{ post(id: 1) { author { username } } }")
+    assert status == 400
+    assert "depth 3 exceeds" in body["errors"][0]["message"]
+
+
+@pytest.mark.django_db
+def test_automatic_persisted_query_round_trip(client):
+    query = "{ healthCheck }"
+
+    # Hash only, unknown: the client is asked for the full text
+    status, body = post_graphql(client, None, extensions=apq(query))
+    assert status == 200
+    assert body["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+
+    # Full text + hash registers the operation
+    status, body = post_graphql(client, query, extensions=apq(query))
+    assert body["data"] == {"healthCheck": "ok"}
+
+    # Later requests (from any worker) only need the hash
+    persisted.document_cache.clear()
+    status, body = post_graphql(client, None, extensions=apq(query))
+    assert status == 200
+    assert body["data"] == {"healthCheck": "ok"}
+
+
+@pytest.mark.django_db
+def test_persisted_query_hash_must_match(client):
+    status, body = post_graphql(client, "{ healthCheck }", extensions=apq("{ posts { id } }"))
+    assert status == 400
+    assert body["errors"][0]["message"] == "provided sha does not match query"
+
+
+@pytest.mark.django_db
+def test_only_valid_bounded_queries_are_registered(client, settings):
+    invalid = "{ noSuchField }"
+    status, body = post_graphql(client, invalid, extensions=apq(invalid))
+    assert status == 400
+    assert cache.get(persisted.PERSISTED_QUERY_KEY.format(query_hash(invalid))) is None
+
+    settings.GRAPHQL_PERSISTED_QUERY_MAX_LENGTH = 10
+    query = "{ healthCheck }"
+    status, body = post_graphql(client, query, extensions=apq(query))
+    assert status == 400
+    assert "maximum of 10 characters" in body["errors"][0]["message"]
+    assert cache.get(persisted.PERSISTED_QUERY_KEY.format(query_hash(query))) is None
+
+
+@pytest.mark.django_db
+def test_allowlist_mode_refuses_unknown_operations(client, settings, tmp_path, monkeypatch):
+    allowed = "{ healthCheck }"
+    manifest = tmp_path / "persisted-queries.json"
+    manifest.write_text(json.dumps({query_hash(allowed): allowed}))
+    settings.GRAPHQL_PERSISTED_QUERIES_FILE = str(manifest)
+    settings.GRAPHQL_PERSISTED_QUERIES_ONLY = True
+    monkeypatch.setattr(persisted, "_allowlist", None)
+
+    status, body = post_graphql(client, None, extensions=apq(allowed))
+    assert body["data"] == {"healthCheck": "ok"}
+
+    status, body = post_graphql(client, "{ users { id } }")
+    assert status == 400
+    assert body["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_SUPPORTED"
+
+
+def test_document_cache_skips_parse_and_validate(monkeypatch):
+    from config.schema import schema
+
+    first = persisted.document_cache.compile(schema, "{ healthCheck }")
+    monkeypatch.setattr(persisted, "parse", lambda query: pytest.fail("parsed twice"))
+    assert persisted.document_cache.compile(schema, "{ healthCheck }") is first
+
+
+def test_add_many_pipelines_set_nx_on_redis(settings, monkeypatch):
+    from fakeredis import FakeRedisConnection
+    from redis.client import Pipeline
+
+    from django.core.cache import caches
+    from utils.cache import add_many
+
+    settings.CACHES = {"default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://localhost:6379/0",
+        "OPTIONS": {"connection_class": FakeRedisConnection},
+    }}
+    backend = caches["default"]
+    backend.set("taken", "first")
+    monkeypatch.setattr(backend, "add", lambda *args, **kwargs: pytest.fail("one add() per key"))
+    pipelines = []
+    execute = Pipeline.execute
+    monkeypatch.setattr(Pipeline, "execute", lambda pipeline: pipelines.append(pipeline) or execute(pipeline))
+
+    add_many({"taken": "second", "free": 2}, timeout=60)
+    assert len(pipelines) == 1
+    assert backend.get_many(["taken", "free"]) == {"taken": "first", "free": 2}
+    assert 0 < backend._cache.get_client().ttl(backend.make_and_validate_key("free")) <= 60
+    backend.clear()
+
+
+def test_get_or_compute_caches_and_refreshes_early():
+    from utils.cache import get_or_compute
+
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert get_or_compute("answer", compute, timeout=60) == 1
+    assert get_or_compute("answer", compute, timeout=60) == 1
+    # A huge beta makes the early refresh certain while the entry is still valid
+    assert get_or_compute("answer", compute, timeout=60, beta=1e12) == 2
+    assert len(calls) == 2
+
+
+def test_get_or_compute_single_flight_serves_current_value_while_locked():
+    from utils.cache import get_or_compute
+
+    get_or_compute("answer", lambda: "old", timeout=60)
+    cache.add("answer:lock", "someone-else", timeout=10)
+    # Another worker is refreshing: nobody else recomputes, the old value is served
+    assert get_or_compute("answer", lambda: pytest.fail("recomputed"), timeout=60, beta=1e12) == "old"
+
+
+def test_get_or_compute_against_redis_backend(settings):
+    pytest.importorskip("fakeredis")
+    from fakeredis import FakeRedisConnection
+    from utils.cache import get_or_compute
+
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://localhost:6379/0",
+            "OPTIONS": {"connection_class": FakeRedisConnection},
+        }
+    }
+    from django.core.cache import cache as redis_cache
+
+    assert get_or_compute("trending_feed_ids_10", lambda: [3, 1, 2], timeout=60) == [3, 1, 2]
+    assert get_or_compute("trending_feed_ids_10", lambda: [], timeout=60) == [3, 1, 2]
+    assert redis_cache.get("trending_feed_ids_10:lock") is None
+
+
+@pytest.mark.django_db
+def test_tracing_extension_on_debug_header(client, settings):
+    settings.DEBUG = True
+    settings.GRAPHQL_TRACING_SAMPLE_RATE = 0
+    author = User.objects.create(username="author")
+    for i in range(3):
+        Post.objects.create(author=author, content=f"post {i}")
+    query = "{ posts(limit: 3) { id author { username } } trendingFeed(limit: 3) { id } }"
+
+    # Not requested (and not sampled): no trace
+    status, body = post_graphql(client, query)
+    assert status == 200 and "tracing" not in body["extensions"]
+
+    response = client.post(
+        "/graphql/", data=json.dumps({"query": query}), content_type="application/json",
+        headers={settings.GRAPHQL_TRACING_HEADER: "1"},
+    )
+    tracing = response.json()["extensions"]["tracing"]
+    resolvers = {entry["path"]: entry for entry in tracing["resolvers"]}
+    # List indexes are folded: one entry for the three authors
+    assert resolvers["posts.author"]["count"] == 3
+    assert resolvers["posts"]["sqlCount"] == 1
+    assert tracing["sql"]["count"] == sum(entry["sqlCount"] for entry in tracing["resolvers"])
+    # The trending ids were cached by the first request
+    assert tracing["cache"]["trending"] == {"hits": 1, "misses": 0}
+    assert tracing["cache"]["post"]["hits"] == 3
+
+
+@pytest.mark.django_db
+def test_tracing_header_is_ignored_for_anonymous_users_in_production(client, settings):
+    settings.DEBUG = False
+    settings.GRAPHQL_TRACING_SAMPLE_RATE = 0
+    response = client.post(
+        "/graphql/", data=json.dumps({"query": "{ healthCheck }"}), content_type="application/json",
+        headers={settings.GRAPHQL_TRACING_HEADER: "1"},
+    )
+    assert "tracing" not in response.json().get("extensions", {})
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_exports_operations_caches_and_cron_jobs(client, settings):
+    from social.cron import clean_old_posts
+    from utils import metrics
+
+    author = User.objects.create(username="author")
+    post = Post.objects.create(author=author, content="hello")
+    query = "query PostById($id: Int!) { post(id: $id) { id } }"
+    post_graphql(client, query, id=post.id)
+    post_graphql(client, query, id=post.id)
+    clean_old_posts(sleep=0)
+
+    # Client-chosen operation names are folded into "other" past the label limit
+    for i in range(metrics.MAX_LABEL_VALUES + 5):
+        post_graphql(client, f"query Op{i} {{ healthCheck }}")
+
+    # No token configured: the endpoint is only open in development
+    assert client.get("/metrics").status_code == 401
+    settings.DEBUG = True
+    body = client.get("/metrics").content.decode()
+    assert 'graphql_requests_total{operation="PostById",type="query",status="ok"} 2' in body
+    assert 'graphql_request_duration_seconds_count{operation="PostById"} 2' in body
+    assert 'cache_requests_total{cache="post",result="hit"}' in body
+    assert 'cron_job_runs_total{job="clean_old_posts",status="success"} 1' in body
+    assert 'operation="other"' in body
+    assert len(metrics.graphql_latency.seen["operation"]) <= metrics.MAX_LABEL_VALUES + 1
+
+    settings.METRICS_TOKEN = "secret"
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+def test_metrics_are_summed_over_worker_processes(client, settings, tmp_path):
+    from utils import metrics
+
+    settings.METRICS_TOKEN = "secret"
+    settings.METRICS_MULTIPROC_DIR = str(tmp_path)
+    metrics.graphql_errors.inc(operation="SumAcrossWorkers")
+    # Another worker flushed its own values to the shared directory
+    (tmp_path / "metrics-1.json").write_text(json.dumps({
+        "graphql_resolver_errors_total": [[["SumAcrossWorkers"], 2]],
+        "graphql_request_duration_seconds": [[["SumAcrossWorkers"], [[1] + [0] * 11, 0.004]]],
+    }))
+
+    body = client.get("/metrics", headers={"Authorization": "Bearer secret"}).content.decode()
+    assert 'graphql_resolver_errors_total{operation="SumAcrossWorkers"} 3' in body
+    assert 'graphql_request_duration_seconds_count{operation="SumAcrossWorkers"} 1' in body
+    assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
+
+
+def test_cron_metrics_are_written_to_the_metrics_dir(settings, tmp_path, caplog, monkeypatch):
+    from utils import metrics
+
+    @metrics.cron_job("update_rollups")
+    def job():
+        return None
+
+    # Without a shared store the runs stay in this process: say so
+    monkeypatch.setattr(metrics, "_warned_local_cache", False)
+    job()
+    assert "will not reach /metrics" in caplog.text
+
+    settings.METRICS_MULTIPROC_DIR = str(tmp_path)
+    job()
+    job()
+    assert 'cron_job_runs_total{job="update_rollups",status="success"} 2' in metrics.render()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_view_resolves_root_fields_concurrently(settings):
+    import asyncio
+
+    from django.test import AsyncRequestFactory
+    from graphql import parse
+
+    from config.views import AsyncGraphQLView, split_root_fields
+
+    author = User.objects.create(username="author")
+    Post.objects.create(author=author, content="hello")
+    query = "{ posts(limit: 5) { content author { username } } trendingFeed(limit: 5) { content } healthCheck }"
+    assert len(split_root_fields(parse(query), None)) == 3
+    # Mutations and single-field queries are executed as they are
+    assert split_root_fields(parse("mutation { deletePost(postId: 1) { ok } }"), None) is None
+    assert split_root_fields(parse("{ posts { id } }"), None) is None
+
+    request = AsyncRequestFactory().post(
+        "/graphql/", data=json.dumps({"query": query}), content_type="application/json"
+    )
+    request.user = AnonymousUser()
+    response = asyncio.run(AsyncGraphQLView.as_view()(request))
+    body = json.loads(response.content)
+    assert "errors" not in body
+    assert list(body["data"]) == ["posts", "trendingFeed", "healthCheck"]
+    assert body["data"]["posts"] == [{"content": "hello", "author": {"username": "author"}}]
+    assert body["data"]["trendingFeed"] == [{"content": "hello"}]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_subscriptions_push_followed_posts_and_coalesced_counts(settings):
+    import asyncio
+
+    from asgiref.sync import sync_to_async
+    from channels.testing import WebsocketCommunicator
+    from django.test import Client
+    from graphql_jwt.shortcuts import get_token
+
+    from config.asgi import application
+    from users.models import Follow
+
+    settings.GRAPHQL_SUBSCRIPTION_COALESCE_SECONDS = 0.5
+    reader = User.objects.create(username="reader")
+    author = User.objects.create(username="author")
+    stranger = User.objects.create(username="stranger")
+    Follow.objects.create(follower=reader, following=author)
+    post = Post.objects.create(author=author, content="hello")
+    clients = {}
+    for user in (author, stranger, reader):
+        clients[user.username] = Client()
+        clients[user.username].force_login(user)
+
+    def mutate(username, query, **variables):
+        status, body = post_graphql(clients[username], query, **variables)
+        assert status == 200 and "errors" not in body, body
+
+    async def scenario():
+        socket = WebsocketCommunicator(application, "/graphql/", subprotocols=["graphql-ws"])
+        connected, _ = await socket.connect()
+        assert connected
+        await socket.send_json_to({"type": "connection_init", "payload": {"authToken": get_token(reader)}})
+        assert (await socket.receive_json_from())["type"] == "connection_ack"
+
+        # Queries are refused: they belong on /graphql/
+        await socket.send_json_to({"type": "start", "id": "0", "payload": {"query": "{ healthCheck }"}})
+        assert (await socket.receive_json_from())["type"] == "error"
+
+        await socket.send_json_to({"type": "start", "id": "1", "payload": {
+            "query": "subscription { postCreated { content author { username } } }",
+        }})
+        await socket.send_json_to({"type": "start", "id": "2", "payload": {
+            "query": "subscription($id: Int!) { postEngagementChanged(postId: $id) { likesCount commentsCount } }",
+            "variables": {"id": post.id},
+        }})
+        await asyncio.sleep(0.2)
+
+        create = "mutation($c: String!) { createPost(content: $c) { post { id } } }"
+        await sync_to_async(mutate)("stranger", create, c="not followed")
+        await sync_to_async(mutate)("author", create, c="followed")
+        message = await socket.receive_json_from(timeout=2)
+        assert message["id"] == "1"
+        assert message["payload"]["data"]["postCreated"] == {"content": "followed", "author": {"username": "author"}}
+
+        # Three interactions inside the window: one message with the final counts
+        for username in ("author", "stranger", "reader"):
+            await sync_to_async(mutate)(username, "mutation($id: Int!) { likePost(postId: $id) { created } }", id=post.id)
+        await sync_to_async(mutate)(
+            "reader", "mutation($id: Int!) { createComment(postId: $id, text: \"hi\") { comment { id } } }", id=post.id
+        )
+        message = await socket.receive_json_from(timeout=2)
+        assert message["id"] == "2"
+        assert message["payload"]["data"]["postEngagementChanged"] == {"likesCount": 3, "commentsCount": 1}
+        assert await socket.receive_nothing(timeout=1)
+        await socket.disconnect()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_queries_read_from_replica_until_the_user_writes(client, settings, monkeypatch):
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    from utils import replicas
+
+    # A second connection to the test database stands in for a replica
+    primary = connections["default"]
+    replica = primary.__class__(dict(primary.settings_dict), alias="replica_0")
+    connections["replica_0"] = replica
+    settings.DATABASE_REPLICAS = ["replica_0"]
+    author = User.objects.create(username="author")
+    Post.objects.create(author=author, content="hello")
+    client.force_login(author)
+    query = "{ posts(limit: 5) { content } }"
+
+    def reads(alias):
+        with CaptureQueriesContext(connections[alias]) as captured:
+            status, body = post_graphql(client, query)
+        assert status == 200 and "errors" not in body, body
+        return len(captured)
+
+    try:
+        assert reads("replica_0") > 0
+
+        # Read-your-writes: after a mutation the user's queries stay on the primary
+        status, body = post_graphql(client, 'mutation { createPost(content: "second") { post { id } } }')
+        assert status == 200 and "errors" not in body, body
+        assert reads("replica_0") == 0
+        cache.delete(f"db_pinned_{author.pk}")
+        assert reads("replica_0") > 0
+
+        # A replica lagging past REPLICA_MAX_LAG_SECONDS is skipped
+        monkeypatch.setattr(replicas, "replica_lag", lambda alias: settings.REPLICA_MAX_LAG_SECONDS + 1)
+        assert reads("replica_0") == 0
+    finally:
+        replica.close()
+        del connections["replica_0"]
@@ -14,12 +14,19 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 
+from social.views import export_view
+from .views import AsyncGraphQLView, GraphQLView, metrics_view
+
+
+# Served by an ASGI server (config.asgi), the async view keeps the event loop free
+graphql_view = AsyncGraphQLView if settings.GRAPHQL_ASYNC_VIEW else GraphQLView
+
 
 def health_check(request):
     return JsonResponse({"status": "ok"}, status=200)
@@ -27,6 +34,8 @@ def health_check(request):
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("health/", health_check),   # ✅ monitoring endpoint
-    # Keep GraphiQL always enabled, even in production
-    path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path("metrics", metrics_view),   # Prometheus scrape target
+    path("export/<str:dataset>/", export_view),  # streamed NDJSON/CSV exports
+    # GraphiQL only in development
+    path("graphql/", csrf_exempt(graphql_view.as_view(graphiql=settings.DEBUG))),
 ]
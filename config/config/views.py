@@ -0,0 +1,305 @@
+import contextvars
+import copy
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView as BaseGraphQLView, HttpError
+from graphql import GraphQLError
+from graphql.execution import ExecutionResult, execute
+from graphql.language import ast
+from graphql.utils.get_operation_ast import get_operation_ast
+
+from utils import metrics
+from utils.complexity import CostAnalyzer
+from utils.metrics import QueryCounter
+from utils.persisted import (
+    InvalidDocument, PersistedQueryNotFound, document_cache, persisted_hash, register_query,
+    resolve_query,
+)
+from utils.replicas import route_operation
+from utils.tracing import current_tracer, trace, tracer_for, wrap_connections
+
+
+class GraphQLView(BaseGraphQLView):
+    """
+    GraphQL endpoint with persisted queries and per-request cost limits.
+
+    Documents come from `utils.persisted.document_cache`, so a known operation
+    (sent as text or as an APQ sha256 hash) is parsed and validated once per
+    process. The operation is then priced by `utils.complexity.CostAnalyzer`
+    before any resolver runs; operations over GRAPHQL_MAX_DEPTH or
+    GRAPHQL_MAX_COST are rejected. The computed cost is reported under
+    `extensions.cost`, and per-resolver timings under `extensions.tracing`
+    when the GRAPHQL_TRACING_HEADER debug header is sent (see utils/tracing.py).
+    """
+
+    def get_document(self, request, query, sha256=None):
+        # Hot path: a hash-only request for an operation this process already compiled
+        if sha256:
+            document = document_cache.get(sha256)
+            if document is not None:
+                return document
+        text = resolve_query(query, sha256)
+        document = document_cache.compile(self.schema, text, key=sha256)
+        if sha256 and query:
+            # Only operations that parsed and validated are registered
+            register_query(sha256, text)
+        return document
+
+    def check_cost(self, request, document, variables, operation_name):
+        cost = CostAnalyzer(self.schema, document.document_ast, variables).analyze(operation_name)
+        request.graphql_extensions["cost"] = dict(
+            cost.as_dict(),
+            maxDepth=settings.GRAPHQL_MAX_DEPTH,
+            maxCost=settings.GRAPHQL_MAX_COST,
+        )
+        if cost.depth > settings.GRAPHQL_MAX_DEPTH:
+            return GraphQLError(
+                f"Query depth {cost.depth} exceeds the maximum of {settings.GRAPHQL_MAX_DEPTH}"
+            )
+        if cost.cost > settings.GRAPHQL_MAX_COST:
+            return GraphQLError(
+                f"Query cost {cost.cost} exceeds the maximum of {settings.GRAPHQL_MAX_COST}"
+            )
+        return None
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name,
+                                show_graphiql=False, sha256=None):
+        request.graphql_extensions = {}
+        if not query and not sha256:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        try:
+            document = self.get_document(request, query, sha256)
+        except PersistedQueryNotFound as e:
+            # Not an invalid request: the client retries with the full query text
+            return ExecutionResult(errors=[e])
+        except InvalidDocument as e:
+            return ExecutionResult(errors=e.errors, invalid=True)
+        except Exception as e:
+            return ExecutionResult(errors=[e], invalid=True)
+
+        operation_type = document.get_operation_type(operation_name)
+        # Name and type of the selected operation, for the metrics
+        operation = get_operation_ast(document.document_ast, operation_name)
+        if operation is not None and operation.name is not None:
+            request.graphql_operation = (operation.name.value, operation_type)
+        else:
+            request.graphql_operation = (None, operation_type)
+        if request.method.lower() == "get" and operation_type and operation_type != "query":
+            if show_graphiql:
+                return None
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    f"Can only perform a {operation_type} operation from a POST request.",
+                )
+            )
+
+        # Reject over-budget operations before any resolver runs
+        error = self.check_cost(request, document, variables, operation_name)
+        if error:
+            return ExecutionResult(errors=[error], invalid=True)
+
+        tracer = tracer_for(request, operation_name)
+        try:
+            options = {
+                "root_value": self.get_root_value(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "context_value": self.get_context(request),
+                "middleware": self.get_middleware(request),
+            }
+            if self.executor:
+                options["executor"] = self.executor
+
+            with trace(tracer), route_operation(request, operation_type):
+                return self.execute_document(request, document, operation_type, options)
+        except Exception as e:
+            return ExecutionResult(errors=[e], invalid=True)
+        finally:
+            if tracer is not None and tracer.expose:
+                request.graphql_extensions["tracing"] = tracer.as_dict()
+
+    def execute_document(self, request, document, operation_type, options):
+        if operation_type == "mutation" and (
+            graphene_settings.ATOMIC_MUTATIONS is True
+            or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+        ):
+            with transaction.atomic():
+                result = document.execute(**options)
+                if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                    transaction.set_rollback(True)
+            return result
+
+        return document.execute(**options)
+
+    def record_metrics(self, request, result, duration, queries):
+        operation, operation_type = getattr(request, "graphql_operation", (None, None))
+        operation = operation or "anonymous"
+        if result.invalid:
+            status = "rejected"
+        elif result.errors:
+            status = "error"
+            metrics.graphql_errors.inc(len(result.errors), operation=operation)
+        else:
+            status = "ok"
+        metrics.graphql_requests.inc(operation=operation, type=operation_type or "unknown", status=status)
+        metrics.graphql_latency.observe(duration, operation=operation)
+        metrics.db_queries.observe(queries.count, operation=operation)
+
+    def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        sha256 = persisted_hash(request.GET.get("extensions") or data.get("extensions"))
+
+        queries = request.graphql_query_counter = QueryCounter()
+        for alias in connections:
+            reused = connections[alias].connection is not None
+            metrics.db_connections.inc(alias=alias, reused=str(reused).lower())
+        started = time.perf_counter()
+        with wrap_connections(queries):
+            execution_result = self.execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql, sha256=sha256
+            )
+        if execution_result:
+            self.record_metrics(request, execution_result, time.perf_counter() - started, queries)
+
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        if not execution_result:
+            return None, 200
+
+        status_code = 200
+        response = {}
+        if execution_result.errors:
+            set_rollback()
+            response["errors"] = [self.format_error(e) for e in execution_result.errors]
+
+        if execution_result.invalid:
+            status_code = 400
+        else:
+            response["data"] = execution_result.data
+
+        extensions = dict(execution_result.extensions or {}, **request.graphql_extensions)
+        if extensions:
+            response["extensions"] = extensions
+
+        if self.batch:
+            response["id"] = id
+            response["status"] = status_code
+
+        return self.json_encode(request, response, pretty=show_graphiql), status_code
+
+
+_pools = {}
+
+
+# Bounded, lazily created thread pools shared by all async requests of the process
+def _pool(name, size):
+    pool = _pools.get(name)
+    if pool is None:
+        pool = _pools.setdefault(name, ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"graphql-{name}"))
+    return pool
+
+
+# One single-field document per root field, or None when the operation cannot be split
+def split_root_fields(document_ast, operation_name):
+    operation = get_operation_ast(document_ast, operation_name)
+    if operation is None or operation.operation != "query":
+        return None
+    selections = operation.selection_set.selections
+    if len(selections) < 2 or not all(isinstance(selection, ast.Field) for selection in selections):
+        return None
+    keys = [(selection.alias or selection.name).value for selection in selections]
+    if len(set(keys)) != len(keys):
+        return None
+
+    documents = []
+    for selection in selections:
+        part = copy.copy(operation)
+        part.selection_set = ast.SelectionSet(selections=[selection])
+        definitions = [part if definition is operation else definition for definition in document_ast.definitions]
+        documents.append(ast.Document(definitions=definitions))
+    return documents
+
+
+def _run_in_thread(func, *args):
+    # Worker threads keep their own database connections: retire broken or expired ones
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+class AsyncGraphQLView(GraphQLView):
+    """
+    GraphQL endpoint for ASGI servers (GRAPHQL_ASYNC_VIEW).
+
+    The event loop never runs ORM code: each request is handed to a bounded
+    pool of GRAPHQL_ASYNC_WORKERS threads, so a slow feed query holds one
+    thread instead of the whole process. Queries with several root fields
+    resolve them concurrently, one GRAPHQL_ASYNC_FIELD_WORKERS thread per
+    field; mutations keep running serially in one transaction.
+    """
+
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        pool = _pool("requests", settings.GRAPHQL_ASYNC_WORKERS)
+        handler = functools.partial(_run_in_thread, super().dispatch, request, *args, **kwargs)
+        # sync_to_async rather than run_in_executor: async_to_sync calls made by the request
+        # (channel layer sends from on_commit hooks) then run on this event loop
+        return await sync_to_async(handler, thread_sensitive=False, executor=pool)()
+
+    def execute_document(self, request, document, operation_type, options):
+        parts = split_root_fields(document.document_ast, options["operation_name"])
+        if parts is None:
+            return super().execute_document(request, document, operation_type, options)
+
+        pool = _pool("fields", settings.GRAPHQL_ASYNC_FIELD_WORKERS)
+        futures = [
+            pool.submit(contextvars.copy_context().run, _run_in_thread, self.execute_part, request, part, options)
+            for part in parts
+        ]
+        data, errors = {}, []
+        for future in futures:
+            result = future.result()
+            errors += result.errors or []
+            if result.data is None:
+                return ExecutionResult(data=None, errors=errors)
+            data.update(result.data)
+        return ExecutionResult(data=data, errors=errors or None)
+
+    def execute_part(self, request, document_ast, options):
+        # Each field gets its own copy of the request so DataLoaders are never shared between threads
+        context = copy.copy(request)
+        context.__dict__.pop("loaders", None)
+        wrappers = [request.graphql_query_counter]
+        tracer = current_tracer.get()
+        if tracer is not None:
+            wrappers.append(tracer)
+        with wrap_connections(*wrappers):
+            return execute(self.schema, document_ast, **dict(options, context_value=context))
+
+
+# Prometheus text exposition of the workers' metrics (plus cron job runs from the shared cache)
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        if request.headers.get("Authorization") != f"Bearer {token}":
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -31,18 +31,12 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ("content", "author__username")
     inlines = [CommentInline, LikeInline, ShareInline]
     date_hierarchy = "created_at"
+    readonly_fields = ("likes_count", "comments_count", "shares_count")
 
     def short_content(self, obj):
         return obj.content[:50] + ("..." if len(obj.content) > 50 else "")
     short_content.short_description = "Content"
 
-    def likes_count(self, obj):
-        return obj.likes.count()
-    def comments_count(self, obj):
-        return obj.comments.count()
-    def shares_count(self, obj):
-        return obj.shares.count()
-
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
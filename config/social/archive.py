@@ -0,0 +1,142 @@
+import gzip
+import json
+import os
+import sqlite3
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
+
+from .models import Comment, Like, Post, Share
+
+# Cold storage for posts purged by clean_old_posts (social/cron.py), under POST_ARCHIVE_DIR:
+#   posts-<run>.jsonl.gz  one JSON post per line (with its comments, likes and shares); every
+#                         batch is its own gzip member, so the file stays a plain .jsonl.gz
+#                         while a member can be decompressed on its own
+#   index.sqlite3         post id -> (file, member offset, member length)
+INDEX_FILE = "index.sqlite3"
+
+POST_COLUMNS = ("id", "author_id", "content", "created_at", "likes_count", "comments_count", "shares_count")
+
+
+def _archive_dir():
+    return Path(settings.POST_ARCHIVE_DIR)
+
+
+def _open_index(create=False):
+    path = _archive_dir() / INDEX_FILE
+    if not create and not path.exists():
+        return None
+    index = sqlite3.connect(path)
+    index.execute(
+        "CREATE TABLE IF NOT EXISTS posts "
+        "(id INTEGER PRIMARY KEY, file TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL)"
+    )
+    return index
+
+
+def _json(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+# Full records of the posts in `ids`: one query per table, rows of this batch only
+def _records(ids):
+    children = defaultdict(lambda: {"comments": [], "likes": [], "shares": []})
+    comments = Comment.objects.filter(post_id__in=ids).order_by("id")
+    for comment in comments.values("post_id", "id", "user_id", "text", "created_at"):
+        post_id = comment.pop("post_id")
+        children[post_id]["comments"].append({key: _json(value) for key, value in comment.items()})
+    for key, model in (("likes", Like), ("shares", Share)):
+        rows = model.objects.filter(post_id__in=ids).order_by("id")
+        for post_id, user_id, created_at in rows.values_list("post_id", "user_id", "created_at"):
+            children[post_id][key].append({"user_id": user_id, "created_at": _json(created_at)})
+
+    posts = Post.objects.filter(id__in=ids).order_by("created_at", "id").values(*POST_COLUMNS, "author__username")
+    for post in posts:
+        record = {column: _json(post[column]) for column in POST_COLUMNS}
+        # Snapshot of the author's name, in case the account is gone by the time it is read
+        record["author_username"] = post["author__username"]
+        record.update(children[post["id"]])
+        yield record
+
+
+class PostArchive:
+    """
+    Append-only writer for one archival run: `write(ids)` archives a batch of
+    posts before they are deleted.
+
+    Each batch is compressed as one gzip member, flushed to disk and indexed
+    before `write` returns, so a crash never leaves deleted posts unarchived.
+    A post archived twice (a run interrupted between archiving and deleting)
+    is served from its latest copy.
+    """
+
+    def __init__(self):
+        self.name = f"posts-{now():%Y%m%dT%H%M%S%f}.jsonl.gz"
+        self.file = None
+        self.index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, ids):
+        records = list(_records(ids))
+        if not records:
+            return 0
+        if self.file is None:
+            _archive_dir().mkdir(parents=True, exist_ok=True)
+            self.file = open(_archive_dir() / self.name, "ab")
+            self.index = _open_index(create=True)
+
+        lines = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        member = gzip.compress(lines.encode())
+        offset = self.file.seek(0, os.SEEK_END)
+        self.file.write(member)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        with self.index:
+            self.index.executemany(
+                "INSERT OR REPLACE INTO posts (id, file, offset, length) VALUES (?, ?, ?, ?)",
+                [(record["id"], self.name, offset, len(member)) for record in records],
+            )
+        return len(records)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.index.close()
+            self.file = self.index = None
+
+
+def archived_post(post_id):
+    """
+    Read one archived post by id (slow path: an index lookup, then one
+    decompressed batch scanned for the post). Returns the record or None.
+    """
+    index = _open_index()
+    if index is None:
+        return None
+    try:
+        row = index.execute("SELECT file, offset, length FROM posts WHERE id = ?", (post_id,)).fetchone()
+    finally:
+        index.close()
+    if row is None:
+        return None
+
+    name, offset, length = row
+    with open(_archive_dir() / name, "rb") as archive:
+        archive.seek(offset)
+        member = archive.read(length)
+    for line in gzip.decompress(member).splitlines():
+        record = json.loads(line)
+        if record["id"] == post_id:
+            record["created_at"] = parse_datetime(record["created_at"])
+            for comment in record["comments"]:
+                comment["created_at"] = parse_datetime(comment["created_at"])
+            return record
+    return None
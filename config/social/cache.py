@@ -0,0 +1,108 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from utils.cache import add_many
+from utils.tracing import record_cache
+from .models import Post
+
+# Columns stored per cached post, as a plain tuple (no pickled model instances)
+POST_FIELDS = (
+    "id", "author_id", "content", "created_at",
+    "likes_count", "comments_count", "shares_count",
+)
+
+
+def _version_key(post_id):
+    return f"post_version_{post_id}"
+
+
+def _row_key(post_id):
+    return f"post_row_{post_id}"
+
+
+def _new_version():
+    # Seeded from the clock so a re-created (evicted) version never repeats an old one
+    return time.time_ns()
+
+
+def _serialize(post):
+    return tuple(getattr(post, field) for field in POST_FIELDS)
+
+
+def _hydrate(row):
+    return Post.from_db("default", POST_FIELDS, row)
+
+
+def _current_versions(post_ids, cached):
+    versions = {pid: cached.get(_version_key(pid)) for pid in post_ids}
+    unversioned = [pid for pid, version in versions.items() if version is None]
+    if unversioned:
+        # First read (or evicted): claim versions in one batch; a concurrent claim wins via add
+        add_many(
+            {_version_key(pid): _new_version() for pid in unversioned}, timeout=settings.POST_VERSION_TIMEOUT
+        )
+        claimed = cache.get_many([_version_key(pid) for pid in unversioned])
+        for pid in unversioned:
+            versions[pid] = claimed.get(_version_key(pid))
+    return versions
+
+
+def get_posts(post_ids):
+    """
+    Cache-aside multi-get of posts, returned in the order of `post_ids`.
+
+    Each row is stored as (version, row). Writers tag rows with the version
+    they read *before* querying the database and invalidation bumps the
+    version, so a slow reader can never overwrite a newer invalidation with
+    stale data: its row simply stops matching. Posts missing from the
+    database are skipped.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return []
+    keys = [_version_key(pid) for pid in post_ids] + [_row_key(pid) for pid in post_ids]
+    cached = cache.get_many(keys)
+
+    posts = {}
+    missing = []
+    for post_id in post_ids:
+        version = cached.get(_version_key(post_id))
+        entry = cached.get(_row_key(post_id))
+        if version is not None and entry is not None and entry[0] == version:
+            posts[post_id] = _hydrate(entry[1])
+        else:
+            missing.append(post_id)
+    record_cache("post", hits=len(post_ids) - len(missing), misses=len(missing))
+
+    if missing:
+        versions = _current_versions(missing, cached)
+        rows = {}
+        # Filled from the primary: a row read from a lagging replica would stay cached after
+        # the invalidation that should have replaced it
+        for post in Post.objects.using(DEFAULT_DB_ALIAS).select_related("author").filter(id__in=missing):
+            posts[post.id] = post
+            rows[_row_key(post.id)] = (versions[post.id], _serialize(post))
+        cache.set_many(rows, timeout=settings.POST_CACHE_TIMEOUT)
+
+    return [posts[pid] for pid in post_ids if pid in posts]
+
+
+def get_post(post_id):
+    posts = get_posts([post_id])
+    return posts[0] if posts else None
+
+
+def _bump(post_ids):
+    for post_id in post_ids:
+        try:
+            cache.incr(_version_key(post_id))
+        except ValueError:
+            cache.set(_version_key(post_id), _new_version(), timeout=settings.POST_VERSION_TIMEOUT)
+
+
+# Invalidate cached rows once the surrounding transaction has committed
+def invalidate_posts(*post_ids):
+    transaction.on_commit(lambda: _bump(post_ids))
@@ -1,11 +1,168 @@
-from django.utils.timezone import now
 import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import CASCADE
+from django.utils.timezone import now
+
+from utils.metrics import cron_job
+from . import feed, partitions, rollups
+from .archive import PostArchive
+from .cache import invalidate_posts
 from .models import Post
-def clean_old_posts(): #delete posts older than 90 days
-    cutoff_date = now() - datetime.timedelta(days=90)
-    old_posts = Post.objects.filter(created_at__lt=cutoff_date)
-    count = old_posts.count()
-    old_posts.delete()
-    print(f'[cron] Deleted {count} old posts order than {cutoff_date}')
-
-    
+
+logger = logging.getLogger(__name__)
+
+
+def _cascade_children():
+    # (table, column) of every table that cascades from Post: comments, likes, shares, feed entries...
+    return [
+        (rel.related_model._meta.db_table, rel.field.column)
+        for rel in Post._meta.related_objects
+        if rel.on_delete is CASCADE
+    ]
+
+
+def _raw_delete(cursor, table, column, ids):
+    # Plain DELETE ... WHERE <fk> IN (...): no collector, no rows loaded into Python
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(
+        f"DELETE FROM {connection.ops.quote_name(table)} "
+        f"WHERE {connection.ops.quote_name(column)} IN ({placeholders})",
+        ids,
+    )
+    return cursor.rowcount
+
+
+def _count(cursor, table, column, ids):
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(
+        f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)} "
+        f"WHERE {connection.ops.quote_name(column)} IN ({placeholders})",
+        ids,
+    )
+    return cursor.fetchone()[0]
+
+
+@cron_job("clean_old_posts")
+def clean_old_posts(batch_size=None, sleep=None, dry_run=False): # archive and delete posts older than the retention window
+    """
+    Purge posts older than POST_RETENTION_DAYS in small, short transactions.
+
+    Posts are walked oldest first on (created_at, id) in batches of
+    `batch_size`; each batch is first appended to the cold-storage archive
+    (social/archive.py, unless POST_ARCHIVE_DIR is empty), then deletes its
+    children with raw `DELETE ... IN` statements, then the posts, and commits
+    before sleeping `sleep` seconds. Because every batch removes what it
+    processed, an interrupted run resumes where it stopped when started again.
+    With `dry_run` nothing is archived or deleted and the returned stats are
+    what would have been removed. A completed run then expires the comment
+    partitions past the same cutoff (Postgres).
+    """
+    batch_size = batch_size or settings.POST_RETENTION_BATCH_SIZE
+    sleep = settings.POST_RETENTION_BATCH_SLEEP if sleep is None else sleep
+    cutoff_date = now() - datetime.timedelta(days=settings.POST_RETENTION_DAYS)
+    children = _cascade_children()
+
+    stats = {"batches": 0, "posts": 0, "archived": 0}
+    stats.update({table: 0 for table, _ in children})
+    started = time.monotonic()
+    last_key = None
+    archive = PostArchive() if settings.POST_ARCHIVE_DIR and not dry_run else None
+    try:
+        while True:
+            batch = Post.objects.filter(created_at__lt=cutoff_date).order_by("created_at", "id")
+            if last_key:
+                # Only needed when rows are left in place (dry run)
+                created_at, post_id = last_key
+                batch = batch.filter(created_at__gte=created_at).exclude(created_at=created_at, id__lte=post_id)
+            keys = list(batch.values_list("created_at", "id")[:batch_size])
+            if not keys:
+                break
+            ids = [post_id for _, post_id in keys]
+
+            if archive is not None:
+                # Durably archived before anything is deleted
+                stats["archived"] += archive.write(ids)
+            with transaction.atomic(), connection.cursor() as cursor:
+                operation = _count if dry_run else _raw_delete
+                for table, column in children:
+                    stats[table] += operation(cursor, table, column, ids)
+                stats["posts"] += operation(cursor, Post._meta.db_table, "id", ids)
+            if not dry_run:
+                invalidate_posts(*ids)
+
+            stats["batches"] += 1
+            last_key = keys[-1]
+            logger.info(
+                "clean_old_posts batch %d: %d posts (up to %s), %d total",
+                stats["batches"], len(ids), last_key[0], stats["posts"],
+            )
+            if len(keys) < batch_size:
+                break
+            if sleep:
+                time.sleep(sleep)
+    finally:
+        if archive is not None:
+            archive.close()
+    if not dry_run:
+        # Only after every expired post was archived and purged, with the same cutoff
+        stats["partitions_expired"] = expire_partitions(cutoff_date)
+
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    verb = "Would delete" if dry_run else "Deleted"
+    print(f'[cron] {verb} {stats["posts"]} old posts older than {cutoff_date} '
+          f'in {stats["batches"]} batches ({stats["seconds"]}s): {stats}')
+    return stats
+
+
+# Detach (or drop) the monthly partitions entirely older than `cutoff` and than the oldest
+# remaining post: a comment is never older than its post, so such months only hold comments
+# of posts already archived and purged
+def expire_partitions(cutoff):
+    oldest = Post.objects.order_by("created_at").values_list("created_at", flat=True).first()
+    if oldest is not None:
+        cutoff = min(cutoff, oldest)
+    expired = []
+    for table in partitions.PARTITIONED_TABLES:
+        if partitions.is_partitioned(table):
+            with transaction.atomic():
+                expired += partitions.expire_partitions(table, cutoff, keep=settings.PARTITION_DETACH_EXPIRED)
+    return expired
+
+
+@cron_job("manage_partitions")
+def manage_partitions(months_ahead=None): # create the upcoming monthly partitions
+    """
+    Create the next `months_ahead` monthly partitions of each partitioned table.
+
+    Expired months are removed by clean_old_posts once it has archived and
+    purged their posts, never by this job. A no-op on databases without
+    partitioning (SQLite).
+    """
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    current = partitions.month_start(now())
+    created = []
+    for table in partitions.PARTITIONED_TABLES:
+        if not partitions.is_partitioned(table):
+            continue
+        with transaction.atomic():
+            created += partitions.create_partitions(table, current, partitions.add_months(current, months_ahead))
+    print(f"[cron] Created partitions {created}")
+    return {"created": created}
+
+
+@cron_job("update_rollups")
+def update_rollups(batch_size=None): # count new interactions into the hourly/daily rollups
+    stats = rollups.update_rollups(batch_size=batch_size)
+    print(f"[cron] Rolled up {stats}")
+    return stats
+
+
+@cron_job("sync_pulled_authors")
+def sync_pulled_authors(): # start or stop reading authors into feeds as they cross the follower threshold
+    stats = feed.sync_pulled_authors()
+    print(f"[cron] Promoted {stats['promoted']} and released {stats['released']} pulled authors")
+    return stats
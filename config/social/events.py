@@ -0,0 +1,50 @@
+import math
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Channel layer events behind the GraphQL subscriptions (see config/consumers.py). The layer
+# is in-process by default; CHANNEL_LAYER_REDIS_URL swaps in Redis without touching this code.
+
+
+def post_created_group(author_id):
+    return f"post_created_{author_id}"
+
+
+def engagement_group(post_id):
+    return f"post_engagement_{post_id}"
+
+
+def _send(group, event_type, post_id):
+    layer = get_channel_layer()
+    if layer is not None:
+        async_to_sync(layer.group_send)(group, {"type": event_type, "group": group, "post_id": post_id})
+
+
+# Notify postCreated subscribers once the post is committed (robust: a channel layer
+# outage is logged, it does not fail the already committed mutation)
+def publish_post_created(post):
+    transaction.on_commit(
+        lambda: _send(post_created_group(post.author_id), "post.created", post.id), robust=True
+    )
+
+
+def _send_engagement(post_ids):
+    window = settings.GRAPHQL_SUBSCRIPTION_COALESCE_SECONDS
+    for post_id in post_ids:
+        if window > 0:
+            # At most one event per post per half window, across processes. Consumers read the
+            # counts a full window after an event, so the skipped ones are still reflected.
+            bucket = int(time.time() / (window / 2))
+            if not cache.add(f"engagement_event_{post_id}_{bucket}", 1, timeout=math.ceil(window)):
+                continue
+        _send(engagement_group(post_id), "post.engagement", post_id)
+
+
+# Notify postEngagementChanged subscribers once the count changes are committed
+def publish_engagement(*post_ids):
+    transaction.on_commit(lambda: _send_engagement(post_ids), robust=True)
@@ -0,0 +1,69 @@
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from users.models import Follow
+from .models import Comment, Like, Post, Share
+
+# Exportable datasets: model, columns, and the filter selecting one user's rows
+DATASETS = {
+    "posts": (Post, ("id", "author_id", "content", "created_at", "likes_count", "comments_count", "shares_count"),
+              lambda user: Q(author=user)),
+    "comments": (Comment, ("id", "post_id", "user_id", "text", "created_at"), lambda user: Q(user=user)),
+    "likes": (Like, ("id", "post_id", "user_id", "created_at"), lambda user: Q(user=user)),
+    "shares": (Share, ("id", "post_id", "user_id", "created_at"), lambda user: Q(user=user)),
+    "follows": (Follow, ("id", "follower_id", "following_id", "created_at"),
+                lambda user: Q(follower=user) | Q(following=user)),
+}
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class Echo:
+    """File-like object whose write() returns what it was given, so csv.writer can build lines."""
+
+    def write(self, value):
+        return value
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def rows(dataset, user=None, chunk_size=None):
+    """
+    Rows of `dataset` as tuples in primary-key order, all of them or only `user`'s.
+
+    `iterator(chunk_size)` reads through a server-side cursor on Postgres
+    (and in chunks elsewhere), so memory stays flat however many rows match.
+    """
+    model, columns, user_filter = DATASETS[dataset]
+    queryset = model.objects.order_by("id")
+    if user is not None:
+        queryset = queryset.filter(user_filter(user))
+    return queryset.values_list(*columns).iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE)
+
+
+def stream(dataset, fmt, user=None, chunk_size=None):
+    """Yield the export of `dataset` as NDJSON or CSV text, one chunk of lines at a time."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    columns = DATASETS[dataset][1]
+    if fmt == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+
+        def line(row):
+            return writer.writerow([_value(value) for value in row])
+    else:
+        def line(row):
+            return json.dumps({column: _value(value) for column, value in zip(columns, row)}) + "\n"
+
+    lines = map(line, rows(dataset, user, chunk_size))
+    while True:
+        chunk = "".join(islice(lines, chunk_size))
+        if not chunk:
+            break
+        yield chunk
@@ -0,0 +1,211 @@
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils.timezone import now
+
+from users.models import Follow
+from utils.cache import get_or_compute
+from utils.pagination import Keyset
+from .models import Post, FeedEntry, PulledAuthor
+
+CELEBRITY_CACHE_KEY = "feed_celebrity_ids"
+CELEBRITY_CACHE_TIMEOUT = 300
+FANOUT_BATCH_SIZE = 1000
+
+
+# Authors whose posts are merged in at read time (too many followers to fan out)
+def celebrity_ids():
+    return get_or_compute(
+        CELEBRITY_CACHE_KEY, _compute_celebrity_ids, timeout=CELEBRITY_CACHE_TIMEOUT, name="celebrities"
+    )
+
+
+def _compute_celebrity_ids():
+    # Read only: PulledAuthor is kept up to date by the follow mutations and sync_pulled_authors
+    return set(PulledAuthor.objects.filter(author__is_active=True).values_list("author_id", flat=True))
+
+
+def _forget_celebrities():
+    # After commit, so a recompute cannot cache the set from before this transaction
+    transaction.on_commit(lambda: cache.delete(CELEBRITY_CACHE_KEY))
+
+
+# Start pulling the posts of followed authors that now have more than FEED_FANOUT_MAX_FOLLOWERS
+def promote_authors(*author_ids):
+    threshold = settings.FEED_FANOUT_MAX_FOLLOWERS
+    # Bounded probe: the (threshold + 1)-th follower of each author, read from the following_id index
+    promoted = [
+        author_id for author_id in author_ids
+        if Follow.objects.filter(following_id=author_id).values("id")[threshold:threshold + 1].exists()
+    ]
+    if promoted:
+        PulledAuthor.objects.bulk_create(
+            [PulledAuthor(author_id=author_id) for author_id in promoted], ignore_conflicts=True
+        )
+        _forget_celebrities()
+    return promoted
+
+
+def _insert_entries(entries):
+    # Entries that already exist are skipped thanks to the unique_feed_entry constraint
+    FeedEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+# Copy `posts` [(id, created_at)] of an author into every follower's inbox
+def _deliver(author_id, posts):
+    if not posts:
+        return 0
+    follower_ids = Follow.objects.filter(following_id=author_id).values_list(
+        "follower_id", flat=True
+    )
+    batch = []
+    delivered = 0
+    for follower_id in follower_ids.iterator(chunk_size=FANOUT_BATCH_SIZE):
+        batch.extend(
+            FeedEntry(user_id=follower_id, post_id=post_id, author_id=author_id, created_at=created_at)
+            for post_id, created_at in posts
+        )
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            _insert_entries(batch)
+            delivered += len(batch)
+            batch = []
+    if batch:
+        _insert_entries(batch)
+        delivered += len(batch)
+    return delivered
+
+
+def _recent_posts(author_id, since=None):
+    posts = Post.objects.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(created_at__gte=since)
+    return list(posts.order_by("-created_at").values_list("id", "created_at")[: settings.FEED_BACKFILL_SIZE])
+
+
+# Copy a new post into every follower's inbox (fan-out-on-write)
+def fan_out_post(post):
+    if post.author_id in celebrity_ids():
+        return 0
+    return _deliver(post.author_id, [(post.id, post.created_at)])
+
+
+def sync_pulled_authors():
+    """
+    Reconcile PulledAuthor with follower counts, returning
+    {"promoted": n, "released": n}.
+
+    Authors above FEED_FANOUT_MAX_FOLLOWERS that are not pulled yet (their
+    followers were added outside the follow mutations) start being pulled.
+    Authors that dropped to the threshold or below go back to
+    fan-out-on-write: each follower's inbox is first backfilled with their
+    recent posts while feeds still pull them, and the posts written while
+    that ran are delivered once they have left the celebrity set.
+    """
+    above = set(
+        Follow.objects.filter(following__is_active=True)
+        .values("following_id")
+        .annotate(total=Count("id"))
+        .filter(total__gt=settings.FEED_FANOUT_MAX_FOLLOWERS)
+        .values_list("following_id", flat=True)
+    )
+    pulled = dict(PulledAuthor.objects.values_list("author_id", "author__is_active"))
+    missing = above - set(pulled)
+    if missing:
+        PulledAuthor.objects.bulk_create([PulledAuthor(author_id=author_id) for author_id in missing])
+        cache.delete(CELEBRITY_CACHE_KEY)
+
+    released = 0
+    for author_id, is_active in pulled.items():
+        if author_id in above:
+            continue
+        started = now()
+        if is_active:
+            _deliver(author_id, _recent_posts(author_id))
+        PulledAuthor.objects.filter(author_id=author_id).delete()
+        cache.delete(CELEBRITY_CACHE_KEY)
+        if is_active:
+            _deliver(author_id, _recent_posts(author_id, since=started))
+        released += 1
+    return {"promoted": len(missing), "released": released}
+
+
+# Seed an inbox with the recent posts of a newly followed author
+def backfill_follow(user_id, author_id):
+    if author_id in celebrity_ids():
+        return 0
+
+    entries = [
+        FeedEntry(user_id=user_id, post_id=post_id, author_id=author_id, created_at=created_at)
+        for post_id, created_at in _recent_posts(author_id)
+    ]
+    _insert_entries(entries)
+    return len(entries)
+
+
+# Remove an unfollowed author's posts from an inbox
+def prune_unfollow(user_id, author_id):
+    deleted, _ = FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    return deleted
+
+
+# Drop deactivated authors from every inbox (and their own inboxes) and from the celebrity set
+# in chunks of `batch_size`, each DELETE committed on its own so no lock is held for long
+def purge_authors(author_ids, batch_size=FANOUT_BATCH_SIZE):
+    cache.delete(CELEBRITY_CACHE_KEY)
+    deleted = 0
+    for column in ("author_id", "user_id"):
+        entries = FeedEntry.objects.filter(**{f"{column}__in": author_ids})
+        while True:
+            ids = list(entries.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            count, _ = FeedEntry.objects.filter(id__in=ids).delete()
+            if column == "author_id":
+                deleted += count
+    return deleted
+
+
+# Sort key shared by every feed source: entry timestamp (a copy of the post's) and post id
+FEED_KEYSET = Keyset(("feed_entries__created_at", "created_at"), "id")
+PULLED_KEYSET = Keyset("created_at", "id")
+
+
+# (queryset, keyset) sources of a user's feed: the inbox, plus posts of followed celebrities
+def feed_sources(user, queryset):
+    inbox = queryset.filter(feed_entries__user=user)
+
+    celebrities = celebrity_ids()
+    followed_celebrities = []
+    if celebrities:
+        followed_celebrities = list(
+            user.following.filter(following_id__in=celebrities).values_list("following_id", flat=True)
+        )
+    if not followed_celebrities:
+        # Common case: one indexed range scan over the inbox
+        return [(inbox, FEED_KEYSET)]
+
+    # Older inbox entries of authors that became celebrities are skipped to avoid duplicates
+    inbox = inbox.exclude(author_id__in=followed_celebrities)
+    pulled = queryset.filter(author_id__in=followed_celebrities)
+    return [(inbox, FEED_KEYSET), (pulled, PULLED_KEYSET)]
+
+
+# Posts for a user's personalized feed, newest first
+def feed_posts(user, queryset, limit=None, offset=None):
+    offset = offset or 0
+    stop = offset + limit if limit else None
+
+    sources = feed_sources(user, queryset)
+    if len(sources) == 1:
+        qs, keyset = sources[0]
+        return keyset.order(qs)[offset:stop]
+
+    # Fan-out-on-read for followed celebrities, merged with the inbox by recency
+    merged = heapq.merge(
+        *[keyset.order(qs)[:stop] for qs, keyset in sources],
+        key=PULLED_KEYSET.values, reverse=True,
+    )
+    return list(merged)[offset:stop]
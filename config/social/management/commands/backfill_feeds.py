@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from users.models import Follow
+from social.feed import backfill_follow
+
+
+class Command(BaseCommand):
+    help = "Seed personalized feed inboxes from existing follow relationships."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of follow rows read per chunk (default: 1000).",
+        )
+
+    def handle(self, *args, batch_size=1000, **options):
+        follows = Follow.objects.order_by("id").values_list("follower_id", "following_id")
+        seeded = 0
+        # Entries already present are skipped, so the command can be re-run safely
+        for follower_id, following_id in follows.iterator(chunk_size=batch_size):
+            seeded += backfill_follow(follower_id, following_id)
+
+        self.stdout.write(self.style.SUCCESS(f"Seeded {seeded} feed entries"))
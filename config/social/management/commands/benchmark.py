@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from utils import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the GraphQL operations against the current database and write a JSON report "
+        "(p50/p95/p99 latency, SQL queries and peak memory per operation). Mutations write data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50, help="Timed runs per operation (default: 50).")
+        parser.add_argument("--warmup", type=int, default=5, help="Untimed runs per operation (default: 5).")
+        parser.add_argument(
+            "--operations",
+            help="Comma-separated operation names (default: all of "
+                 + ", ".join(op.name for op in benchmark.OPERATIONS) + ").",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for the sampled users and posts.")
+        parser.add_argument("--output", help="Report path (default: benchmark-<timestamp>.json).")
+        parser.add_argument("--compare", help="Previous report to compare against.")
+
+    def handle(self, *args, **options):
+        operations = None
+        if options["operations"]:
+            operations = set(options["operations"].split(","))
+            unknown = operations - {op.name for op in benchmark.OPERATIONS}
+            if unknown:
+                raise CommandError(f"Unknown operations: {', '.join(sorted(unknown))}")
+
+        try:
+            report = benchmark.run(operations, options["iterations"], options["warmup"], options["seed"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                report["comparison"] = benchmark.compare(json.load(f), report)
+
+        output = options["output"] or f"benchmark-{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+        for name, result in report["operations"].items():
+            line = (
+                f"{name:<22} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+                f"p99 {result['p99_ms']:>8.2f}ms  {result['queries_mean']:>6.1f} queries  "
+                f"{result['peak_memory_kib']:>8.1f} KiB"
+            )
+            change = report.get("comparison", {}).get(name)
+            if change and change["p95_ms"] is not None:
+                line += f"  (p95 {change['p95_ms']:+.1f}%)"
+            if result["errors"]:
+                line += f"  {result['errors']} errors"
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {output}"))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from social.cron import clean_old_posts
+
+
+class Command(BaseCommand):
+    help = "Purge posts older than POST_RETENTION_DAYS (the daily cron job), in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of posts deleted per transaction (default: POST_RETENTION_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=None,
+            help="Seconds to pause between batches (default: POST_RETENTION_BATCH_SLEEP).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count what would be deleted.",
+        )
+
+    def handle(self, *args, batch_size=None, sleep=None, dry_run=False, **options):
+        stats = clean_old_posts(batch_size=batch_size, sleep=sleep, dry_run=dry_run)
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {stats['posts']} posts in {stats['batches']} batches"))
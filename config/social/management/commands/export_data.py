@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from social.export import DATASETS, FORMATS, stream
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Stream a dataset (posts, comments, likes, shares, follows) as NDJSON or CSV, whole or for one user."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=list(DATASETS))
+        parser.add_argument(
+            "--format", choices=list(FORMATS), default="ndjson", help="Output format (default: ndjson)."
+        )
+        parser.add_argument("--user", help="Only export the rows of this username.")
+        parser.add_argument("--output", help="File to write to (default: stdout).")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help="Rows fetched per round trip (default: EXPORT_CHUNK_SIZE).",
+        )
+
+    def handle(self, *args, dataset, format, user=None, output=None, chunk_size=None, **options):
+        if user is not None:
+            try:
+                user = User.objects.get(username=user)
+            except User.DoesNotExist:
+                raise CommandError(f"User {user!r} not found")
+
+        chunks = stream(dataset, format, user=user, chunk_size=chunk_size)
+        if not output:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(output, "w", newline="", encoding="utf-8") as out:
+            for chunk in chunks:
+                out.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Exported {dataset} to {output}"))
@@ -0,0 +1,141 @@
+import bisect
+import itertools
+import random
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import User, Follow
+from social.models import Post, Comment, Like, Share
+
+
+def zipf_weights(n, exponent):
+    # Cumulative weights of a Zipf law: item i is picked with probability ∝ 1 / (i + 1) ** exponent
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+
+def pick(rng, items, cum_weights):
+    return items[bisect.bisect(cum_weights, rng.random() * cum_weights[-1])]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic social graph for benchmarks: users with power-law follower counts, "
+        "posts, likes, comments and shares, written with bulk inserts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Users to create (default: 1000).")
+        parser.add_argument("--posts", type=int, default=10000, help="Posts to create (default: 10000).")
+        parser.add_argument(
+            "--follows-per-user", type=int, default=50,
+            help="Average number of accounts each user follows (default: 50).",
+        )
+        parser.add_argument(
+            "--interactions", type=int, default=50000,
+            help="Likes + comments + shares to create, split 6:3:1 (default: 50000).",
+        )
+        parser.add_argument(
+            "--exponent", type=float, default=1.1,
+            help="Zipf exponent of follower and engagement popularity (default: 1.1).",
+        )
+        parser.add_argument("--days", type=int, default=30, help="Spread posts over the last N days (default: 30).")
+        parser.add_argument("--prefix", default="bench", help="Username prefix (default: bench).")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed, for reproducible datasets.")
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Rows per INSERT statement (default: 5000).",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+        exponent = options["exponent"]
+        now = timezone.now()
+
+        before = {model: model.objects.count() for model in (Follow, Like, Comment, Share)}
+        user_ids = self.create_users(options["users"], options["prefix"], batch_size)
+        # Popularity rank is independent of the id so celebrities are spread over the table
+        ranked_ids = rng.sample(user_ids, len(user_ids))
+        user_weights = zipf_weights(len(ranked_ids), exponent)
+
+        self.create_follows(rng, ranked_ids, user_weights, options["follows_per_user"], batch_size)
+        posts = self.create_posts(rng, ranked_ids, user_weights, options["posts"], options["days"], now, batch_size)
+        self.create_interactions(rng, user_ids, posts, options["interactions"], exponent, now, batch_size)
+        # Rows dropped by unique constraints are not counted
+        created = {model: model.objects.count() - count for model, count in before.items()}
+
+        # Derived data: denormalized counters, trending scores, feed inboxes, rollups
+        # (the search index is maintained by the database as rows are inserted)
+        for command in ("rebuild_post_counters", "rebuild_trending", "backfill_feeds", "update_rollups"):
+            call_command(command, stdout=StringIO())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(user_ids)} users, {created[Follow]} follows, {len(posts)} posts, "
+            f"{created[Like]} likes, {created[Comment]} comments, {created[Share]} shares"
+        ))
+
+    def create_users(self, count, prefix, batch_size):
+        start = User.objects.filter(username__startswith=prefix).count()
+        password = make_password("benchmark")  # hashed once, shared by every generated user
+        usernames = [f"{prefix}{start + i}" for i in range(count)]
+        User.objects.bulk_create(
+            [
+                User(username=username, email=f"{username}@example.com", password=password, last_login=timezone.now())
+                for username in usernames
+            ],
+            batch_size=batch_size,
+        )
+        return list(User.objects.filter(username__in=usernames).values_list("id", flat=True))
+
+    def create_follows(self, rng, ranked_ids, cum_weights, per_user, batch_size):
+        batch = []
+        for follower_id in ranked_ids:
+            # Out-degree varies around the mean; in-degree follows the popularity law
+            targets = {pick(rng, ranked_ids, cum_weights) for _ in range(int(rng.expovariate(1 / per_user)) + 1)}
+            targets.discard(follower_id)
+            batch += [Follow(follower_id=follower_id, following_id=target) for target in targets]
+            if len(batch) >= batch_size:
+                Follow.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        Follow.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def create_posts(self, rng, ranked_ids, cum_weights, count, days, now, batch_size):
+        span = days * 24 * 3600
+        posts = [
+            Post(
+                author_id=pick(rng, ranked_ids, cum_weights),
+                content=f"Synthetic post #{i}",
+                created_at=now - timedelta(seconds=rng.randrange(span)),
+            )
+            for i in range(count)
+        ]
+        return [(post.id, post.created_at) for post in Post.objects.bulk_create(posts, batch_size=batch_size)]
+
+    def create_interactions(self, rng, user_ids, posts, count, exponent, now, batch_size):
+        if not posts:
+            return
+        ranked_posts = rng.sample(posts, len(posts))
+        cum_weights = zipf_weights(len(ranked_posts), exponent)
+
+        def rows(model, total, **extra):
+            for _ in range(total):
+                post_id, posted_at = pick(rng, ranked_posts, cum_weights)
+                yield model(
+                    user_id=rng.choice(user_ids),
+                    post_id=post_id,
+                    # Engagement happens some time between publication and now
+                    created_at=posted_at + (now - posted_at) * rng.random(),
+                    **extra,
+                )
+
+        likes, comments = count * 6 // 10, count * 3 // 10
+        shares = count - likes - comments
+        # Duplicate (user, post) likes and shares are dropped by their unique constraints
+        Like.objects.bulk_create(rows(Like, likes), batch_size=batch_size, ignore_conflicts=True)
+        Comment.objects.bulk_create(rows(Comment, comments, text="Nice!"), batch_size=batch_size)
+        Share.objects.bulk_create(rows(Share, shares), batch_size=batch_size, ignore_conflicts=True)
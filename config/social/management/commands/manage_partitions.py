@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from social.cron import manage_partitions
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly partitions (the daily cron job, Postgres only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=None,
+            help="Number of future months to create partitions for (default: PARTITION_MONTHS_AHEAD).",
+        )
+
+    def handle(self, *args, months_ahead=None, **options):
+        stats = manage_partitions(months_ahead=months_ahead)
+        self.stdout.write(self.style.SUCCESS(f"Created {len(stats['created'])} partitions"))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from social.cache import invalidate_posts
+from social.models import Post, Comment, Like, Share
+
+
+def _count_subquery(model):
+    # Correlated COUNT(*) over one interaction table, 0 when there are no rows
+    counts = (
+        model.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized likes/comments/shares counters on Post from the raw tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts updated per transaction (default: 1000).",
+        )
+
+    def handle(self, *args, batch_size=1000, **options):
+        last_id = 0
+        updated = 0
+        while True:
+            # Walk the posts table in primary-key order so each batch is a short transaction
+            ids = list(
+                Post.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += Post.objects.filter(id__in=ids).update(
+                    likes_count=_count_subquery(Like),
+                    comments_count=_count_subquery(Comment),
+                    shares_count=_count_subquery(Share),
+                )
+                invalidate_posts(*ids)
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {updated} posts"))
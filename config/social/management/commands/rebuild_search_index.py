@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from social.models import Post
+from social.search import index_posts, regenerate_search_vector
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of post contents (e.g. after changing SEARCH_CONFIG)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts indexed per transaction (default: 1000).",
+        )
+
+    def handle(self, *args, batch_size=1000, **options):
+        if connection.vendor == "postgresql":
+            # The generated column follows every write; only its expression can go stale
+            regenerate_search_vector()
+            self.stdout.write(self.style.SUCCESS(f"Regenerated the search index with {settings.SEARCH_CONFIG}"))
+            return
+
+        last_id = 0
+        indexed = 0
+        while True:
+            # Walk the posts table in primary-key order so each batch is a short transaction
+            ids = list(
+                Post.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                index_posts(*ids)
+            indexed += len(ids)
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} posts for search"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from social.trending import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the time-decayed trending scores from the raw likes/comments/shares tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts rescored per batch (default: 1000).",
+        )
+
+    def handle(self, *args, batch_size=1000, **options):
+        rebuilt = rebuild(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt trending scores for {rebuilt} posts"))
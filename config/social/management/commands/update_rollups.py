@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from social.cron import update_rollups
+
+
+class Command(BaseCommand):
+    help = "Count posts and interactions added since the last run into the hourly/daily rollups (the cron job)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of source rows counted per transaction (default: ROLLUP_BATCH_SIZE).",
+        )
+
+    def handle(self, *args, batch_size=None, **options):
+        stats = update_rollups(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {sum(stats.values())} new rows"))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0005_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='social.post')),
+                ('score', models.FloatField(db_index=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Trending score',
+                'verbose_name_plural': 'Trending scores',
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import migrations
+
+FTS_TABLE = "social_post_fts"
+
+# SQLite triggers copying every write on social_post into the FTS5 table. A later migration that
+# makes Django rebuild social_post on SQLite drops them and must create them again.
+TRIGGERS = {
+    "social_post_fts_insert": (
+        f"AFTER INSERT ON social_post BEGIN "
+        f"INSERT INTO {FTS_TABLE} (rowid, content) VALUES (new.id, new.content); END"
+    ),
+    "social_post_fts_update": (
+        f"AFTER UPDATE OF content ON social_post BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; "
+        f"INSERT INTO {FTS_TABLE} (rowid, content) VALUES (new.id, new.content); END"
+    ),
+    "social_post_fts_delete": (
+        f"AFTER DELETE ON social_post BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+    ),
+}
+
+
+# Full-text index of Post.content (see social/search.py), maintained by the database on every write:
+#   Postgres: a stored generated tsvector column with a GIN index, computed in the one table rewrite
+#   SQLite:   an FTS5 table filled from the existing posts, then kept in step by triggers
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        # The expression must be immutable, so the configuration is spelled out as a literal
+        search_config = schema_editor.quote_value(settings.SEARCH_CONFIG)
+        schema_editor.execute(
+            "ALTER TABLE social_post ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+            f"(to_tsvector({search_config}::regconfig, content)) STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX social_post_search_vector_gin ON social_post USING GIN (search_vector)"
+        )
+    elif connection.vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(content, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE} (rowid, content) SELECT id, content FROM social_post")
+        for name, definition in TRIGGERS.items():
+            schema_editor.execute(f"CREATE TRIGGER {name} {definition}")
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        schema_editor.execute("ALTER TABLE social_post DROP COLUMN search_vector")
+    elif connection.vendor == "sqlite":
+        for name in TRIGGERS:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        schema_editor.execute(f"DROP TABLE {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0006_trendingscore'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+TABLE = "social_comment"
+
+
+# Month helpers, frozen here rather than imported: app code may change after this migration ships
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+
+
+# Rebuild social_comment as a table range-partitioned by created_at month (Postgres only).
+# The primary key becomes (id, created_at); Django keeps addressing rows by id alone.
+def partition_comments(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE])
+        if cursor.fetchone() is not None:
+            return
+        # Index and foreign key definitions, re-created under their Django names at the end
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            [TABLE, f"{TABLE}_pkey"],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT MIN(created_at), COALESCE(MAX(id), 0) FROM {TABLE}")
+        oldest, max_id = cursor.fetchone()
+
+    legacy = f"{TABLE}_unpartitioned"
+    schema_editor.execute(f"ALTER TABLE {TABLE} RENAME TO {legacy}")
+    schema_editor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+    # Identity columns on partitioned tables need Postgres 17: use a plain sequence
+    schema_editor.execute(
+        f"CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+    )
+    schema_editor.execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+    schema_editor.execute(f"SELECT setval('{TABLE}_id_seq', %s + 1, false)", [max_id])
+    schema_editor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+    schema_editor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)")
+
+    # Months holding existing rows up to PARTITION_MONTHS_AHEAD ahead; anything outside lands
+    # in the default partition until `manage.py manage_partitions` creates its month
+    now = timezone.now()
+    month, last = month_start(oldest or now), month_start(add_months(now, settings.PARTITION_MONTHS_AHEAD))
+    while month <= last:
+        schema_editor.execute(
+            f"CREATE TABLE {TABLE}_y{month:%Y}m{month:%m} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)",
+            [month, add_months(month, 1)],
+        )
+        month = add_months(month, 1)
+    schema_editor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+
+    schema_editor.execute(f"INSERT INTO {TABLE} SELECT * FROM {legacy}")
+    schema_editor.execute(f"DROP TABLE {legacy}")
+    for definition in indexes:
+        schema_editor.execute(definition)
+    for name, definition in foreign_keys:
+        schema_editor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0007_post_search'),
+    ]
+
+    operations = [
+        # Not reversed: the partitioned table serves the same queries, and re-applying is a no-op
+        migrations.RunPython(partition_comments, migrations.RunPython.noop),
+    ]
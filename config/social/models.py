@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 
@@ -16,6 +17,11 @@ class Post(models.Model):
     content = models.TextField()
     # Timestamp when the post was created
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Denormalized engagement counters (kept in sync by the interaction mutations,
+    # rebuilt from the raw tables with `manage.py rebuild_post_counters`)
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    shares_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         # Add DB indexes for faster queries
@@ -30,18 +36,25 @@ class Post(models.Model):
     def __str__(self):
         return f"Post by {self.author} at {self.created_at:%Y-%m-%d %H:%M}"
 
-    # Computed properties (convenience + annotated compatibility)
-    @property
-    def likes_count(self):
-        return getattr(self, "likes_count", self.likes.count())
-
-    @property
-    def comments_count(self):
-        return getattr(self, "comments_count", self.comments.count())
-
-    @property
-    def shares_count(self):
-        return getattr(self, "shares_count", self.shares.count())
+    # Atomically adjust the stored counters, e.g. Post.adjust_counts(post.id, likes=1)
+    @classmethod
+    def adjust_counts(cls, post_id, likes=0, comments=0, shares=0):
+        qs = cls.objects.filter(pk=post_id)
+        changes = {}
+        for field, delta in (
+            ("likes_count", likes),
+            ("comments_count", comments),
+            ("shares_count", shares),
+        ):
+            if not delta:
+                continue
+            changes[field] = F(field) + delta
+            if delta < 0:
+                # Never let a decrement push a counter below zero
+                qs = qs.filter(**{f"{field}__gte": -delta})
+        if not changes:
+            return 0
+        return qs.update(**changes)
 
     @property
     def popularity_score(self):
@@ -120,3 +133,128 @@ class Share(models.Model):
 
     def __str__(self):
         return f"{self.user} shared Post {self.post_id}"
+
+
+# Feed Entry Model (materialized personalized feed, filled on write by social.feed)
+class FeedEntry(models.Model):
+    # Owner of the feed inbox
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="feed_entries")
+    # Post delivered to the inbox
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="feed_entries")
+    # Denormalized author so unfollows can prune without touching posts
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    # Copy of the post's timestamp so the feed is a single range scan on this table
+    created_at = models.DateTimeField()
+
+    class Meta:
+        # A post lands in each inbox at most once
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="unique_feed_entry")
+        ]
+        indexes = [
+            models.Index(fields=["user", "-created_at"]),  # reading a feed
+            models.Index(fields=["user", "author"]),       # pruning on unfollow
+        ]
+        ordering = ["-created_at"]
+        verbose_name = "Feed entry"
+        verbose_name_plural = "Feed entries"
+
+    def __str__(self):
+        return f"Post {self.post_id} in feed of user {self.user_id}"
+
+
+# Pulled Author Model (authors above FEED_FANOUT_MAX_FOLLOWERS, read into feeds by social.feed)
+class PulledAuthor(models.Model):
+    # Author whose posts are merged into feeds at read time instead of being fanned out
+    author = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="+")
+    # When the author crossed FEED_FANOUT_MAX_FOLLOWERS
+    since = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Pulled author"
+        verbose_name_plural = "Pulled authors"
+
+    def __str__(self):
+        return f"Posts of user {self.author_id} pulled since {self.since}"
+
+
+# Trending Score Model (incrementally maintained leaderboard, see social/trending.py)
+class TrendingScore(models.Model):
+    # One row per post that has received engagement
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True, related_name="trending"
+    )
+    # Log of the time-decayed weighted engagement, comparable across posts at any moment
+    score = models.FloatField(db_index=True)
+    # Timestamp of the last engagement event applied
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Trending score"
+        verbose_name_plural = "Trending scores"
+
+    def __str__(self):
+        return f"Post {self.post_id} trending score {self.score:.3f}"
+
+
+# Rollup periods: engagement and activity are pre-aggregated per hour and per day (social/rollups.py)
+ROLLUP_PERIODS = [("hour", "Hour"), ("day", "Day")]
+
+
+# Post Engagement Rollup Model (interactions a post received per hour/day)
+class PostEngagementRollup(models.Model):
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIODS)
+    # Start of the hour/day (UTC)
+    bucket = models.DateTimeField()
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="engagement_rollups")
+    likes = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    shares = models.PositiveIntegerField(default=0)
+    # Weighted like popularity_score: likes=1, comments=2, shares=3
+    score = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "bucket", "post"], name="unique_post_engagement_rollup")
+        ]
+        # The unique constraint's index serves the window scans (period, bucket range)
+        verbose_name = "Post engagement rollup"
+        verbose_name_plural = "Post engagement rollups"
+
+    def __str__(self):
+        return f"Post {self.post_id} {self.period} {self.bucket:%Y-%m-%d %H:%M}: {self.score}"
+
+
+# User Activity Rollup Model (posts written and interactions made by a user per hour/day)
+class UserActivityRollup(models.Model):
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIODS)
+    # Start of the hour/day (UTC)
+    bucket = models.DateTimeField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="activity_rollups")
+    posts = models.PositiveIntegerField(default=0)
+    likes = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    shares = models.PositiveIntegerField(default=0)
+    # All of the above
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "bucket", "user"], name="unique_user_activity_rollup")
+        ]
+        verbose_name = "User activity rollup"
+        verbose_name_plural = "User activity rollups"
+
+    def __str__(self):
+        return f"User {self.user_id} {self.period} {self.bucket:%Y-%m-%d %H:%M}: {self.total}"
+
+
+# Rollup Watermark Model (last row of each source table already counted into the rollups)
+class RollupWatermark(models.Model):
+    # Source table, e.g. "social_like"
+    source = models.CharField(max_length=64, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.source} up to id {self.last_id}"
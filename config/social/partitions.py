@@ -0,0 +1,89 @@
+import datetime
+import logging
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Tables range-partitioned by created_at month on Postgres (migration 0008). Postgres requires
+# the partition key in every unique constraint, so only tables that lose nothing by it qualify:
+# posts stay regular because foreign keys need `id` alone to be unique, and likes, shares and
+# feed entries because they are unique per (post, user).
+PARTITIONED_TABLES = ("social_comment",)
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+
+
+def partition_name(table, month):
+    return f"{table}_y{month:%Y}m{month:%m}"
+
+
+def is_partitioned(table):
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table]
+        )
+        return cursor.fetchone() is not None
+
+
+# Monthly partitions of `table` as (name, month start), oldest first, read from the catalog
+def partitions(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    found = []
+    for name in names:
+        suffix = name[len(table):]
+        try:
+            month = datetime.datetime.strptime(suffix, "_y%Ym%m").replace(tzinfo=datetime.timezone.utc)
+        except ValueError:
+            # The default partition (or a table attached by hand)
+            continue
+        found.append((name, month))
+    return sorted(found, key=lambda item: item[1])
+
+
+# Create the partitions of `table` for every month from `first` to `last` (month starts)
+def create_partitions(table, first, last):
+    created = []
+    qn = connection.ops.quote_name
+    month = month_start(first)
+    with connection.cursor() as cursor:
+        while month <= last:
+            name = partition_name(table, month)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is None:
+                cursor.execute(
+                    f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} FOR VALUES FROM (%s) TO (%s)",
+                    [month, add_months(month, 1)],
+                )
+                created.append(name)
+            month = add_months(month, 1)
+    return created
+
+
+# Detach (and unless `keep`, drop) the partitions of `table` whose rows are all older than `cutoff`
+def expire_partitions(table, cutoff, keep=False):
+    expired = [name for name, month in partitions(table) if add_months(month, 1) <= cutoff]
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for name in expired:
+            cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+            if not keep:
+                cursor.execute(f"DROP TABLE {qn(name)}")
+            logger.info("%s partition %s of %s", "Detached" if keep else "Dropped", name, table)
+    return expired
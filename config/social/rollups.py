@@ -0,0 +1,157 @@
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Comment, Like, Post, PostEngagementRollup, RollupWatermark, Share, UserActivityRollup
+from .trending import WEIGHTS
+
+# Source tables counted into the rollups: (model, counter, post column or None, user column)
+SOURCES = [
+    (Post, "posts", None, "author_id"),
+    (Like, "likes", "post_id", "user_id"),
+    (Comment, "comments", "post_id", "user_id"),
+    (Share, "shares", "post_id", "user_id"),
+]
+
+PERIODS = {"hour": datetime.timedelta(hours=1), "day": datetime.timedelta(days=1)}
+
+# GraphQL windows: the rollup period read and how many buckets (the current one included)
+WINDOWS = {"day": ("hour", 24), "week": ("day", 7), "month": ("day", 30)}
+
+
+def bucket_start(value, period):
+    value = value.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0) if period == "day" else value
+
+
+def _apply(model, key_field, counts, fields):
+    """
+    Add `counts` {(period, bucket, key): Counter} onto the rollup rows of `model`,
+    creating the missing ones. Runs under the watermark locks, so read-modify-write is safe.
+    """
+    if not counts:
+        return
+    existing = {
+        (row.period, row.bucket, getattr(row, key_field)): row
+        for row in model.objects.filter(
+            period__in={period for period, _, _ in counts},
+            bucket__in={bucket for _, bucket, _ in counts},
+            **{f"{key_field}__in": {key for _, _, key in counts}},
+        )
+    }
+    created, updated = [], []
+    for (period, bucket, key), delta in counts.items():
+        row = existing.get((period, bucket, key))
+        if row is None:
+            created.append(model(period=period, bucket=bucket, **{key_field: key}, **delta))
+            continue
+        for field, value in delta.items():
+            setattr(row, field, getattr(row, field) + value)
+        updated.append(row)
+    model.objects.bulk_create(created)
+    model.objects.bulk_update(updated, fields)
+
+
+def _roll_up_batch(model, counter, post_column, user_column, after_id, batch_size, settled):
+    rows = list(
+        model.objects.filter(id__gt=after_id)
+        .order_by("id")
+        .values_list("id", "created_at", post_column or "id", user_column)[:batch_size]
+    )
+    # Rows are taken in id order up to the first one still inside the settle window, so a
+    # transaction that committed a lower id late is not skipped over
+    for index, (_, created_at, _, _) in enumerate(rows):
+        if created_at >= settled:
+            rows = rows[:index]
+            break
+    if not rows:
+        return None, 0
+
+    weight = WEIGHTS.get(model, 0)
+    engagement, activity = {}, {}
+    for _, created_at, post_id, user_id in rows:
+        for period in PERIODS:
+            bucket = bucket_start(created_at, period)
+            if post_column:
+                engagement.setdefault((period, bucket, post_id), Counter()).update({counter: 1, "score": weight})
+            activity.setdefault((period, bucket, user_id), Counter()).update({counter: 1, "total": 1})
+    _apply(PostEngagementRollup, "post_id", engagement, ["likes", "comments", "shares", "score"])
+    _apply(UserActivityRollup, "user_id", activity, ["posts", "likes", "comments", "shares", "total"])
+    return rows[-1][0], len(rows)
+
+
+def update_rollups(batch_size=None):
+    """
+    Count the rows added to the source tables since their watermark into the
+    hourly and daily rollups, one short transaction per batch.
+
+    Every batch locks all watermarks first, so overlapping runs queue up
+    instead of counting rows twice, and advances its source's watermark in
+    the same transaction as the counts. Rows younger than
+    ROLLUP_SETTLE_SECONDS wait for the next run. Rollups count events:
+    removing a like later does not subtract it. Hourly rows older than
+    ROLLUP_HOURLY_RETENTION_DAYS are pruned; daily rows go with their post
+    or user.
+    """
+    batch_size = batch_size or settings.ROLLUP_BATCH_SIZE
+    settled = timezone.now() - datetime.timedelta(seconds=settings.ROLLUP_SETTLE_SECONDS)
+    for model, *_ in SOURCES:
+        RollupWatermark.objects.get_or_create(source=model._meta.db_table)
+
+    stats = {model._meta.db_table: 0 for model, *_ in SOURCES}
+    for model, counter, post_column, user_column in SOURCES:
+        source = model._meta.db_table
+        while True:
+            with transaction.atomic():
+                locked = RollupWatermark.objects.select_for_update().order_by("source")
+                mark = {row.source: row for row in locked}[source]
+                last_id, count = _roll_up_batch(
+                    model, counter, post_column, user_column, mark.last_id, batch_size, settled
+                )
+                if last_id is None:
+                    break
+                mark.last_id = last_id
+                mark.updated_at = timezone.now()
+                mark.save(update_fields=["last_id", "updated_at"])
+            stats[source] += count
+            if count < batch_size:
+                break
+
+    cutoff = timezone.now() - datetime.timedelta(days=settings.ROLLUP_HOURLY_RETENTION_DAYS)
+    for rollup in (PostEngagementRollup, UserActivityRollup):
+        rollup.objects.filter(period="hour", bucket__lt=cutoff).delete()
+    return stats
+
+
+def _window(window):
+    period, buckets = WINDOWS[window]
+    start = bucket_start(timezone.now(), period) - PERIODS[period] * (buckets - 1)
+    return period, start
+
+
+# [(post_id, score)] with the most weighted engagement over `window`, read from the rollups only
+def popular_post_scores(window, limit):
+    period, start = _window(window)
+    return list(
+        PostEngagementRollup.objects.filter(period=period, bucket__gte=start)
+        .values("post_id")
+        .annotate(total=Sum("score"))
+        .order_by("-total", "-post_id")
+        .values_list("post_id", "total")[:limit]
+    )
+
+
+# Activity sums of the most active users over `window`, read from the rollups only
+def active_users(window, limit):
+    period, start = _window(window)
+    return list(
+        UserActivityRollup.objects.filter(period=period, bucket__gte=start)
+        .values("user_id")
+        .annotate(posts=Sum("posts"), likes=Sum("likes"), comments=Sum("comments"),
+                  shares=Sum("shares"), total=Sum("total"))
+        .order_by("-total", "-user_id")[:limit]
+    )
@@ -1,34 +1,52 @@
 import graphene 
 from graphene_django import DjangoObjectType
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Count, F
-from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from graphql import GraphQLError
 
 from .models import Post, Comment, Like, Share
+from .archive import archived_post
+from .cache import get_post, get_posts, invalidate_posts
+from .events import engagement_group, post_created_group, publish_engagement, publish_post_created
+from .feed import feed_posts, feed_sources, fan_out_post
+from .rollups import active_users, popular_post_scores
+from .search import SEARCH_KEYSET, search_queryset
+from .trending import TRENDING_KEYSET, record_interaction, trending_posts, trending_queryset
+from users.models import Follow
+from utils.cache import get_or_compute
+from utils.loaders import get_loaders, load_related
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Keyset, paginate
+from utils.sql import delete_returning, insert_unique, insert_unique_many
 
 User = get_user_model()
 
 
 # QuerySet Helpers
 class PostQuerySet:
-    # Annotate posts with counts of likes, comments, and shares
+    # Posts with their author; engagement counts are stored columns on Post
     def with_counts():
-        return Post.objects.annotate(
-            likes_count_annot=Count("likes"),
-            comments_count_annot=Count("comments"),
-            shares_count_annot=Count("shares"),
-        ).select_related("author")
+        return Post.objects.select_related("author")
+
+    # Just the columns feeds sort on; the rows themselves are read from the post cache
+    def keys_only():
+        return Post.objects.only("id", "created_at")
 
     # Annotate posts with a "popularity score" (weighted by likes, comments, shares)
     def with_popularity():
         return PostQuerySet.with_counts().annotate(
             popularity_score_annot=(
-                F("likes_count_annot") * 1
-                + F("comments_count_annot") * 2
-                + F("shares_count_annot") * 3
+                F("likes_count") * 1
+                + F("comments_count") * 2
+                + F("shares_count") * 3
+            )
         )
-    )
+
+
+# Keyset sort orders for the post connections
+RECENT_KEYSET = Keyset("created_at", "id")
 
 
 # GraphQL Types
@@ -52,21 +70,26 @@ class PostType(DjangoObjectType):
             "popularity_score",
         )
 
-    # Resolvers for annotated or fallback values
+    def resolve_author(self, info):
+        return load_related(info, self, "author", "user")
+
+    # Resolvers read the stored counter columns
     def resolve_likes_count(self, info):
-        return getattr(self, "likes_count_annot", self.likes.count())
+        return self.likes_count
 
     def resolve_comments_count(self, info):
-        return getattr(self, "comments_count_annot", self.comments.count())
+        return self.comments_count
 
     def resolve_shares_count(self, info):
-        return getattr(self, "shares_count_annot", self.shares.count())
+        return self.shares_count
 
     def resolve_popularity_score(self, info):
-        return getattr(
-            self, "popularity_score_annot", 
-            self.likes.count() * 1 + self.comments.count() * 2 + self.shares.count() * 3
-        )
+        return getattr(self, "popularity_score_annot", self.popularity_score)
+
+
+class PostConnection(graphene.relay.Connection):
+    class Meta:
+        node = PostType
 
 
 class CommentType(DjangoObjectType):
@@ -74,18 +97,80 @@ class CommentType(DjangoObjectType):
         model = Comment
         fields = ("id", "text", "user", "post", "created_at")
 
+    # Batched through the per-request loaders instead of one query per row
+    def resolve_user(self, info):
+        return load_related(info, self, "user", "user")
+
+    def resolve_post(self, info):
+        return load_related(info, self, "post", "post")
+
 
 class LikeType(DjangoObjectType):
     class Meta:
         model = Like
         fields = ("id", "user", "post", "created_at")
 
+    # Batched through the per-request loaders instead of one query per row
+    def resolve_user(self, info):
+        return load_related(info, self, "user", "user")
+
+    def resolve_post(self, info):
+        return load_related(info, self, "post", "post")
+
 
 class ShareType(DjangoObjectType):
     class Meta:
         model = Share
         fields = ("id", "user", "post", "created_at")
 
+    # Batched through the per-request loaders instead of one query per row
+    def resolve_user(self, info):
+        return load_related(info, self, "user", "user")
+
+    def resolve_post(self, info):
+        return load_related(info, self, "post", "post")
+
+
+# Posts purged by the retention job, read back from cold storage as plain dicts (social/archive.py)
+class ArchivedCommentType(graphene.ObjectType):
+    id = graphene.ID()
+    user_id = graphene.Int()
+    text = graphene.String()
+    created_at = graphene.DateTime()
+
+
+class ArchivedPostType(graphene.ObjectType):
+    id = graphene.ID()
+    author_id = graphene.Int()
+    author_username = graphene.String()
+    content = graphene.String()
+    created_at = graphene.DateTime()
+    likes_count = graphene.Int()
+    comments_count = graphene.Int()
+    shares_count = graphene.Int()
+    comments = graphene.List(ArchivedCommentType)
+
+
+# Analytics windows, served from the hourly (DAY) and daily (WEEK, MONTH) rollups (social/rollups.py)
+class RollupWindow(graphene.Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class UserActivityType(graphene.ObjectType):
+    # "users.schema.UserType" is imported lazily: users.schema imports this module
+    user = graphene.Field("users.schema.UserType")
+    posts = graphene.Int()
+    likes = graphene.Int()
+    comments = graphene.Int()
+    shares = graphene.Int()
+    total = graphene.Int()
+
+    # Rows are dicts of rollup sums; users are batched through the per-request loader
+    def resolve_user(root, info):
+        return get_loaders(info).user.load(root["user_id"])
+
 
 # Queries
 class SocialQuery(graphene.ObjectType):
@@ -100,6 +185,15 @@ class SocialQuery(graphene.ObjectType):
     personalized_feed = graphene.List(PostType, limit=graphene.Int(), offset=graphene.Int())
     trending_feed = graphene.List(PostType, limit=graphene.Int())
 
+    # Relay connections (keyset cursors, stable while new posts arrive)
+    posts_connection = graphene.relay.ConnectionField(PostConnection)
+    personalized_feed_connection = graphene.relay.ConnectionField(PostConnection)
+    trending_feed_connection = graphene.relay.ConnectionField(PostConnection)
+    search_posts = graphene.relay.ConnectionField(PostConnection, query=graphene.String(required=True))
+    archived_post = graphene.Field(ArchivedPostType, id=graphene.Int(required=True))
+    popular_posts = graphene.List(PostType, window=RollupWindow(default_value="day"), limit=graphene.Int())
+    active_users = graphene.List(UserActivityType, window=RollupWindow(default_value="day"), limit=graphene.Int())
+
     # Return posts with ordering, limit & offset
     def resolve_posts(root, info, limit=None, offset=None, order_by="-created_at"):
         qs = PostQuerySet.with_popularity().order_by(order_by)
@@ -109,9 +203,9 @@ class SocialQuery(graphene.ObjectType):
             qs = qs[:limit]
         return qs
 
-    # Return a single post by ID
+    # Return a single post by ID (read through the post cache)
     def resolve_post(root, info, id):
-        return PostQuerySet.with_popularity().filter(id=id).first()
+        return get_post(id)
 
     # Return posts only from users the current user follows
     def resolve_personalized_feed(root, info, limit=None, offset=None):
@@ -119,25 +213,62 @@ class SocialQuery(graphene.ObjectType):
         if user.is_anonymous:
             raise GraphQLError("Authentication required")
 
-        following_ids = user.following.values_list("following_id", flat=True)
-        qs = PostQuerySet.with_counts().filter(author__id__in=following_ids).order_by("-created_at")
-        if offset:
-            qs = qs[offset:]
-        if limit:
-            qs = qs[:limit]
-        return qs
+        # Only ids (and sort keys) come from the database; rows come from the post cache
+        page = feed_posts(user, PostQuerySet.keys_only(), limit=limit, offset=offset)
+        return get_posts(post.id for post in page)
 
-    # Return trending posts (cached for 60s)
+    # Return trending posts (ranking cached for 60s, rows from the post cache)
     def resolve_trending_feed(root, info, limit=None):
-        cache_key = f"trending_feed_{limit}"
-        posts = cache.get(cache_key)
-        if not posts:
-            qs = PostQuerySet.with_popularity().order_by("-popularity_score_annot")
-            if limit:
-                qs = qs[:limit]
-            posts = list(qs)
-            cache.set(cache_key, posts, timeout=60)
-        return posts
+        post_ids = get_or_compute(
+            f"trending_feed_ids_{limit}",
+            lambda: [post.id for post in trending_posts(PostQuerySet.keys_only(), limit=limit)],
+            timeout=60,
+            name="trending",
+        )
+        return get_posts(post_ids)
+
+    # Newest posts first, paginated on (created_at, id)
+    def resolve_posts_connection(root, info, **kwargs):
+        return paginate(PostConnection, [(PostQuerySet.with_popularity(), RECENT_KEYSET)], **kwargs)
+
+    # Personalized feed, paginated on (created_at, id)
+    def resolve_personalized_feed_connection(root, info, **kwargs):
+        user = info.context.user
+        if user.is_anonymous:
+            raise GraphQLError("Authentication required")
+        return paginate(PostConnection, feed_sources(user, PostQuerySet.with_counts()), **kwargs)
+
+    # Trending posts first, paginated on (decayed score, id)
+    def resolve_trending_feed_connection(root, info, **kwargs):
+        qs = trending_queryset(PostQuerySet.with_counts())
+        return paginate(PostConnection, [(qs, TRENDING_KEYSET)], **kwargs)
+
+    # Most engaged-with posts over a window (rollups only; ranking cached for 60s, rows from the post cache)
+    def resolve_popular_posts(root, info, window="day", limit=None):
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        post_ids = get_or_compute(
+            f"popular_posts_ids_{window}_{limit}",
+            lambda: [post_id for post_id, _ in popular_post_scores(window, limit)],
+            timeout=60,
+            name="popular",
+        )
+        return get_posts(post_ids)
+
+    # Users with the most posts and interactions over a window (rollups only, cached for 60s)
+    def resolve_active_users(root, info, window="day", limit=None):
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        return get_or_compute(
+            f"active_users_{window}_{limit}", lambda: active_users(window, limit), timeout=60, name="active_users",
+        )
+
+    # A post removed by the retention job (slow path: read from the archive files)
+    def resolve_archived_post(root, info, id):
+        return archived_post(id)
+
+    # Full-text search, best matches first (relevance blended with popularity), paginated on (score, id)
+    def resolve_search_posts(root, info, query, **kwargs):
+        qs = search_queryset(PostQuerySet.with_counts(), query)
+        return paginate(PostConnection, [(qs, SEARCH_KEYSET)], **kwargs)
 
 
 # Mutations
@@ -153,6 +284,8 @@ class CreatePost(graphene.Mutation):
         if user.is_anonymous:
             raise GraphQLError("Authentication required")
         post = Post.objects.create(author=user, content=content)
+        fan_out_post(post)
+        publish_post_created(post)
         return CreatePost(post=post)
 
 
@@ -171,6 +304,7 @@ class UpdatePost(graphene.Mutation):
             raise GraphQLError("Post not found or not authorized")
         post.content = content
         post.save()
+        invalidate_posts(post.id)
         return UpdatePost(post=post)
 
 
@@ -186,6 +320,7 @@ class DeletePost(graphene.Mutation):
         deleted, _ = Post.objects.filter(id=post_id, author=user).delete()
         if not deleted:
             raise GraphQLError("Post not found or not authorized")
+        invalidate_posts(post_id)
         return DeletePost(ok=True)
 
 
@@ -204,7 +339,13 @@ class CreateComment(graphene.Mutation):
         post = Post.objects.filter(id=post_id).first()
         if not post:
             raise GraphQLError("Post not found")
-        comment = Comment.objects.create(post=post, user=user, text=text)
+        with transaction.atomic():
+            comment = Comment.objects.create(post=post, user=user, text=text)
+            Post.adjust_counts(post.id, comments=1)
+            record_interaction(comment)
+            invalidate_posts(post.id)
+            publish_engagement(post.id)
+        post.refresh_from_db(fields=["comments_count"])
         return CreateComment(comment=comment)
 
 
@@ -217,15 +358,40 @@ class DeleteComment(graphene.Mutation):
     # Delete a comment (only if user is the author)
     def mutate(self, info, comment_id):
         user = info.context.user
-        deleted, _ = Comment.objects.filter(id=comment_id, user=user).delete()
-        if not deleted:
+        comment = Comment.objects.filter(id=comment_id, user=user).first()
+        if not comment:
             raise GraphQLError("Comment not found or not authorized")
+        with transaction.atomic():
+            deleted, _ = Comment.objects.filter(id=comment.id).delete()
+            if deleted:
+                Post.adjust_counts(comment.post_id, comments=-1)
+                record_interaction(comment, removed=True)
+                invalidate_posts(comment.post_id)
+                publish_engagement(comment.post_id)
         return DeleteComment(ok=True)
 
 
+# Like or share a post, or take the like/share back if it exists (toggle): one INSERT ... ON CONFLICT
+# DO NOTHING, plus one DELETE ... RETURNING when toggling off. Returns the new row, or None if removed.
+def toggle_engagement(user, model, post_id, counter):
+    with transaction.atomic():
+        item = insert_unique(model, "post", post_id, {"user": user.id, "created_at": timezone.now()})
+        removed = None
+        if item is None:
+            # Nothing inserted: already liked/shared (remove it), or no such post
+            removed = delete_returning(model, {"post": post_id, "user": user.id}, returning=("id", "created_at"))
+            if removed is None:
+                raise GraphQLError("Post not found")
+        Post.adjust_counts(post_id, **{counter: 1 if item else -1})
+        record_interaction(item or removed, removed=item is None)
+        invalidate_posts(post_id)
+        publish_engagement(post_id)
+    return item
+
+
 class LikePost(graphene.Mutation):
     like = graphene.Field(LikeType)
-    created = graphene.Boolean()
+    created = graphene.Boolean(description="True if the post was liked, false if it was unliked.")
 
     class Arguments:
         post_id = graphene.Int(required=True)
@@ -235,29 +401,93 @@ class LikePost(graphene.Mutation):
         user = info.context.user
         if user.is_anonymous:
             raise GraphQLError("Authentication required")
-        post = Post.objects.filter(id=post_id).first()
-        if not post:
-            raise GraphQLError("Post not found")
-        like, created = Like.objects.get_or_create(post=post, user=user)
-        return LikePost(like=like, created=created)
+        like = toggle_engagement(user, Like, post_id, "likes")
+        return LikePost(like=like, created=like is not None)
 
 
 class SharePost(graphene.Mutation):
     share = graphene.Field(ShareType)
+    created = graphene.Boolean(description="True if the post was shared, false if it was unshared.")
 
     class Arguments:
         post_id = graphene.Int(required=True)
 
-    # Share a post (creates a Share record)
+    # Share or unshare a post (toggle behavior)
     def mutate(self, info, post_id):
         user = info.context.user
         if user.is_anonymous:
             raise GraphQLError("Authentication required")
-        post = Post.objects.filter(id=post_id).first()
-        if not post:
-            raise GraphQLError("Post not found")
-        share = Share.objects.create(post=post, user=user)
-        return SharePost(share=share)
+        share = toggle_engagement(user, Share, post_id, "shares")
+        return SharePost(share=share, created=share is not None)
+
+
+class BatchItemResult(graphene.ObjectType):
+    """Outcome of one id of a batch mutation."""
+    id = graphene.Int()
+    created = graphene.Boolean(description="False if it already existed, e.g. a replayed offline action.")
+    error = graphene.String(description="Why the id was skipped, e.g. \"Post not found\".")
+
+
+# Distinct ids of a batch mutation, in request order
+def batch_ids(ids):
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > settings.GRAPHQL_MAX_BATCH_SIZE:
+        raise GraphQLError(f"At most {settings.GRAPHQL_MAX_BATCH_SIZE} ids per batch")
+    return ids
+
+
+# Like or share many posts in one transaction: one lookup, one INSERT ... RETURNING, one counter update.
+# Only the rows the INSERT returns count as new, so a concurrent likePost/sharePost on the same
+# post never gets its counter, trending score or event applied twice.
+def engage_posts(user, model, post_ids, counter):
+    post_ids = batch_ids(post_ids)
+    with transaction.atomic():
+        found = set(Post.objects.filter(id__in=post_ids).values_list("id", flat=True))
+        new = insert_unique_many(
+            model, "post", [post_id for post_id in post_ids if post_id in found],
+            {"user": user.id, "created_at": timezone.now()}, returning=("id", "created_at"),
+        )
+        new_ids = [item.post_id for item in new]
+        if new_ids:
+            Post.objects.filter(id__in=new_ids).update(**{counter: F(counter) + 1})
+            for item in new:
+                record_interaction(item)
+            invalidate_posts(*new_ids)
+            publish_engagement(*new_ids)
+    created = set(new_ids)
+    return [
+        BatchItemResult(id=post_id, created=post_id in created)
+        if post_id in found else BatchItemResult(id=post_id, created=False, error="Post not found")
+        for post_id in post_ids
+    ]
+
+
+class LikePosts(graphene.Mutation):
+    results = graphene.List(BatchItemResult)
+
+    class Arguments:
+        post_ids = graphene.List(graphene.NonNull(graphene.Int), required=True)
+
+    # Like many posts at once (e.g. queued offline actions); already liked posts are skipped
+    def mutate(self, info, post_ids):
+        user = info.context.user
+        if user.is_anonymous:
+            raise GraphQLError("Authentication required")
+        return LikePosts(results=engage_posts(user, Like, post_ids, "likes_count"))
+
+
+class SharePosts(graphene.Mutation):
+    results = graphene.List(BatchItemResult)
+
+    class Arguments:
+        post_ids = graphene.List(graphene.NonNull(graphene.Int), required=True)
+
+    # Share many posts at once; already shared posts are skipped
+    def mutate(self, info, post_ids):
+        user = info.context.user
+        if user.is_anonymous:
+            raise GraphQLError("Authentication required")
+        return SharePosts(results=engage_posts(user, Share, post_ids, "shares_count"))
 
 
 # Root mutation class for all social-related mutations
@@ -269,3 +499,32 @@ class SocialMutation(graphene.ObjectType):
     delete_comment = DeleteComment.Field()
     like_post = LikePost.Field()
     share_post = SharePost.Field()
+    like_posts = LikePosts.Field()
+    share_posts = SharePosts.Field()
+
+
+# Subscriptions (served over WebSocket by config.consumers.GraphQLSubscriptionConsumer)
+class SocialSubscription(graphene.ObjectType):
+    post_created = graphene.Field(PostType, description="New posts by the authors you follow.")
+    post_engagement_changed = graphene.Field(
+        PostType,
+        post_id=graphene.Int(required=True),
+        description="Counts of a post, sent at most once per coalescing window.",
+    )
+
+    # Each event is executed with the changed post as root value
+    def resolve_post_created(root, info):
+        return root
+
+    def resolve_post_engagement_changed(root, info, post_id):
+        return root
+
+    # Channel layer groups of a subscription, computed once when it starts
+    def groups_post_created(user):
+        if user.is_anonymous:
+            raise GraphQLError("Authentication required")
+        following = Follow.objects.filter(follower=user).values_list("following_id", flat=True)
+        return [post_created_group(author_id) for author_id in following]
+
+    def groups_post_engagement_changed(user, post_id):
+        return [engagement_group(post_id)]
@@ -0,0 +1,103 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Ln
+from graphql import GraphQLError
+
+from utils.pagination import Keyset
+
+# Full-text index of Post.content, maintained by the database on every write (migration 0007):
+#   Postgres: a `search_vector` tsvector column on social_post generated from content, GIN-indexed
+#   SQLite:   an FTS5 table social_post_fts whose rowid is the post id, kept in step by triggers
+# The column is not a model field, so ordinary post reads never load it.
+FTS_TABLE = "social_post_fts"
+
+# Keyset for the search connection: (blended score, id)
+SEARCH_KEYSET = Keyset("search_score", "id")
+
+# Words of a search, for building an FTS5 query that cannot hit its syntax errors
+WORD = re.compile(r"\w+")
+
+
+def _postgres():
+    return connection.vendor == "postgresql"
+
+
+def _require_backend():
+    if connection.vendor not in ("postgresql", "sqlite"):
+        raise GraphQLError("Search is not available on this database")
+
+
+# Re-sync the SQLite index of the given posts from their stored content: only these rows are read
+def index_posts(*post_ids):
+    if not post_ids or connection.vendor != "sqlite":
+        return
+    placeholders = ", ".join(["%s"] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", post_ids)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, content) "
+            f"SELECT id, content FROM social_post WHERE id IN ({placeholders})",
+            post_ids,
+        )
+
+
+# Re-create the Postgres generated column with the current SEARCH_CONFIG (rewrites social_post)
+def regenerate_search_vector():
+    with connection.schema_editor() as schema_editor:
+        search_config = schema_editor.quote_value(settings.SEARCH_CONFIG)
+        schema_editor.execute("ALTER TABLE social_post DROP COLUMN search_vector")
+        schema_editor.execute(
+            "ALTER TABLE social_post ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+            f"(to_tsvector({search_config}::regconfig, content)) STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX social_post_search_vector_gin ON social_post USING GIN (search_vector)"
+        )
+
+
+def _relevance(queryset, text):
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    if _postgres():
+        # websearch_to_tsquery accepts free text ("quoted phrases", -exclusions, or)
+        tsquery = "websearch_to_tsquery(%s::regconfig, %s)"
+        params = (settings.SEARCH_CONFIG, text)
+        matches = RawSQL(f"{table}.search_vector @@ {tsquery}", params, output_field=BooleanField())
+        rank = RawSQL(f"ts_rank({table}.search_vector, {tsquery})", params, output_field=FloatField())
+        return matches, rank
+
+    # FTS5: every word must match, each quoted so user input is never parsed as query syntax
+    words = WORD.findall(text)
+    if not words:
+        return None, None
+    match = " ".join('"{}"'.format(word.replace('"', '""')) for word in words)
+    matches = RawSQL(
+        f"{table}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+        (match,), output_field=BooleanField(),
+    )
+    # bm25() is lower for better matches; the rowid lookup keeps it to the matching rows
+    rank = RawSQL(
+        f"(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id)",
+        (match,), output_field=FloatField(),
+    )
+    return matches, rank
+
+
+def search_queryset(queryset, text):
+    """
+    Posts of `queryset` matching `text`, annotated with `search_score`.
+
+    The score is the text relevance boosted by popularity:
+    relevance * (1 + SEARCH_POPULARITY_WEIGHT * ln(1 + popularity_score)),
+    so engagement reorders comparable matches without burying better ones.
+    """
+    _require_backend()
+    matches, relevance = _relevance(queryset, text)
+    if matches is None:
+        return queryset.none()
+    popularity = F("likes_count") * 1 + F("comments_count") * 2 + F("shares_count") * 3
+    boost = Value(1.0) + Value(settings.SEARCH_POPULARITY_WEIGHT) * Ln(Value(1.0) + popularity)
+    return queryset.filter(matches).annotate(search_score=relevance * boost)
@@ -1,9 +1,33 @@
 from django.test import TestCase
 
+from datetime import timedelta
+from io import StringIO
+
 import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory
 from django.utils import timezone
 from users.models import User
-from social.models import Post, Comment, Like, Share
+from users.models import Follow
+from social.models import Post, Comment, Like, Share, FeedEntry, TrendingScore
+from social import feed, trending
+from social import cache as post_cache
+from config.schema import schema
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+def execute(query, user=None, **variables):
+    request = RequestFactory().post("/graphql/")
+    request.user = user
+    result = schema.execute(query, context_value=request, variable_values=variables)
+    assert result.errors is None, result.errors
+    return result.data
 
 @pytest.mark.django_db
 def test_create_post():
@@ -29,6 +53,8 @@ def test_like_comment_share_counts():
     # Add share
     Share.objects.create(post=post, user=other)
 
+    # Rows written outside the mutations are picked up by the rebuild command
+    call_command("rebuild_post_counters", stdout=StringIO())
     post.refresh_from_db()
 
     assert post.likes_count == 1
@@ -55,3 +81,581 @@ def test_unique_share_constraint():
     Share.objects.create(post=post, user=user)
     with pytest.raises(Exception):  # IntegrityError
         Share.objects.create(post=post, user=user)
+
+
+@pytest.mark.django_db
+def test_engagement_mutations_maintain_counters():
+    user = User.objects.create_user(username="tester", password="pass123")
+    other = User.objects.create_user(username="friend", password="pass123")
+    post = Post.objects.create(author=user, content="Counted Post")
+
+    like = "mutation($id: Int!) { likePost(postId: $id) { created like { id } } }"
+    share = "mutation($id: Int!) { sharePost(postId: $id) { created share { id } } }"
+    # likePost and sharePost toggle: the second call takes the like/share back
+    assert execute(like, other, id=post.id)["likePost"]["created"] is True
+    assert execute(like, other, id=post.id)["likePost"] == {"created": False, "like": None}
+    assert execute(like, other, id=post.id)["likePost"]["created"] is True
+    execute(share, other, id=post.id)
+    assert execute(share, other, id=post.id)["sharePost"] == {"created": False, "share": None}
+    execute(share, other, id=post.id)
+    data = execute(
+        "mutation($id: Int!) { createComment(postId: $id, text: \"hi\") { comment { id } } }",
+        other, id=post.id,
+    )
+
+    post.refresh_from_db()
+    assert (post.likes_count, post.comments_count, post.shares_count) == (1, 1, 1)
+    assert (Like.objects.count(), Share.objects.count()) == (1, 1)
+
+    comment_id = int(data["createComment"]["comment"]["id"])
+    execute("mutation($id: Int!) { deleteComment(commentId: $id) { ok } }", other, id=comment_id)
+
+    data = execute(
+        "query($id: Int!) { post(id: $id) { likesCount commentsCount sharesCount popularityScore } }",
+        id=post.id,
+    )
+    assert data["post"] == {
+        "likesCount": 1, "commentsCount": 0, "sharesCount": 1, "popularityScore": 4,
+    }
+
+
+@pytest.mark.django_db
+def test_batch_engagement_mutations_skip_replays_and_missing_posts():
+    user = User.objects.create_user(username="tester", password="pass123")
+    other = User.objects.create_user(username="friend", password="pass123")
+    first = Post.objects.create(author=user, content="first")
+    second = Post.objects.create(author=user, content="second")
+    execute("mutation($id: Int!) { likePost(postId: $id) { created } }", other, id=first.id)
+
+    query = "mutation($ids: [Int!]!) { likePosts(postIds: $ids) { results { id created error } } }"
+    results = execute(query, other, ids=[first.id, second.id, 999, second.id])["likePosts"]["results"]
+    assert results == [
+        {"id": first.id, "created": False, "error": None},
+        {"id": second.id, "created": True, "error": None},
+        {"id": 999, "created": False, "error": "Post not found"},
+    ]
+    # Replaying the whole batch changes nothing
+    execute(query, other, ids=[first.id, second.id])
+    execute("mutation($ids: [Int!]!) { sharePosts(postIds: $ids) { results { created } } }", other, ids=[second.id])
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert (first.likes_count, second.likes_count, second.shares_count) == (1, 1, 1)
+    assert Like.objects.filter(user=other).count() == 2
+    assert TrendingScore.objects.filter(post=second).exists()
+
+
+@pytest.mark.django_db
+def test_batch_engagement_ignores_rows_inserted_concurrently(monkeypatch):
+    from social import schema as social_schema
+
+    user = User.objects.create_user(username="tester", password="pass123")
+    post = Post.objects.create(author=user, content="contested")
+    insert = social_schema.insert_unique_many
+
+    # A likePost from another request commits between the lookup and the batch INSERT
+    def racing_insert(*args, **kwargs):
+        Like.objects.create(user=user, post=post)
+        Post.adjust_counts(post.id, likes=1)
+        return insert(*args, **kwargs)
+
+    monkeypatch.setattr(social_schema, "insert_unique_many", racing_insert)
+    query = "mutation($ids: [Int!]!) { likePosts(postIds: $ids) { results { id created } } }"
+    assert execute(query, user, ids=[post.id])["likePosts"]["results"] == [{"id": post.id, "created": False}]
+    post.refresh_from_db()
+    assert post.likes_count == 1
+    assert not TrendingScore.objects.filter(post=post).exists()
+
+
+FEED_QUERY = "{ personalizedFeed(limit: 10) { id content } }"
+
+
+@pytest.mark.django_db
+def test_personalized_feed_fan_out_and_prune():
+    reader = User.objects.create_user(username="reader", password="pass123")
+    author = User.objects.create_user(username="author", password="pass123")
+    old = Post.objects.create(author=author, content="before follow")
+
+    execute("mutation($id: Int!) { followUser(userId: $id) { created } }", reader, id=author.id)
+    execute("mutation { createPost(content: \"after follow\") { post { id } } }", author)
+
+    data = execute(FEED_QUERY, reader)
+    assert [p["content"] for p in data["personalizedFeed"]] == ["after follow", "before follow"]
+    assert FeedEntry.objects.filter(user=reader).count() == 2
+
+    execute("mutation($id: Int!) { unfollowUser(userId: $id) { ok } }", reader, id=author.id)
+    assert execute(FEED_QUERY, reader)["personalizedFeed"] == []
+    assert Post.objects.filter(id=old.id).exists()
+
+
+@pytest.mark.django_db
+def test_personalized_feed_reads_celebrities_on_demand(settings):
+    settings.FEED_FANOUT_MAX_FOLLOWERS = 1
+    reader = User.objects.create_user(username="reader", password="pass123")
+    fan = User.objects.create_user(username="fan", password="pass123")
+    star = User.objects.create_user(username="star", password="pass123")
+    friend = User.objects.create_user(username="friend", password="pass123")
+    Follow.objects.create(follower=fan, following=star)
+    execute("mutation($id: Int!) { followUser(userId: $id) { created } }", reader, id=friend.id)
+    execute("mutation($id: Int!) { followUser(userId: $id) { created } }", reader, id=star.id)
+    cache.clear()  # celebrity set is cached for a few minutes
+
+    execute("mutation { createPost(content: \"friend post\") { post { id } } }", friend)
+    execute("mutation { createPost(content: \"star post\") { post { id } } }", star)
+
+    # The star's post is not copied into inboxes but still shows up in the feed
+    assert not FeedEntry.objects.filter(author=star).exists()
+    data = execute(FEED_QUERY, reader)
+    assert [p["content"] for p in data["personalizedFeed"]] == ["star post", "friend post"]
+
+
+@pytest.mark.django_db
+def test_author_leaving_the_celebrity_set_is_backfilled(settings, django_assert_num_queries):
+    from social import cron
+
+    settings.FEED_FANOUT_MAX_FOLLOWERS = 1
+    reader = User.objects.create_user(username="reader", password="pass123")
+    fan = User.objects.create_user(username="fan", password="pass123")
+    star = User.objects.create_user(username="star", password="pass123")
+    # Follows written outside the mutations are picked up by the sync job
+    Follow.objects.create(follower=fan, following=star)
+    Follow.objects.create(follower=reader, following=star)
+    assert cron.sync_pulled_authors() == {"promoted": 1, "released": 0}
+    execute("mutation { createPost(content: \"star post\") { post { id } } }", star)
+    assert not FeedEntry.objects.filter(author=star).exists()
+
+    # Below the threshold again: the star's posts keep being pulled until the inboxes are backfilled
+    Follow.objects.filter(follower=fan).delete()
+    cache.clear()
+    with django_assert_num_queries(1):  # reading the celebrity set never scans follows
+        feed.celebrity_ids()
+    assert execute(FEED_QUERY, reader)["personalizedFeed"][0]["content"] == "star post"
+
+    assert cron.sync_pulled_authors() == {"promoted": 0, "released": 1}
+    assert FeedEntry.objects.filter(user=reader, author=star).count() == 1
+    execute("mutation { createPost(content: \"later post\") { post { id } } }", star)
+    data = execute(FEED_QUERY, reader)
+    assert [p["content"] for p in data["personalizedFeed"]] == ["later post", "star post"]
+    assert FeedEntry.objects.filter(user=reader, author=star).count() == 2
+
+
+CONNECTION_QUERY = """
+query($first: Int, $after: String, $last: Int, $before: String) {
+  postsConnection(first: $first, after: $after, last: $last, before: $before) {
+    edges { cursor node { content } }
+    pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+  }
+}
+"""
+
+
+@pytest.mark.django_db
+def test_posts_connection_keyset_pages_are_stable():
+    user = User.objects.create_user(username="tester", password="pass123")
+    for i in range(5):
+        Post.objects.create(author=user, content=f"post {i}")
+
+    page = execute(CONNECTION_QUERY, first=2)["postsConnection"]
+    assert [e["node"]["content"] for e in page["edges"]] == ["post 4", "post 3"]
+    assert page["pageInfo"]["hasNextPage"] is True
+
+    # A post arriving between requests neither shifts nor duplicates the next page
+    Post.objects.create(author=user, content="late post")
+    page = execute(CONNECTION_QUERY, first=2, after=page["pageInfo"]["endCursor"])["postsConnection"]
+    assert [e["node"]["content"] for e in page["edges"]] == ["post 2", "post 1"]
+
+    page = execute(CONNECTION_QUERY, last=2, before=page["pageInfo"]["startCursor"])["postsConnection"]
+    assert [e["node"]["content"] for e in page["edges"]] == ["post 4", "post 3"]
+    assert page["pageInfo"]["hasPreviousPage"] is True
+
+
+SEARCH_QUERY = """
+query($text: String!, $first: Int, $after: String) {
+  searchPosts(query: $text, first: $first, after: $after) {
+    edges { node { content } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+
+@pytest.mark.django_db
+def test_search_posts_ranks_indexed_matches_and_pages_by_keyset():
+    author = User.objects.create(username="author")
+    fan = User.objects.create(username="fan")
+
+    def create(content):
+        query = "mutation($content: String!) { createPost(content: $content) { post { id } } }"
+        return int(execute(query, author, content=content)["createPost"]["post"]["id"])
+
+    popular = create("Gardening tips for autumn")
+    quiet = create("Gardening tips for spring")
+    create("Cooking with tomatoes")
+    execute("mutation($id: Int!) { likePost(postId: $id) { created } }", fan, id=popular)
+
+    # Same relevance: the popular post ranks first; the next page is read with the cursor
+    page = execute(SEARCH_QUERY, text="gardening tips", first=1)["searchPosts"]
+    assert [edge["node"]["content"] for edge in page["edges"]] == ["Gardening tips for autumn"]
+    assert page["pageInfo"]["hasNextPage"]
+    page = execute(SEARCH_QUERY, text="gardening tips", first=1, after=page["pageInfo"]["endCursor"])["searchPosts"]
+    assert [edge["node"]["content"] for edge in page["edges"]] == ["Gardening tips for spring"]
+    assert not page["pageInfo"]["hasNextPage"]
+
+    # Edits and deletions reach the index; query syntax in user input is harmless
+    execute('mutation($id: Int!) { updatePost(postId: $id, content: "Winter soups") { post { id } } }', author, id=quiet)
+    assert execute(SEARCH_QUERY, text="soups")["searchPosts"]["edges"] == [{"node": {"content": "Winter soups"}}]
+    execute("mutation($id: Int!) { deletePost(postId: $id) { ok } }", author, id=popular)
+    assert execute(SEARCH_QUERY, text='"gardening" AND (')["searchPosts"]["edges"] == []
+    assert execute(SEARCH_QUERY, text="tomato")["searchPosts"]["edges"] == [{"node": {"content": "Cooking with tomatoes"}}]
+
+    # Writes that bypass the mutations are indexed by the database too
+    Post.objects.bulk_create([Post(author=author, content="Imported pottery notes")])
+    assert execute(SEARCH_QUERY, text="pottery")["searchPosts"]["edges"] == [{"node": {"content": "Imported pottery notes"}}]
+    Post.objects.filter(content="Imported pottery notes").update(content="Imported weaving notes")
+    assert execute(SEARCH_QUERY, text="pottery")["searchPosts"]["edges"] == []
+    Post.objects.filter(content="Imported weaving notes").delete()
+    assert execute(SEARCH_QUERY, text="weaving")["searchPosts"]["edges"] == []
+
+
+@pytest.mark.django_db
+def test_personalized_feed_batches_author_lookups(django_assert_max_num_queries):
+    reader = User.objects.create_user(username="reader", password="pass123")
+    for i in range(50):
+        author = User.objects.create(username=f"author{i}")
+        Follow.objects.create(follower=reader, following=author)
+        post = Post.objects.create(author=author, content=f"post {i}")
+        FeedEntry.objects.create(user=reader, post=post, author=author, created_at=post.created_at)
+
+    query = "{ personalizedFeed(limit: 50) { id author { username followersCount followingCount } } }"
+    # celebrity set + feed page ids + cold post rows + one batched count per counter
+    with django_assert_max_num_queries(5):
+        data = execute(query, reader)
+    assert len(data["personalizedFeed"]) == 50
+    assert all(p["author"]["followersCount"] == 1 for p in data["personalizedFeed"])
+
+
+TRENDING_QUERY = "{ trendingFeed(limit: 3) { content } }"
+
+
+@pytest.mark.django_db
+def test_trending_feed_is_ranked_by_weighted_engagement():
+    author = User.objects.create(username="author")
+    fans = [User.objects.create(username=f"fan{i}") for i in range(3)]
+    quiet = Post.objects.create(author=author, content="quiet")
+    liked = Post.objects.create(author=author, content="liked")
+    shared = Post.objects.create(author=author, content="shared")
+
+    for fan in fans[:2]:
+        execute("mutation($id: Int!) { likePost(postId: $id) { created } }", fan, id=liked.id)
+    execute("mutation($id: Int!) { sharePost(postId: $id) { share { id } } }", fans[2], id=shared.id)
+
+    # 3 (one share) beats 2 (two likes); posts without engagement come last
+    data = execute(TRENDING_QUERY)
+    assert [p["content"] for p in data["trendingFeed"]] == ["shared", "liked", "quiet"]
+
+
+@pytest.mark.django_db
+def test_trending_scores_decay_and_rebuild(settings):
+    settings.TRENDING_HALF_LIFE_HOURS = 24
+    author = User.objects.create(username="author")
+    fan = User.objects.create(username="fan")
+    old = Post.objects.create(author=author, content="old")
+    new = Post.objects.create(author=author, content="new")
+
+    # A share three days ago is worth 3 / 2**3 < one like now
+    share = Share.objects.create(post=old, user=fan, created_at=timezone.now() - timedelta(days=3))
+    trending.record_interaction(share)
+    like = Like.objects.create(post=new, user=fan)
+    trending.record_interaction(like)
+    assert [p.content for p in trending.trending_posts(Post.objects.all(), limit=2)] == ["new", "old"]
+
+    scores = dict(TrendingScore.objects.values_list("post_id", "score"))
+    TrendingScore.objects.all().delete()
+    call_command("rebuild_trending", stdout=StringIO())
+    rebuilt = dict(TrendingScore.objects.values_list("post_id", "score"))
+    assert rebuilt == pytest.approx(scores)
+
+    # Removing the only like takes the post back to (effectively) zero
+    trending.record_interaction(like, removed=True)
+    assert [p.content for p in trending.trending_posts(Post.objects.all(), limit=2)] == ["old", "new"]
+
+
+@pytest.mark.django_db
+def test_post_cache_reads_through_and_invalidates_on_mutations(
+    django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    author = User.objects.create(username="author")
+    fan = User.objects.create(username="fan")
+    post = Post.objects.create(author=author, content="cached")
+    query = "query($id: Int!) { post(id: $id) { content likesCount author { username } } }"
+
+    assert execute(query, id=post.id)["post"]["content"] == "cached"
+    # Warm cache: only the author lookup (batched by the loader) hits the database
+    with django_assert_num_queries(1):
+        assert execute(query, id=post.id)["post"]["author"]["username"] == "author"
+
+    # Invalidation runs once the mutation's transaction commits
+    with django_capture_on_commit_callbacks(execute=True):
+        execute("mutation($id: Int!) { likePost(postId: $id) { created } }", fan, id=post.id)
+    assert execute(query, id=post.id)["post"]["likesCount"] == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        execute(
+            "mutation($id: Int!) { updatePost(postId: $id, content: \"edited\") { post { id } } }",
+            author, id=post.id,
+        )
+    assert execute(query, id=post.id)["post"]["content"] == "edited"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        execute("mutation($id: Int!) { deletePost(postId: $id) { ok } }", author, id=post.id)
+    assert execute(query, id=post.id)["post"] is None
+
+
+@pytest.mark.django_db
+def test_post_cache_rejects_rows_written_with_a_stale_version(django_capture_on_commit_callbacks):
+    author = User.objects.create(username="author")
+    post = Post.objects.create(author=author, content="v1")
+    post_cache.get_post(post.id)
+
+    # A slow reader captured the old version, then the post changed and was invalidated
+    stale_version = cache.get(post_cache._version_key(post.id))
+    Post.objects.filter(id=post.id).update(content="v2")
+    with django_capture_on_commit_callbacks(execute=True):
+        post_cache.invalidate_posts(post.id)
+    cache.set(post_cache._row_key(post.id), (stale_version, post_cache._serialize(post)))
+
+    assert post_cache.get_post(post.id).content == "v2"
+
+
+@pytest.mark.django_db
+def test_manage_partitions_month_arithmetic_and_sqlite_noop():
+    from datetime import datetime, timezone as dt_timezone
+
+    from social import partitions
+
+    month = partitions.month_start(datetime(2026, 11, 17, 8, 30, tzinfo=dt_timezone.utc))
+    assert month == datetime(2026, 11, 1, tzinfo=dt_timezone.utc)
+    assert partitions.add_months(month, 2) == datetime(2027, 1, 1, tzinfo=dt_timezone.utc)
+    assert partitions.partition_name("social_comment", month) == "social_comment_y2026m11"
+
+    # Nothing is partitioned on SQLite: the job runs and changes nothing
+    out = StringIO()
+    call_command("manage_partitions", stdout=out)
+    assert "Created 0 partitions" in out.getvalue()
+
+
+@pytest.mark.postgres
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="comments are only partitioned on Postgres")
+@pytest.mark.django_db
+def test_comment_partitions_on_postgres(settings):
+    from importlib import import_module
+
+    from django.apps import apps
+
+    from social import partitions
+
+    # The test database was migrated through 0008, which partitioned social_comment
+    assert partitions.is_partitioned("social_comment")
+    migration = import_module("social.migrations.0008_partition_comments")
+    with connection.schema_editor() as schema_editor:
+        migration.partition_comments(apps, schema_editor)  # already partitioned: no-op
+
+    user = User.objects.create_user(username="tester", password="pass123")
+    post = Post.objects.create(author=user, content="partitioned")
+    comment = Comment.objects.create(post=post, user=user, text="lands in this month")
+    assert Comment.objects.get(id=comment.id).text == "lands in this month"
+    this_month = partitions.partition_name("social_comment", partitions.month_start(timezone.now()))
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {this_month}")
+        assert cursor.fetchone()[0] == 1
+
+    months_ahead = settings.PARTITION_MONTHS_AHEAD + 1
+    out = StringIO()
+    call_command("manage_partitions", months_ahead=months_ahead, stdout=out)
+    assert "Created 1 partitions" in out.getvalue()
+    last = partitions.month_start(partitions.add_months(timezone.now(), months_ahead))
+    assert partitions.partitions("social_comment")[-1] == (partitions.partition_name("social_comment", last), last)
+
+
+@pytest.mark.django_db
+def test_clean_old_posts_purges_in_batches(settings, tmp_path):
+    from social.cron import clean_old_posts
+
+    settings.POST_RETENTION_DAYS = 90
+    settings.POST_ARCHIVE_DIR = str(tmp_path)
+    author = User.objects.create(username="author")
+    fan = User.objects.create(username="fan")
+    old = timezone.now() - timedelta(days=100)
+    old_posts = [Post.objects.create(author=author, content=f"old {i}") for i in range(5)]
+    Post.objects.filter(id__in=[p.id for p in old_posts]).update(created_at=old)
+    kept = Post.objects.create(author=author, content="recent")
+    for post in old_posts[:2] + [kept]:
+        Like.objects.create(user=fan, post=post)
+        Comment.objects.create(user=fan, post=post, text="hi")
+        FeedEntry.objects.create(user=fan, post=post, author=author, created_at=post.created_at)
+
+    dry = clean_old_posts(batch_size=2, sleep=0, dry_run=True)
+    assert (dry["posts"], dry["batches"], dry[Like._meta.db_table]) == (5, 3, 2)
+    assert Post.objects.count() == 6
+
+    stats = clean_old_posts(batch_size=2, sleep=0)
+    assert (stats["posts"], stats["batches"]) == (5, 3)
+    assert stats[Comment._meta.db_table] == 2 and stats[FeedEntry._meta.db_table] == 2
+    assert list(Post.objects.values_list("content", flat=True)) == ["recent"]
+    assert Like.objects.get().post_id == kept.id
+    assert FeedEntry.objects.get().post_id == kept.id
+
+    # Nothing left: a second run is a no-op
+    assert clean_old_posts(batch_size=2, sleep=0)["posts"] == 0
+
+
+@pytest.mark.django_db
+def test_expired_posts_are_archived_and_readable_by_id(settings, tmp_path):
+    import gzip
+    import json
+
+    from social.cron import clean_old_posts
+
+    settings.POST_ARCHIVE_DIR = str(tmp_path)
+    author = User.objects.create(username="author")
+    fan = User.objects.create(username="fan")
+    posts = [Post.objects.create(author=author, content=f"old {i}") for i in range(3)]
+    Post.objects.filter(id__in=[p.id for p in posts]).update(created_at=timezone.now() - timedelta(days=100))
+    Comment.objects.create(user=fan, post=posts[1], text="first!")
+    Like.objects.create(user=fan, post=posts[1])
+
+    stats = clean_old_posts(batch_size=2, sleep=0)
+    assert (stats["archived"], stats["posts"]) == (3, 3)
+    assert not Post.objects.exists()
+
+    # One gzip member per batch: the file still reads as plain .jsonl.gz
+    (archive_file,) = tmp_path.glob("posts-*.jsonl.gz")
+    with gzip.open(archive_file, "rt") as lines:
+        assert [json.loads(line)["content"] for line in lines] == ["old 0", "old 1", "old 2"]
+
+    query = """
+    query($id: Int!) {
+      archivedPost(id: $id) { content authorUsername comments { userId text } }
+    }
+    """
+    assert execute(query, id=posts[1].id)["archivedPost"] == {
+        "content": "old 1", "authorUsername": "author", "comments": [{"userId": fan.id, "text": "first!"}],
+    }
+    assert execute(query, id=0)["archivedPost"] is None
+
+
+@pytest.mark.django_db
+def test_exports_stream_own_rows_or_everything_for_staff(client, settings, tmp_path):
+    import csv
+    import json
+
+    from django.http import StreamingHttpResponse
+
+    settings.EXPORT_CHUNK_SIZE = 2
+    author = User.objects.create(username="author")
+    fan = User.objects.create(username="fan")
+    for i in range(3):
+        Post.objects.create(author=author, content=f"post {i}")
+    Post.objects.create(author=fan, content="fan post")
+    Follow.objects.create(follower=fan, following=author)
+
+    assert client.get("/export/posts/").status_code == 401
+    client.force_login(author)
+    assert client.get("/export/passwords/").status_code == 400
+    assert client.get("/export/posts/?scope=all").status_code == 403
+
+    response = client.get("/export/posts/")
+    assert isinstance(response, StreamingHttpResponse)
+    assert response["Content-Type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+    assert [row["content"] for row in rows] == ["post 0", "post 1", "post 2"]
+    assert {row["author_id"] for row in rows} == {author.id}
+
+    # Follow edges in both directions belong to the user
+    response = client.get("/export/follows/?format=csv")
+    lines = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+    assert lines == [["id", "follower_id", "following_id", "created_at"], [
+        str(Follow.objects.get().id), str(fan.id), str(author.id), Follow.objects.get().created_at.isoformat(),
+    ]]
+
+    User.objects.filter(id=author.id).update(is_staff=True)
+    response = client.get("/export/posts/?scope=all")
+    assert len(b"".join(response.streaming_content).splitlines()) == 4
+
+    output = tmp_path / "posts.csv"
+    call_command("export_data", "posts", "--format", "csv", "--user", "fan", "--output", str(output), stderr=StringIO())
+    assert output.read_text().splitlines()[1].split(",")[2] == "fan post"
+
+
+@pytest.mark.django_db
+def test_rollups_count_new_rows_since_the_watermark(settings, django_assert_max_num_queries):
+    from social.cron import update_rollups
+    from social.models import PostEngagementRollup, UserActivityRollup
+
+    settings.ROLLUP_SETTLE_SECONDS = 0
+    author = User.objects.create(username="author")
+    fan = User.objects.create(username="fan")
+    lurker = User.objects.create(username="lurker")
+    hot = Post.objects.create(author=author, content="hot")
+    cold = Post.objects.create(author=author, content="cold")
+    Like.objects.create(user=fan, post=hot)
+    Comment.objects.create(user=fan, post=hot, text="wow")
+    Like.objects.create(user=lurker, post=hot)
+    Like.objects.create(user=lurker, post=cold)
+    # Older than the day window, inside the week
+    two_days_ago = timezone.now() - timedelta(days=2)
+    Share.objects.create(user=lurker, post=cold, created_at=two_days_ago)
+    Comment.objects.create(user=lurker, post=cold, text="meh", created_at=two_days_ago)
+
+    stats = update_rollups(batch_size=2)
+    assert stats == {"social_post": 2, "social_like": 3, "social_comment": 2, "social_share": 1}
+    # Only the new rows are counted on the next run
+    Like.objects.create(user=author, post=hot)
+    assert sum(update_rollups().values()) == 1
+    assert sum(update_rollups().values()) == 0
+    day = PostEngagementRollup.objects.get(period="day", post=hot, bucket__gte=timezone.now() - timedelta(days=1))
+    assert (day.likes, day.comments, day.score) == (3, 1, 5)
+
+    query = """
+    query($window: RollupWindow) {
+      popularPosts(window: $window) { content }
+      activeUsers(window: $window) { user { username } total }
+    }
+    """
+    # Reads the rollups (and the post/user rows), never the interaction tables
+    with django_assert_max_num_queries(4):
+        data = execute(query, window="DAY")
+    assert [post["content"] for post in data["popularPosts"]] == ["hot", "cold"]
+    assert data["activeUsers"][0] == {"user": {"username": "author"}, "total": 3}
+    assert {row["user"]["username"] for row in data["activeUsers"]} == {"author", "fan", "lurker"}
+
+    data = execute(query, window="WEEK")
+    assert [post["content"] for post in data["popularPosts"]] == ["cold", "hot"]
+    assert data["activeUsers"][0] == {"user": {"username": "lurker"}, "total": 4}
+    assert UserActivityRollup.objects.filter(period="hour").exists()
+
+
+@pytest.mark.django_db
+def test_generate_dataset_and_benchmark_report():
+    from utils import benchmark
+
+    call_command(
+        "generate_dataset", users=20, posts=50, interactions=200, follows_per_user=5, stdout=StringIO()
+    )
+    assert User.objects.count() == 20 and Post.objects.count() == 50
+    assert Follow.objects.exists() and Like.objects.exists()
+    # Counters and inboxes are derived after the bulk inserts
+    post = Post.objects.order_by("-likes_count").first()
+    assert post.likes_count == Like.objects.filter(post=post).count() > 0
+    assert FeedEntry.objects.exists()
+
+    report = benchmark.run({"posts", "post", "personalizedFeed", "likePost"}, iterations=3, warmup=1)
+    assert set(report["operations"]) == {"posts", "post", "personalizedFeed", "likePost"}
+    result = report["operations"]["personalizedFeed"]
+    assert result["errors"] == 0
+    assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+    assert result["queries_max"] >= 1 and result["peak_memory_kib"] > 0
+    assert report["meta"]["dataset"]["post"] == 50
+
+    changes = benchmark.compare(report, report)
+    assert changes["posts"]["p95_ms"] == 0
@@ -0,0 +1,109 @@
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from utils.pagination import Keyset
+from .models import Post, Comment, Like, Share, TrendingScore
+
+# Engagement weights (same as Post.popularity_score): likes=1, comments=2, shares=3
+WEIGHTS = {Like: 1, Comment: 2, Share: 3}
+# Fixed reference point of the decay; scores are only compared with each other
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+# Contribution left after a removal that cancels everything (effectively zero)
+MIN_REMAINDER = 1e-12
+
+# Keyset for the trending connection: (score, id), posts without engagement excluded
+TRENDING_KEYSET = Keyset(("trending__score", "trending_score"), "id")
+
+
+# log(weight * 2 ** (age_since_epoch / half_life)) for an event at `at`.
+# A decayed sum Σ w·2^(-(now - t)/h) ranks posts the same as Σ w·2^((t - epoch)/h),
+# so scores never need to be touched as time passes; they are kept in log space
+# so they grow linearly instead of overflowing.
+def event_score(weight, at):
+    hours = (at - EPOCH).total_seconds() / 3600
+    return math.log(weight) + math.log(2) * hours / settings.TRENDING_HALF_LIFE_HOURS
+
+
+def _log_add(x):
+    # log(e^score + e^x) = max(score, x) + log(1 + e^-|score - x|)
+    score, x = F("score"), Value(x, output_field=FloatField())
+    return Greatest(score, x) + Ln(Value(1.0) + Exp(-Abs(score - x)))
+
+
+def _log_subtract(x):
+    # log(e^score - e^x), floored so removing more than was added cannot fail
+    score, x = F("score"), Value(x, output_field=FloatField())
+    return score + Ln(Greatest(Value(1.0) - Exp(x - score), Value(MIN_REMAINDER)))
+
+
+# Apply one engagement event to a post's score (negative weight removes it again)
+def record(post_id, weight, at=None):
+    at = at or timezone.now()
+    x = event_score(abs(weight), at)
+    scores = TrendingScore.objects.filter(post_id=post_id)
+    if weight < 0:
+        scores.update(score=_log_subtract(x), updated_at=timezone.now())
+        return
+    if scores.update(score=_log_add(x), updated_at=timezone.now()):
+        return
+    _, created = TrendingScore.objects.get_or_create(post_id=post_id, defaults={"score": x})
+    if not created:
+        # Lost the race to create the row: add onto the winner's score
+        scores.update(score=_log_add(x), updated_at=timezone.now())
+
+
+def record_interaction(interaction, removed=False):
+    weight = WEIGHTS[type(interaction)]
+    record(interaction.post_id, -weight if removed else weight, at=interaction.created_at)
+
+
+# Posts on the leaderboard, with their score available as `trending_score`
+def trending_queryset(queryset):
+    return queryset.filter(trending__isnull=False).annotate(trending_score=F("trending__score"))
+
+
+# Top posts by decayed score: an index range scan over TrendingScore.score.
+# Posts nobody engaged with follow, newest first, when the board is short.
+def trending_posts(queryset, limit=None):
+    ranked = list(TRENDING_KEYSET.order(trending_queryset(queryset))[:limit])
+    if limit is None or len(ranked) < limit:
+        rest = queryset.filter(trending__isnull=True).order_by("-created_at", "-id")
+        ranked += list(rest if limit is None else rest[: limit - len(ranked)])
+    return ranked
+
+
+# Recompute every score from the raw interaction tables (after changing the half-life)
+def rebuild(batch_size=1000):
+    last_id = 0
+    rebuilt = 0
+    while True:
+        ids = list(
+            Post.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        totals = {}
+        for model, weight in WEIGHTS.items():
+            events = model.objects.filter(post_id__in=ids).values_list("post_id", "created_at")
+            for post_id, created_at in events.iterator(chunk_size=batch_size):
+                x = event_score(weight, created_at)
+                current = totals.get(post_id)
+                totals[post_id] = x if current is None else max(current, x) + math.log1p(
+                    math.exp(-abs(current - x))
+                )
+        TrendingScore.objects.filter(post_id__in=ids).exclude(post_id__in=totals).delete()
+        now = timezone.now()
+        TrendingScore.objects.bulk_create(
+            [TrendingScore(post_id=post_id, score=score, updated_at=now) for post_id, score in totals.items()],
+            update_conflicts=True,
+            unique_fields=["post"],
+            update_fields=["score", "updated_at"],
+        )
+        rebuilt += len(totals)
+        last_id = ids[-1]
+    return rebuilt
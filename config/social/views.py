@@ -1,3 +1,29 @@
-from django.shortcuts import render
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from .export import DATASETS, FORMATS, stream
+
+
+# GET /export/<dataset>/?format=ndjson|csv&scope=me|all — streamed, so any size fits in memory.
+# Users export their own rows (JWT or session); staff may export everything with scope=all.
+@require_GET
+def export_view(request, dataset):
+    user = request.user
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    fmt = request.GET.get("format", "ndjson")
+    scope = request.GET.get("scope", "me")
+    if dataset not in DATASETS or fmt not in FORMATS or scope not in ("me", "all"):
+        return HttpResponseBadRequest(
+            f"Datasets: {', '.join(DATASETS)}; formats: {', '.join(FORMATS)}; scopes: me, all"
+        )
+    if scope == "all" and not user.is_staff:
+        return HttpResponse(status=403)
+
+    response = StreamingHttpResponse(
+        stream(dataset, fmt, user=None if scope == "all" else user), content_type=FORMATS[fmt]
+    )
+    filename = f"{dataset}-{scope}-{timezone.now():%Y%m%d%H%M%S}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
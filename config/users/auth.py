@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import SimpleLazyObject
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.settings import jwt_settings
+from graphql_jwt.utils import get_http_authorization, get_payload
+
+from .models import User
+
+# Columns kept in a cached user, in model field order (as Model.from_db expects);
+# anything else is loaded lazily if a resolver asks for it
+SNAPSHOT_FIELDS = ("id", "is_superuser", "username", "is_staff", "is_active", "role")
+
+
+class LocalCache:
+    """Thread-safe in-process LRU whose entries also expire after a per-entry deadline."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Decoded token claims (keyed by token) and user snapshots (keyed by username)
+claims_cache = LocalCache(settings.AUTH_LOCAL_CACHE_SIZE)
+user_cache = LocalCache(settings.AUTH_LOCAL_CACHE_SIZE)
+
+
+def _snapshot_key(username):
+    return f"auth_user_{username}"
+
+
+def _claims(token):
+    payload = claims_cache.get(token)
+    if payload is None:
+        # Verifies signature and expiry; raises JSONWebTokenError
+        payload = get_payload(token)
+        remaining = payload.get("exp", time.time() + settings.AUTH_CACHE_TIMEOUT) - time.time()
+        claims_cache.set(token, payload, timeout=max(0, min(remaining, settings.AUTH_CACHE_TIMEOUT)))
+    return payload
+
+
+def _snapshot(username):
+    row = user_cache.get(username)
+    if row is None:
+        row = cache.get(_snapshot_key(username))
+        if row is None:
+            row = User.objects.filter(username=username).values_list(*SNAPSHOT_FIELDS).first()
+            if row is None:
+                return None
+            cache.set(_snapshot_key(username), row, timeout=settings.AUTH_CACHE_TIMEOUT)
+        user_cache.set(username, row, timeout=settings.AUTH_LOCAL_CACHE_TIMEOUT)
+    return row
+
+
+def get_user_by_token(token):
+    """
+    Active user for a JWT, or None when the token is invalid or the user is unknown or disabled.
+
+    The user is built from a cached snapshot of SNAPSHOT_FIELDS, so a warm
+    lookup costs no query (and no signature check while the claims are cached).
+    """
+    try:
+        payload = _claims(token)
+    except JSONWebTokenError:
+        return None
+    username = jwt_settings.JWT_PAYLOAD_GET_USERNAME_HANDLER(payload)
+    row = _snapshot(username) if username else None
+    if row is None:
+        return None
+    user = User.from_db("default", SNAPSHOT_FIELDS, row)
+    return user if user.is_active else None
+
+
+# Drop cached snapshots of users (after deactivation, password or role changes, deletion)
+def forget_users(*usernames):
+    for username in usernames:
+        user_cache.delete(username)
+    cache.delete_many([_snapshot_key(username) for username in usernames])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _forget_saved_user(sender, instance, **kwargs):
+    # Other processes keep their local copy for at most AUTH_LOCAL_CACHE_TIMEOUT seconds
+    forget_users(instance.username)
+
+
+class JWTAuthenticationMiddleware:
+    """
+    Authenticate a JWT once per HTTP request, before GraphQL execution.
+
+    graphql_jwt's Graphene middleware authenticates from inside resolvers;
+    with `request.user` already set it has nothing left to do. Invalid
+    tokens leave the user anonymous, so graphql_jwt still reports the error.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = get_http_authorization(request)
+        if token and not request.user.is_authenticated:
+            session_user = request.user
+            request.user = SimpleLazyObject(lambda: get_user_by_token(token) or session_user)
+        return self.get_response(request)
@@ -1,11 +1,81 @@
 import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
 from django.utils.timezone import now
+from graphql_jwt.refresh_token.utils import get_refresh_token_model
+
+from social.feed import purge_authors
+from utils.metrics import cron_job
+from .auth import forget_users
 from .models import User
-def deactivate_inactive_users(): # deactivate user who have not logged in for the past 6 months
-    cutoff_date = now() - datetime.timedelta(days=180)
-    inactive_users = User.object.filter(is_active=True, last_login__lt=cutoff_date)
-    count = inactive_users.count()
-    inactive_users.update(is_active=False)
-    print (f'[corn] Deactivated {count} inactive users (last login before {cutoff_date}).')
-
-    
\ No newline at end of file
+
+logger = logging.getLogger(__name__)
+
+# (last_login, id) of the last user handled by an interrupted run; cleared once a run completes
+CHECKPOINT_KEY = "deactivate_inactive_users_checkpoint"
+CHECKPOINT_TIMEOUT = 7 * 24 * 3600
+
+
+def _deactivate_batch(cutoff_date, after, batch_size):
+    with transaction.atomic():
+        # Lock only this chunk, read in the order of the partial user_inactive_scan_idx index
+        users = User.objects.select_for_update().filter(is_active=True, last_login__lt=cutoff_date)
+        if after is not None:
+            last_login, last_id = after
+            users = users.filter(Q(last_login__gt=last_login) | Q(last_login=last_login, id__gt=last_id))
+        rows = list(users.order_by("last_login", "id").values_list("last_login", "id")[:batch_size])
+        if not rows:
+            return rows
+        ids = [user_id for _, user_id in rows]
+        User.objects.filter(id__in=ids).update(is_active=False)
+        # update() sends no signals: drop the cached auth snapshots once committed
+        usernames = list(User.objects.filter(id__in=ids).values_list("username", flat=True))
+        transaction.on_commit(lambda: forget_users(*usernames))
+        get_refresh_token_model().objects.filter(user_id__in=ids, revoked__isnull=True).update(revoked=now())
+    # Inbox pruning can touch many rows: it runs after the user locks are released, in chunks
+    purge_authors(ids)
+    return rows
+
+
+@cron_job("deactivate_inactive_users")
+def deactivate_inactive_users(batch_size=None, sleep=None): # deactivate user who have not logged in for the past 6 months
+    """
+    Deactivate users whose last login is older than USER_INACTIVE_DAYS.
+
+    Users are walked in (last_login, id) order, `batch_size` at a time, each
+    chunk in its own short transaction: the users are flagged inactive and
+    their refresh tokens revoked; their posts are then removed from follower
+    inboxes in bounded deletes once the chunk has committed. The
+    position reached is checkpointed in the cache, so a restarted run resumes there.
+    """
+    batch_size = batch_size or settings.USER_DEACTIVATION_BATCH_SIZE
+    sleep = settings.USER_DEACTIVATION_BATCH_SLEEP if sleep is None else sleep
+    cutoff_date = now() - datetime.timedelta(days=settings.USER_INACTIVE_DAYS)
+
+    after = cache.get(CHECKPOINT_KEY)
+    if after:
+        logger.info("deactivate_inactive_users resuming after user %d", after[1])
+    count = 0
+    batches = 0
+    while True:
+        rows = _deactivate_batch(cutoff_date, after, batch_size)
+        if not rows:
+            break
+        count += len(rows)
+        batches += 1
+        after = rows[-1]
+        cache.set(CHECKPOINT_KEY, after, timeout=CHECKPOINT_TIMEOUT)
+        logger.info("deactivate_inactive_users batch %d: %d users (up to id %d)", batches, len(rows), after[1])
+        if len(rows) < batch_size:
+            break
+        if sleep:
+            time.sleep(sleep)
+
+    cache.delete(CHECKPOINT_KEY)
+    print(f'[cron] Deactivated {count} inactive users (last login before {cutoff_date}) in {batches} batches.')
+    return count
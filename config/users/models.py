@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Q
 
 
 # Custom User Model
@@ -18,6 +19,17 @@ class User(AbstractUser):
         default="user",  # Default role when new user is created
     )
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Partial index on (last_login, id) for the inactive-user cron, which walks it as a keyset:
+            # only active users are indexed, ordered by last login then id
+            models.Index(
+                fields=["last_login", "id"],
+                condition=Q(is_active=True),
+                name="user_inactive_scan_idx",
+            ),
+        ]
+
     def __str__(self):
         # Return the username when object is printed
         return self.username
@@ -45,6 +57,9 @@ class Follow(models.Model):
         indexes = [
             models.Index(fields=["follower"]),
             models.Index(fields=["following"]),
+            # Keyset pagination of follower/following lists
+            models.Index(fields=["following", "-created_at", "-id"]),
+            models.Index(fields=["follower", "-created_at", "-id"]),
         ]
         verbose_name = "Follow"
         verbose_name_plural = "Follows"
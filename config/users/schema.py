@@ -2,15 +2,25 @@ import graphene
 from graphene_django import DjangoObjectType
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
 from django.db.models import Count
+from django.utils import timezone
 from graphql import GraphQLError
 from graphql_jwt.shortcuts import get_token, create_refresh_token
 from graphql_jwt.mixins import ObtainJSONWebTokenMixin
 
 from .models import Follow
+from social.feed import backfill_follow, promote_authors, prune_unfollow
+from social.schema import BatchItemResult, batch_ids
+from utils.loaders import get_loaders, load_related
+from utils.pagination import Keyset, paginate
+from utils.sql import insert_unique, insert_unique_many
 
 User = get_user_model()
 
+# Keyset sort order for follower/following connections
+FOLLOW_KEYSET = Keyset("created_at", "id")
+
 
 # GraphQL Types
 class UserType(DjangoObjectType):
@@ -22,13 +32,22 @@ class UserType(DjangoObjectType):
         model = User
         fields = ("id", "username", "email", "bio", "role")
 
-    # Resolve annotated or fallback followers count
+    # Resolve annotated count, or batch it through the per-request loader
     def resolve_followers_count(self, info):
-        return getattr(self, "followers_count", self.followers.count())
+        if hasattr(self, "followers_count"):
+            return self.followers_count
+        return get_loaders(info).followers_count.load(self.id)
 
-    # Resolve annotated or fallback following count
+    # Resolve annotated count, or batch it through the per-request loader
     def resolve_following_count(self, info):
-        return getattr(self, "following_count", self.following.count())
+        if hasattr(self, "following_count"):
+            return self.following_count
+        return get_loaders(info).following_count.load(self.id)
+
+
+class UserConnection(graphene.relay.Connection):
+    class Meta:
+        node = UserType
 
 
 class FollowType(DjangoObjectType):
@@ -36,6 +55,13 @@ class FollowType(DjangoObjectType):
         model = Follow
         fields = ("id", "follower", "following", "created_at")
 
+    # Batched through the per-request loaders instead of one query per row
+    def resolve_follower(self, info):
+        return load_related(info, self, "follower", "user")
+
+    def resolve_following(self, info):
+        return load_related(info, self, "following", "user")
+
 
 # Queries
 class UserQuery(graphene.ObjectType):
@@ -45,6 +71,14 @@ class UserQuery(graphene.ObjectType):
     followers = graphene.List(UserType, user_id=graphene.Int(required=True))
     following = graphene.List(UserType, user_id=graphene.Int(required=True))
 
+    # Relay connections over follow edges, newest follow first
+    followers_connection = graphene.relay.ConnectionField(
+        UserConnection, user_id=graphene.Int(required=True)
+    )
+    following_connection = graphene.relay.ConnectionField(
+        UserConnection, user_id=graphene.Int(required=True)
+    )
+
     # Current authenticated user
     def resolve_me(root, info):
         user = info.context.user
@@ -82,6 +116,20 @@ class UserQuery(graphene.ObjectType):
             .annotate(followers_count=Count("followers"))
         )
 
+    # Followers of a user, paginated on the follow edge (created_at, id)
+    def resolve_followers_connection(root, info, user_id, **kwargs):
+        edges = Follow.objects.filter(following_id=user_id).select_related("follower")
+        return paginate(
+            UserConnection, [(edges, FOLLOW_KEYSET)], node=lambda follow: follow.follower, **kwargs
+        )
+
+    # Users a user follows, paginated on the follow edge (created_at, id)
+    def resolve_following_connection(root, info, user_id, **kwargs):
+        edges = Follow.objects.filter(follower_id=user_id).select_related("following")
+        return paginate(
+            UserConnection, [(edges, FOLLOW_KEYSET)], node=lambda follow: follow.following, **kwargs
+        )
+
 
 # Mutations
 class CreateUser(graphene.Mutation):
@@ -139,20 +187,63 @@ class FollowUser(graphene.Mutation):
     class Arguments:
         user_id = graphene.Int(required=True)
 
-    # Follow another user
+    # Follow another user (a repeated follow is a no-op)
     def mutate(self, info, user_id):
         user = info.context.user
         if user.is_anonymous:
             raise GraphQLError("Authentication required")
+        if user.id == user_id:
+            raise GraphQLError("You cannot follow yourself")
 
-        target = User.objects.filter(id=user_id).first()
-        if not target:
+        # One INSERT ... SELECT ... ON CONFLICT DO NOTHING: skipped if the target is missing or already followed
+        with transaction.atomic():
+            follow = insert_unique(Follow, "following", user_id, {"follower": user.id, "created_at": timezone.now()})
+            if follow is not None:
+                # A target crossing FEED_FANOUT_MAX_FOLLOWERS is pulled from now on: no backfill
+                if not promote_authors(user_id):
+                    backfill_follow(user.id, user_id)
+        if follow is not None:
+            return FollowUser(follow=follow, created=True)
+
+        follow = Follow.objects.filter(follower=user, following_id=user_id).first()
+        if follow is None:
             raise GraphQLError("Target user not found")
-        if user == target:
-            raise GraphQLError("You cannot follow yourself")
+        return FollowUser(follow=follow, created=False)
+
+
+class FollowUsers(graphene.Mutation):
+    results = graphene.List(BatchItemResult)
+
+    class Arguments:
+        user_ids = graphene.List(graphene.NonNull(graphene.Int), required=True)
+
+    # Follow many users in one transaction; users already followed are skipped
+    def mutate(self, info, user_ids):
+        user = info.context.user
+        if user.is_anonymous:
+            raise GraphQLError("Authentication required")
 
-        follow, created = Follow.objects.get_or_create(follower=user, following=target)
-        return FollowUser(follow=follow, created=created)
+        user_ids = batch_ids(user_ids)
+        with transaction.atomic():
+            found = set(User.objects.filter(id__in=user_ids).values_list("id", flat=True))
+            # One INSERT ... ON CONFLICT DO NOTHING RETURNING: only follows it returns are new,
+            # so a follow committed concurrently is neither reported as created nor backfilled twice
+            targets = [target_id for target_id in user_ids if target_id in found and target_id != user.id]
+            new = insert_unique_many(Follow, "following", targets, {"follower": user.id, "created_at": timezone.now()})
+            created = {follow.following_id for follow in new}
+            promoted = set(promote_authors(*created))
+            for target_id in created - promoted:
+                backfill_follow(user.id, target_id)
+
+        results = []
+        for target_id in user_ids:
+            if target_id not in found:
+                results.append(BatchItemResult(id=target_id, created=False, error="Target user not found"))
+            elif target_id == user.id:
+                results.append(BatchItemResult(id=target_id, created=False, error="You cannot follow yourself"))
+            else:
+                results.append(BatchItemResult(id=target_id, created=target_id in created))
+        return FollowUsers(results=results)
 
 
 class UnfollowUser(graphene.Mutation):
@@ -176,6 +267,8 @@ class UnfollowUser(graphene.Mutation):
         deleted, _ = Follow.objects.filter(
             follower=user, following=target
         ).delete()
+        if deleted:
+            prune_unfollow(user.id, target.id)
 
         return UnfollowUser(ok=bool(deleted), target_user_id=target.id)
 
@@ -212,5 +305,6 @@ class CustomObtainJSONWebToken(graphene.Mutation):
 class UserMutation(graphene.ObjectType):
     signup = CreateUser.Field()
     follow_user = FollowUser.Field()
+    follow_users = FollowUsers.Field()
     unfollow_user = UnfollowUser.Field()
     login = CustomObtainJSONWebToken.Field()
@@ -1,3 +1,143 @@
-from django.test import TestCase
+import pytest
+from django.test import RequestFactory
 
-# Create your tests here.
+from users.models import User, Follow
+from config.schema import schema
+
+
+def execute(query, user=None, **variables):
+    request = RequestFactory().post("/graphql/")
+    request.user = user
+    result = schema.execute(query, context_value=request, variable_values=variables)
+    assert result.errors is None, result.errors
+    return result.data
+
+
+FOLLOWERS_QUERY = """
+query($id: Int!, $first: Int, $after: String) {
+  followersConnection(userId: $id, first: $first, after: $after) {
+    edges { node { username } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+
+@pytest.mark.django_db
+def test_followers_connection_walks_all_followers():
+    target = User.objects.create_user(username="target", password="pass123")
+    for i in range(3):
+        fan = User.objects.create_user(username=f"fan{i}", password="pass123")
+        Follow.objects.create(follower=fan, following=target)
+
+    seen, after = [], None
+    while True:
+        page = execute(FOLLOWERS_QUERY, id=target.id, first=2, after=after)["followersConnection"]
+        seen += [edge["node"]["username"] for edge in page["edges"]]
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+        after = page["pageInfo"]["endCursor"]
+
+    assert seen == ["fan2", "fan1", "fan0"]
+
+
+@pytest.mark.django_db
+def test_follow_user_is_idempotent():
+    reader = User.objects.create_user(username="reader", password="pass123")
+    author = User.objects.create_user(username="author", password="pass123")
+    query = "mutation($id: Int!) { followUser(userId: $id) { created follow { following { username } } } }"
+
+    first = execute(query, reader, id=author.id)["followUser"]
+    assert first == {"created": True, "follow": {"following": {"username": "author"}}}
+    assert execute(query, reader, id=author.id)["followUser"]["created"] is False
+    assert Follow.objects.filter(follower=reader).count() == 1
+
+    with pytest.raises(AssertionError, match="Target user not found"):
+        execute(query, reader, id=999)
+
+
+@pytest.mark.django_db
+def test_follow_users_in_one_batch():
+    from social.models import Post, FeedEntry
+
+    reader = User.objects.create_user(username="reader", password="pass123")
+    authors = [User.objects.create_user(username=f"author{i}", password="pass123") for i in range(2)]
+    for author in authors:
+        Post.objects.create(author=author, content=f"by {author.username}")
+    Follow.objects.create(follower=reader, following=authors[0])
+
+    ids = [authors[0].id, authors[1].id, reader.id, 999]
+    results = execute(
+        "mutation($ids: [Int!]!) { followUsers(userIds: $ids) { results { id created error } } }", reader, ids=ids
+    )["followUsers"]["results"]
+    assert [(item["created"], item["error"]) for item in results] == [
+        (False, None), (True, None), (False, "You cannot follow yourself"), (False, "Target user not found"),
+    ]
+    assert Follow.objects.filter(follower=reader).count() == 2
+    # The new author's posts were backfilled into the reader's feed
+    assert FeedEntry.objects.filter(user=reader, author=authors[1]).count() == 1
+
+
+@pytest.mark.django_db
+def test_deactivate_inactive_users_in_batches_with_cleanup(settings):
+    from datetime import timedelta
+
+    from django.core.cache import cache
+    from django.utils import timezone
+    from graphql_jwt.refresh_token.utils import get_refresh_token_model
+
+    from social.models import Post, FeedEntry
+    from users import cron
+
+    settings.USER_INACTIVE_DAYS = 180
+    long_ago = timezone.now() - timedelta(days=200)
+    reader = User.objects.create_user(username="reader", password="pass123", last_login=timezone.now())
+    stale = [
+        User.objects.create_user(username=f"stale{i}", password="pass123", last_login=long_ago)
+        for i in range(3)
+    ]
+    post = Post.objects.create(author=stale[0], content="old news")
+    FeedEntry.objects.create(user=reader, post=post, author=stale[0], created_at=post.created_at)
+    token = get_refresh_token_model().objects.create(user=stale[1])
+
+    # Resume after an interrupted run that already handled the first stale user
+    cache.set(cron.CHECKPOINT_KEY, (stale[0].last_login, stale[0].id))
+    assert cron.deactivate_inactive_users(batch_size=1, sleep=0) == 2
+    assert cache.get(cron.CHECKPOINT_KEY) is None
+    token.refresh_from_db()
+    assert token.revoked is not None
+
+    assert cron.deactivate_inactive_users(batch_size=1, sleep=0) == 1
+    assert list(User.objects.filter(is_active=True).values_list("username", flat=True)) == ["reader"]
+    assert not FeedEntry.objects.exists()
+
+
+@pytest.mark.django_db
+def test_jwt_user_is_authenticated_once_and_cached(client, django_assert_num_queries):
+    import json
+
+    from django.core.cache import cache
+    from graphql_jwt.shortcuts import get_token
+
+    from users import auth
+
+    cache.clear()
+    auth.user_cache.clear()
+    user = User.objects.create_user(username="reader", password="pass123")
+    headers = {"Authorization": f"JWT {get_token(user)}"}
+    me = json.dumps({"query": "{ me { id username } }"})
+
+    def post():
+        response = client.post("/graphql/", data=me, content_type="application/json", headers=headers)
+        return response.json()["data"]["me"]
+
+    assert post()["username"] == "reader"
+    # Warm: neither the token nor the user needs the database
+    with django_assert_num_queries(0):
+        assert post()["username"] == "reader"
+
+    # Deactivation invalidates the snapshot; graphql_jwt then rejects the token
+    user.is_active = False
+    user.save()
+    response = client.post("/graphql/", data=me, content_type="application/json", headers=headers)
+    assert "disabled" in response.json()["errors"][0]["message"]
@@ -0,0 +1,236 @@
+import json
+import math
+import random
+import time
+import tracemalloc
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from users.models import User, Follow
+from social.models import Post, Comment, Like, Share
+
+# One GraphQL operation of the benchmark; `variables(sample)` picks its arguments
+Operation = namedtuple("Operation", ["name", "query", "variables", "authenticated"])
+
+OPERATIONS = [
+    Operation(
+        "posts",
+        "query($limit: Int) { posts(limit: $limit) { id content likesCount author { username } } }",
+        lambda sample: {"limit": 20},
+        False,
+    ),
+    Operation(
+        "post",
+        "query($id: Int!) { post(id: $id) { id content likesCount commentsCount author { username } } }",
+        lambda sample: {"id": sample.post_id()},
+        False,
+    ),
+    Operation(
+        "postsConnection",
+        "query($first: Int) { postsConnection(first: $first) { edges { cursor node { id author { username } } } "
+        "pageInfo { hasNextPage } } }",
+        lambda sample: {"first": 20},
+        False,
+    ),
+    Operation(
+        "personalizedFeed",
+        "query($limit: Int) { personalizedFeed(limit: $limit) { id content likesCount author { username } } }",
+        lambda sample: {"limit": 20},
+        True,
+    ),
+    Operation(
+        "trendingFeed",
+        "query($limit: Int) { trendingFeed(limit: $limit) { id content likesCount author { username } } }",
+        lambda sample: {"limit": 20},
+        False,
+    ),
+    Operation(
+        "users",
+        "query($limit: Int) { users(limit: $limit) { id username followersCount followingCount } }",
+        lambda sample: {"limit": 20},
+        False,
+    ),
+    Operation(
+        "followers",
+        "query($id: Int!) { followers(userId: $id) { id username followingCount } }",
+        lambda sample: {"id": sample.user_id()},
+        False,
+    ),
+    Operation(
+        "followersConnection",
+        "query($id: Int!) { followersConnection(userId: $id, first: 20) { edges { node { username } } } }",
+        lambda sample: {"id": sample.user_id()},
+        False,
+    ),
+    Operation(
+        "createPost",
+        "mutation($content: String!) { createPost(content: $content) { post { id } } }",
+        lambda sample: {"content": "benchmark post"},
+        True,
+    ),
+    Operation(
+        "likePost",
+        "mutation($id: Int!) { likePost(postId: $id) { created } }",
+        lambda sample: {"id": sample.post_id()},
+        True,
+    ),
+    Operation(
+        "sharePost",
+        "mutation($id: Int!) { sharePost(postId: $id) { share { id } } }",
+        lambda sample: {"id": sample.post_id()},
+        True,
+    ),
+    Operation(
+        "createComment",
+        "mutation($id: Int!) { createComment(postId: $id, text: \"benchmark\") { comment { id } } }",
+        lambda sample: {"id": sample.post_id()},
+        True,
+    ),
+    Operation(
+        "followUser",
+        "mutation($id: Int!) { followUser(userId: $id) { created } }",
+        lambda sample: {"id": sample.user_id()},
+        True,
+    ),
+]
+
+
+class Sample:
+    """Random (but seeded) users and posts to run the operations against."""
+
+    def __init__(self, seed, size=1000):
+        self.rng = random.Random(seed)
+        # Drawn by the seeded rng from ids in a fixed order, so a seed picks the same sample every run
+        self.user_ids = self._sample(User.objects.filter(is_active=True), size)
+        self.post_ids = self._sample(Post.objects.all(), size)
+        if not self.user_ids or not self.post_ids:
+            raise ValueError("The database has no users or posts; run `manage.py generate_dataset` first")
+        self.clients = {}
+
+    def _sample(self, queryset, size):
+        ids = list(queryset.order_by("id").values_list("id", flat=True))
+        return self.rng.sample(ids, min(size, len(ids)))
+
+    def user_id(self):
+        return self.rng.choice(self.user_ids)
+
+    def post_id(self):
+        return self.rng.choice(self.post_ids)
+
+    def client(self, authenticated):
+        # One logged-in client per user, so sessions are created once
+        user_id = self.user_id() if authenticated else None
+        if user_id not in self.clients:
+            client = Client()
+            if user_id:
+                client.force_login(User.objects.get(id=user_id))
+            self.clients[user_id] = client
+        return self.clients[user_id]
+
+
+def percentile(values, q):
+    # Nearest-rank percentile of an already sorted list
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+# Client (logged in once) and JSON body of one request, prepared outside the measured window
+def _prepare(sample, operation):
+    client = sample.client(operation.authenticated)
+    return client, json.dumps({"query": operation.query, "variables": operation.variables(sample)})
+
+
+def _post(client, payload):
+    started = time.perf_counter()
+    response = client.post("/graphql/", data=payload, content_type="application/json")
+    elapsed = time.perf_counter() - started
+    failed = response.status_code != 200 or bool(response.json().get("errors"))
+    return elapsed, failed
+
+
+def run_operation(sample, operation, iterations, warmup):
+    for _ in range(warmup):
+        _post(*_prepare(sample, operation))
+
+    latencies, queries, errors = [], [], 0
+    for _ in range(iterations):
+        client, payload = _prepare(sample, operation)
+        with CaptureQueriesContext(connection) as captured:
+            elapsed, failed = _post(client, payload)
+        latencies.append(elapsed * 1000)
+        queries.append(len(captured))
+        errors += failed
+
+    # Peak memory is measured in separate runs: tracemalloc slows everything down
+    peaks = []
+    for _ in range(min(iterations, 5)):
+        client, payload = _prepare(sample, operation)
+        tracemalloc.start()
+        _post(client, payload)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "max_ms": round(latencies[-1], 3),
+        "queries_mean": round(sum(queries) / len(queries), 2),
+        "queries_max": max(queries),
+        "peak_memory_kib": round(max(peaks) / 1024, 1),
+    }
+
+
+def dataset_size():
+    return {
+        model._meta.model_name: model.objects.count()
+        for model in (User, Follow, Post, Like, Comment, Share)
+    }
+
+
+def run(operations=None, iterations=50, warmup=5, seed=42):
+    """
+    Run each operation through the real /graphql/ endpoint (middleware,
+    cost checks, document cache, resolvers) and return a JSON-serializable
+    report: latency percentiles in milliseconds, SQL queries per request and
+    peak Python memory per request.
+    """
+    selected = [op for op in OPERATIONS if operations is None or op.name in operations]
+    sample = Sample(seed)
+    started = time.perf_counter()
+    results = {op.name: run_operation(sample, op, iterations, warmup) for op in selected}
+    return {
+        "meta": {
+            "created_at": timezone.now().isoformat(),
+            "duration_s": round(time.perf_counter() - started, 3),
+            "iterations": iterations,
+            "warmup": warmup,
+            "seed": seed,
+            "database": connection.vendor,
+            "cache": settings.CACHES["default"]["BACKEND"],
+            "dataset": dataset_size(),
+        },
+        "operations": results,
+    }
+
+
+# Relative change of the headline metrics between two reports, for operations present in both
+def compare(previous, current, metrics=("p50_ms", "p95_ms", "p99_ms", "queries_mean", "peak_memory_kib")):
+    changes = {}
+    for name, result in current["operations"].items():
+        before = previous["operations"].get(name)
+        if not before:
+            continue
+        changes[name] = {
+            metric: round((result[metric] - before[metric]) / before[metric] * 100, 1) if before[metric] else None
+            for metric in metrics
+        }
+    return changes
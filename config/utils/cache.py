@@ -0,0 +1,93 @@
+import math
+import random
+import time
+import uuid
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+
+from .tracing import record_cache
+
+# How long a recompute may hold the single-flight lock
+LOCK_TIMEOUT = 10
+# How long other callers wait for a missing value before computing it themselves
+WAIT_TIMEOUT = 2
+WAIT_INTERVAL = 0.05
+
+
+def add_many(data, timeout=None):
+    """
+    cache.add() for every (key, value) of `data`: keys that already exist keep
+    their value. On Redis this is one pipelined round trip of SET NX.
+    """
+    # `cache` is a proxy: the backend class is only visible on the instance behind it
+    backend = caches["default"]
+    if not isinstance(backend, RedisCache):
+        for key, value in data.items():
+            backend.add(key, value, timeout=timeout)
+        return
+    # Django's Redis client exposes no pipeline: this reaches into its client and serializer,
+    # which is why Django is pinned in requirements.txt
+    client = backend._cache.get_client(write=True)
+    pipeline = client.pipeline(transaction=False)
+    for key, value in data.items():
+        pipeline.set(
+            backend.make_and_validate_key(key),
+            backend._cache._serializer.dumps(value),
+            ex=backend.get_backend_timeout(timeout),
+            nx=True,
+        )
+    pipeline.execute()
+
+
+def _should_refresh_early(delta, expires_at, beta):
+    # Probabilistic early expiration ("XFetch"): the closer to expiry and the
+    # slower the computation, the more likely a caller refreshes ahead of time.
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def get_or_compute(key, compute, timeout, beta=1.0, name="other"):
+    """
+    Read `key` from the shared cache, computing and storing it on a miss.
+
+    Stampede protection:
+    - single flight: only the caller that wins `cache.add(<key>:lock)` runs
+      `compute()`; the others wait briefly for its result;
+    - early refresh: while the entry is still valid, one caller may refresh it
+      before it expires (probability grows towards expiry), and everyone else
+      keeps getting the current value meanwhile.
+
+    Hits and misses are reported under `name` (keep it a fixed string).
+    """
+    entry = cache.get(key)
+    record_cache(name, hits=int(entry is not None), misses=int(entry is None))
+    if entry is not None:
+        value, delta, expires_at = entry
+        if not _should_refresh_early(delta, expires_at, beta):
+            return value
+
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, timeout=LOCK_TIMEOUT):
+        try:
+            started = time.time()
+            value = compute()
+            delta = time.time() - started
+            cache.set(key, (value, delta, time.time() + timeout), timeout=timeout)
+            return value
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    if entry is not None:
+        # Someone else is refreshing: serve the still-valid value
+        return entry[0]
+
+    deadline = time.time() + WAIT_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    # The lock holder is too slow (or died): compute without caching
+    return compute()
@@ -0,0 +1,171 @@
+from graphql.language import ast
+from graphql.type.definition import GraphQLList, GraphQLNonNull, GraphQLObjectType, GraphQLInterfaceType
+from graphql.utils.value_from_ast import value_from_ast
+
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+# Arguments that bound how many items a list/connection field returns
+SIZE_ARGUMENTS = ("limit", "first", "last")
+# Assumed size of a list field queried without any size argument
+DEFAULT_LIST_SIZE = 100
+# Cost of each object returned by a field; scalar fields are free
+DEFAULT_FIELD_COST = 1
+# Flat surcharge for expensive fields ("Type.field": cost), on top of their objects
+FIELD_COSTS = {
+    "Query.personalizedFeed": 5,
+    "Query.personalizedFeedConnection": 5,
+    "Query.trendingFeed": 5,
+    "Query.trendingFeedConnection": 5,
+}
+
+
+class QueryCost:
+    """Result of a cost analysis: nesting depth and estimated number of objects resolved."""
+
+    def __init__(self, depth=0, cost=0):
+        self.depth = depth
+        self.cost = cost
+
+    def as_dict(self):
+        return {"depth": self.depth, "cost": self.cost}
+
+
+def _unwrap(field_type):
+    # Strip NonNull/List wrappers, remembering whether a list was involved
+    is_list = False
+    while isinstance(field_type, (GraphQLNonNull, GraphQLList)):
+        if isinstance(field_type, GraphQLList):
+            is_list = True
+        field_type = field_type.of_type
+    return field_type, is_list
+
+
+class CostAnalyzer:
+    """
+    Static cost analysis of a parsed operation, run before execution.
+
+    Every object a field can return costs DEFAULT_FIELD_COST plus the cost of
+    its children; the number of objects is the `limit`/`first`/`last` argument,
+    DEFAULT_LIST_SIZE for unbounded lists, and 1 for connection `edges` (already
+    bounded by `first`). FIELD_COSTS adds a flat surcharge for heavy fields.
+    Unknown fields are skipped; regular validation reports them afterwards.
+    """
+
+    def __init__(self, schema, document_ast, variables=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document_ast.definitions
+            if isinstance(definition, ast.FragmentDefinition)
+        }
+        self.operations = [
+            definition
+            for definition in document_ast.definitions
+            if isinstance(definition, ast.OperationDefinition)
+        ]
+
+    def analyze(self, operation_name=None):
+        operation = self._get_operation(operation_name)
+        if operation is None:
+            return QueryCost()
+        root_type = {
+            "query": self.schema.get_query_type(),
+            "mutation": self.schema.get_mutation_type(),
+            "subscription": self.schema.get_subscription_type(),
+        }.get(operation.operation)
+        if root_type is None:
+            return QueryCost()
+        cost, depth = self._selection_set(root_type, operation.selection_set, set())
+        return QueryCost(depth=depth, cost=cost)
+
+    def _get_operation(self, operation_name):
+        if operation_name:
+            for operation in self.operations:
+                if operation.name and operation.name.value == operation_name:
+                    return operation
+            return None
+        return self.operations[0] if len(self.operations) == 1 else None
+
+    def _selection_set(self, parent_type, selection_set, visited_fragments):
+        cost = depth = 0
+        if selection_set is None:
+            return cost, depth
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                field_cost, field_depth = self._field(parent_type, selection, visited_fragments)
+            elif isinstance(selection, ast.InlineFragment):
+                fragment_type = self._type_condition(selection, parent_type)
+                field_cost, field_depth = self._selection_set(
+                    fragment_type, selection.selection_set, visited_fragments
+                )
+            elif isinstance(selection, ast.FragmentSpread):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in visited_fragments:
+                    # Unknown or cyclic spreads are rejected by validation
+                    continue
+                field_cost, field_depth = self._selection_set(
+                    self._type_condition(fragment, parent_type),
+                    fragment.selection_set,
+                    visited_fragments | {name},
+                )
+            else:
+                continue
+            cost += field_cost
+            depth = max(depth, field_depth)
+        return cost, depth
+
+    def _type_condition(self, fragment, parent_type):
+        if fragment.type_condition is None:
+            return parent_type
+        return self.schema.get_type(fragment.type_condition.name.value) or parent_type
+
+    def _field(self, parent_type, node, visited_fragments):
+        name = node.name.value
+        if name.startswith("__"):
+            # Introspection is not priced
+            return 0, 0
+        if not isinstance(parent_type, (GraphQLObjectType, GraphQLInterfaceType)):
+            return 0, 0
+        field = parent_type.fields.get(name)
+        if field is None:
+            return 0, 0
+
+        field_type, is_list = _unwrap(field.type)
+        if node.selection_set is None:
+            return 0, 1
+
+        multiplier = self._size(field, node)
+        if multiplier is None:
+            is_edges = name == "edges" and parent_type.name.endswith("Connection")
+            if "first" in field.args:
+                # Connection without first/last: served with the default page size
+                multiplier = DEFAULT_PAGE_SIZE
+            elif is_list and not is_edges:
+                multiplier = DEFAULT_LIST_SIZE
+            else:
+                multiplier = 1
+
+        child_cost, child_depth = self._selection_set(field_type, node.selection_set, visited_fragments)
+        surcharge = FIELD_COSTS.get(f"{parent_type.name}.{name}", 0)
+        return surcharge + multiplier * (DEFAULT_FIELD_COST + child_cost), child_depth + 1
+
+    def _size(self, field, node):
+        # Value of the first size argument given (literal, variable or default)
+        provided = {argument.name.value: argument.value for argument in node.arguments or []}
+        for arg_name in SIZE_ARGUMENTS:
+            arg_def = field.args.get(arg_name)
+            if arg_def is None:
+                continue
+            value = None
+            if arg_name in provided:
+                value = value_from_ast(provided[arg_name], arg_def.type, self.variables)
+            elif arg_def.default_value is not None:
+                value = arg_def.default_value
+            if isinstance(value, int):
+                if arg_name != "limit":
+                    # Connections clamp first/last to the maximum page size
+                    value = min(value, MAX_PAGE_SIZE)
+                return max(value, 0)
+        return None
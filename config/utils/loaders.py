@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from users.models import Follow
+from social.models import Post
+
+User = get_user_model()
+
+
+# Batch primary-key lookups: one `WHERE id IN (...)` per model per request
+class ModelLoader(DataLoader):
+    def __init__(self, queryset):
+        super().__init__()
+        self.queryset = queryset
+
+    def batch_load_fn(self, keys):
+        objects = self.queryset.in_bulk(keys)
+        return Promise.resolve([objects.get(key) for key in keys])
+
+
+# Batch grouped COUNT(*)s, e.g. followers per user: one GROUP BY per request
+class CountLoader(DataLoader):
+    def __init__(self, queryset, group_by):
+        super().__init__()
+        self.queryset = queryset
+        self.group_by = group_by
+
+    def batch_load_fn(self, keys):
+        counts = dict(
+            self.queryset.filter(**{f"{self.group_by}__in": keys})
+            .order_by()
+            .values(self.group_by)
+            .annotate(total=Count("id"))
+            .values_list(self.group_by, "total")
+        )
+        return Promise.resolve([counts.get(key, 0) for key in keys])
+
+
+class Loaders:
+    """Per-request DataLoader registry, see `get_loaders`."""
+
+    def __init__(self):
+        self.user = ModelLoader(User.objects.all())
+        self.post = ModelLoader(Post.objects.all())
+        self.followers_count = CountLoader(Follow.objects.all(), "following_id")
+        self.following_count = CountLoader(Follow.objects.all(), "follower_id")
+
+
+# Loaders live on the request (info.context) so their caches never outlive it
+def get_loaders(info):
+    loaders = getattr(info.context, "loaders", None)
+    if loaders is None:
+        loaders = Loaders()
+        info.context.loaders = loaders
+    return loaders
+
+
+# Resolve a foreign key through a loader unless the object is already on the instance
+def load_related(info, instance, field_name, loader_name):
+    field = instance._meta.get_field(field_name)
+    if field.is_cached(instance):
+        return getattr(instance, field_name)
+    key = getattr(instance, field.attname)
+    if key is None:
+        return None
+    return getattr(get_loaders(info), loader_name).load(key)
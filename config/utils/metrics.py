@@ -0,0 +1,341 @@
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+# Label values kept per label before new ones are folded into "other"
+MAX_LABEL_VALUES = 50
+OVERFLOW = "other"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Cron jobs run in their own processes, so their runs are kept in METRICS_MULTIPROC_DIR or the shared cache
+CRON_JOBS = (
+    "clean_old_posts", "deactivate_inactive_users", "manage_partitions", "sync_pulled_authors", "update_rollups",
+)
+CRON_CACHE_TIMEOUT = 30 * 24 * 3600
+
+REGISTRY = []
+
+
+class Metric:
+    """
+    A metric in the Prometheus text format, counted in this process.
+
+    Each label accepts at most MAX_LABEL_VALUES distinct values (then
+    "other"), so a client inventing operation names cannot blow up the
+    number of series. With METRICS_MULTIPROC_DIR set, every worker process
+    also writes its values there and /metrics sums those of all workers.
+    """
+
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.seen = {label: set() for label in labels}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        key = []
+        for label in self.labels:
+            value = str(labels.get(label, ""))
+            seen = self.seen[label]
+            if value not in seen:
+                if len(seen) >= MAX_LABEL_VALUES:
+                    value = OVERFLOW
+                seen.add(value)
+            key.append(value)
+        return tuple(key)
+
+    def _format_labels(self, key, **extra):
+        pairs = list(zip(self.labels, key)) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    def render(self, values=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted((self.snapshot() if values is None else values).items()):
+            lines += self._render_value(key, value)
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{self._format_labels(key)} {_number(value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        with self.lock:
+            key = self._key(labels)
+            self.values[key] = self.values.get(key, 0) + amount
+        _maybe_flush()
+
+    @staticmethod
+    def merge(value, other):
+        return value + other
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        with self.lock:
+            key = self._key(labels)
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+        _maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {key: (list(counts), total) for key, (counts, total) in self.values.items()}
+
+    @staticmethod
+    def merge(value, other):
+        return [a + b for a, b in zip(value[0], other[0])], value[1] + other[1]
+
+    def _render_value(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{self._format_labels(key, le=_number(bound))} {cumulative}")
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {_number(total)}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+graphql_requests = Counter(
+    "graphql_requests_total", "GraphQL requests by operation, type and outcome.",
+    ("operation", "type", "status"),
+)
+graphql_latency = Histogram(
+    "graphql_request_duration_seconds", "GraphQL request latency.", ("operation",),
+)
+graphql_errors = Counter(
+    "graphql_resolver_errors_total", "Errors returned by GraphQL operations.", ("operation",),
+)
+db_queries = Histogram(
+    "graphql_db_queries_per_request", "SQL queries issued per GraphQL request.", ("operation",),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+db_connections = Counter(
+    "db_connection_checkouts_total",
+    "GraphQL requests by database alias and whether a persistent connection was reused.",
+    ("alias", "reused"),
+)
+cache_requests = Counter(
+    "cache_requests_total", "Cache lookups by cache and result (hit or miss).", ("cache", "result"),
+)
+
+
+class QueryCounter:
+    """connection.execute_wrapper hook counting the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def record_cache(name, hits=0, misses=0):
+    if hits:
+        cache_requests.inc(hits, cache=name, result="hit")
+    if misses:
+        cache_requests.inc(misses, cache=name, result="miss")
+
+
+def _cron_key(job, field):
+    return f"cron_metrics_{job}_{field}"
+
+
+def _cron_file(job):
+    return Path(settings.METRICS_MULTIPROC_DIR) / f"cron-{job}.json"
+
+
+_warned_local_cache = False
+
+
+def _record_cron(job, duration, status):
+    global _warned_local_cache
+    if settings.METRICS_MULTIPROC_DIR:
+        # Next to the worker files, so /metrics reads them whatever the cache backend
+        path = _cron_file(job)
+        try:
+            values = json.loads(path.read_text())
+        except (OSError, ValueError):
+            values = {}
+        values.update({"duration": duration, f"last_{status}": time.time()})
+        values[status] = values.get(status, 0) + 1
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        temporary.write_text(json.dumps(values))
+        os.replace(temporary, path)
+        return
+
+    if not _warned_local_cache and isinstance(caches["default"], LocMemCache):
+        _warned_local_cache = True
+        logger.warning(
+            "Cron job metrics are kept in a per-process LocMemCache and will not reach /metrics; "
+            "set REDIS_URL or METRICS_MULTIPROC_DIR"
+        )
+    cache.set(_cron_key(job, "duration"), duration, timeout=CRON_CACHE_TIMEOUT)
+    cache.set(_cron_key(job, f"last_{status}"), time.time(), timeout=CRON_CACHE_TIMEOUT)
+    try:
+        cache.incr(_cron_key(job, status))
+    except ValueError:
+        cache.set(_cron_key(job, status), 1, timeout=CRON_CACHE_TIMEOUT)
+
+
+def cron_job(name):
+    """
+    Record the duration and outcome of each run of a cron job where the web processes
+    read them: METRICS_MULTIPROC_DIR when set, the shared cache otherwise.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            status = "failure"
+            try:
+                result = func(*args, **kwargs)
+                status = "success"
+                return result
+            finally:
+                _record_cron(name, time.monotonic() - started, status)
+        return wrapper
+    return decorator
+
+
+def _cron_values(fields):
+    if not settings.METRICS_MULTIPROC_DIR:
+        return cache.get_many([_cron_key(job, field) for job in CRON_JOBS for field in fields])
+    values = {}
+    for job in CRON_JOBS:
+        try:
+            recorded = json.loads(_cron_file(job).read_text())
+        except (OSError, ValueError):
+            continue
+        values.update({_cron_key(job, field): value for field, value in recorded.items()})
+    return values
+
+
+def _render_cron():
+    fields = ("duration", "last_success", "success", "failure")
+    values = _cron_values(fields)
+    series = [
+        ("cron_job_last_duration_seconds", "gauge", "Duration of the last run of a cron job.", "duration", {}),
+        ("cron_job_last_success_timestamp_seconds", "gauge", "Unix time of the last successful run.",
+         "last_success", {}),
+        ("cron_job_runs_total", "counter", "Cron job runs by outcome.", "success", {"status": "success"}),
+        ("cron_job_runs_total", "counter", None, "failure", {"status": "failure"}),
+    ]
+    lines = []
+    for name, kind, help, field, labels in series:
+        if help:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        for job in CRON_JOBS:
+            value = values.get(_cron_key(job, field))
+            if value is not None:
+                label_text = ",".join(f'{k}="{v}"' for k, v in dict(job=job, **labels).items())
+                lines.append(f"{name}{{{label_text}}} {_number(value)}")
+    return lines
+
+
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def _worker_file(directory):
+    return Path(directory) / f"metrics-{os.getpid()}.json"
+
+
+def flush():
+    """Write this process's metrics to METRICS_MULTIPROC_DIR (atomically replacing its previous file)."""
+    global _last_flush
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return
+    data = {metric.name: [[list(key), value] for key, value in metric.snapshot().items()] for metric in REGISTRY}
+    path = _worker_file(directory)
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps(data))
+    os.replace(temporary, path)
+    _last_flush = time.monotonic()
+
+
+def _maybe_flush():
+    # Cheap on the request path: at most one write per METRICS_FLUSH_SECONDS per process
+    if not settings.METRICS_MULTIPROC_DIR or time.monotonic() - _last_flush < settings.METRICS_FLUSH_SECONDS:
+        return
+    if _flush_lock.acquire(blocking=False):
+        try:
+            flush()
+        finally:
+            _flush_lock.release()
+
+
+def _collect():
+    # {metric name: {key: value}} summed over the files of every worker, this one flushed first
+    flush()
+    totals = {metric.name: {} for metric in REGISTRY}
+    merge = {metric.name: metric.merge for metric in REGISTRY}
+    for path in Path(settings.METRICS_MULTIPROC_DIR).glob("metrics-*.json"):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # replaced or removed while being read
+        for name, items in data.items():
+            if name not in totals:
+                continue
+            values = totals[name]
+            for key, value in items:
+                key = tuple(key)
+                values[key] = merge[name](values[key], value) if key in values else value
+    return totals
+
+
+def render():
+    totals = _collect() if settings.METRICS_MULTIPROC_DIR else {}
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render(totals.get(metric.name))
+    lines += _render_cron()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,141 @@
+import base64
+import heapq
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from graphene.relay import PageInfo
+from graphql import GraphQLError
+
+# Page size used when the client sends neither `first` nor `last`
+DEFAULT_PAGE_SIZE = 20
+# Upper bound for `first`/`last` so a single page stays cheap
+MAX_PAGE_SIZE = 100
+
+
+class Keyset:
+    """
+    Descending sort key for keyset ("seek") pagination.
+
+    Each key is a (lookup, attribute) pair: `lookup` is what the queryset is
+    filtered/ordered on, `attribute` is read from the returned objects to build
+    cursors. They differ when ordering on a joined column that mirrors a field
+    of the node, e.g. ("feed_entries__created_at", "created_at").
+    The last key must be unique (usually the primary key) to break ties.
+    """
+
+    def __init__(self, *keys):
+        self.keys = [key if isinstance(key, tuple) else (key, key) for key in keys]
+
+    def values(self, obj):
+        return tuple(getattr(obj, attr) for _, attr in self.keys)
+
+    def encode(self, obj):
+        raw = json.dumps([
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in self.values(obj)
+        ])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode(self, cursor, model):
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(raw, list) or len(raw) != len(self.keys):
+                raise ValueError(cursor)
+            return tuple(
+                self._to_python(model, attr, value)
+                for (_, attr), value in zip(self.keys, raw)
+            )
+        except (ValueError, TypeError, ValidationError):
+            raise GraphQLError("Invalid cursor")
+
+    def _to_python(self, model, attr, value):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            # Annotations (e.g. popularity scores) are stored as plain JSON values
+            return value
+        return field.to_python(value)
+
+    def order(self, queryset, ascending=False):
+        prefix = "" if ascending else "-"
+        return queryset.order_by(*[f"{prefix}{lookup}" for lookup, _ in self.keys])
+
+    def seek(self, queryset, values, ascending=False):
+        # (k1, k2) < (v1, v2) expanded to: k1 < v1 OR (k1 = v1 AND k2 < v2)
+        op = "gt" if ascending else "lt"
+        condition = Q()
+        for i, (lookup, _) in enumerate(self.keys):
+            prefix = {self.keys[j][0]: values[j] for j in range(i)}
+            condition |= Q(**prefix, **{f"{lookup}__{op}": values[i]})
+        return queryset.filter(condition)
+
+
+def _page_size(value, name):
+    if value is None:
+        return None
+    if value < 0:
+        raise GraphQLError(f"`{name}` must be a non-negative integer")
+    return min(value, MAX_PAGE_SIZE)
+
+
+def paginate(connection_type, sources, first=None, after=None,
+             last=None, before=None, node=None):
+    """
+    Build a Relay connection from `(queryset, keyset)` sources using keyset cursors.
+
+    Several sources are merged by sort key, which lets a page combine e.g. inbox
+    entries and fan-out-on-read posts; their keysets must yield the same values
+    for the same row. Only `size + 1` rows are read per source and no COUNT(*)
+    is issued.
+    """
+    first = _page_size(first, "first")
+    last = _page_size(last, "last")
+    backward = last is not None and first is None
+    size = last if backward else first
+    if size is None:
+        size = DEFAULT_PAGE_SIZE
+
+    keyset = sources[0][1]
+    model = sources[0][0].model
+    after_values = keyset.decode(after, model) if after else None
+    before_values = keyset.decode(before, model) if before else None
+
+    pages = []
+    for qs, qs_keyset in sources:
+        if after_values:
+            qs = qs_keyset.seek(qs, after_values)
+        if before_values:
+            qs = qs_keyset.seek(qs, before_values, ascending=True)
+        pages.append(qs_keyset.order(qs, ascending=backward)[: size + 1])
+
+    rows = pages[0] if len(pages) == 1 else heapq.merge(
+        *pages, key=keyset.values, reverse=not backward
+    )
+    rows = list(rows)[: size + 1]
+    has_more = len(rows) > size
+    rows = rows[:size]
+
+    if backward:
+        rows.reverse()
+        has_previous_page, has_next_page = has_more, before is not None
+    else:
+        has_previous_page, has_next_page = after is not None, has_more
+        if last is not None and len(rows) > last:
+            # Both `first` and `last` given: keep the tail of the forward page
+            rows = rows[-last:]
+            has_previous_page = True
+
+    edges = [
+        connection_type.Edge(node=node(row) if node else row, cursor=keyset.encode(row))
+        for row in rows
+    ]
+    return connection_type(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+        ),
+    )
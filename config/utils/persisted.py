@@ -0,0 +1,171 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from graphql import GraphQLError, parse
+from graphql.backend.base import GraphQLDocument
+from graphql.execution import execute
+from graphql.validation import validate
+
+# Shared cache key under which persisted query texts are registered
+PERSISTED_QUERY_KEY = "apq_{}"
+
+
+class PersistedQueryNotFound(GraphQLError):
+    def __init__(self):
+        super().__init__("PersistedQueryNotFound", extensions={"code": "PERSISTED_QUERY_NOT_FOUND"})
+
+
+class PersistedQueryNotSupported(GraphQLError):
+    def __init__(self):
+        super().__init__(
+            "PersistedQueryNotSupported", extensions={"code": "PERSISTED_QUERY_NOT_SUPPORTED"}
+        )
+
+
+class InvalidDocument(Exception):
+    """Raised when a query fails parsing or validation; carries the GraphQL errors."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class DocumentCache:
+    """
+    Thread-safe in-process LRU of parsed *and validated* documents, keyed by sha256.
+
+    Cached documents execute without re-running validation, so repeated
+    operations skip both parse and validate.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def set(self, key, document):
+        with self._lock:
+            self._documents[key] = document
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+    def compile(self, schema, query, key=None):
+        key = key or query_hash(query)
+        document = self.get(key)
+        if document is None:
+            try:
+                document_ast = parse(query)
+            except GraphQLError as e:
+                raise InvalidDocument([e])
+            errors = validate(schema, document_ast)
+            if errors:
+                raise InvalidDocument(errors)
+            document = GraphQLDocument(
+                schema=schema,
+                document_string=query,
+                document_ast=document_ast,
+                execute=partial(execute, schema, document_ast),
+            )
+            self.set(key, document)
+        return document
+
+
+document_cache = DocumentCache(settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+
+
+def _load_allowlist():
+    path = settings.GRAPHQL_PERSISTED_QUERIES_FILE
+    if not path:
+        return {}
+    # Manifest of {"<sha256>": "<query text>"} generated from the client operations
+    with open(path) as manifest:
+        return json.load(manifest)
+
+
+_allowlist = None
+
+
+def allowlist():
+    global _allowlist
+    if _allowlist is None:
+        _allowlist = _load_allowlist()
+    return _allowlist
+
+
+def persisted_hash(extensions):
+    # sha256Hash from an APQ request's `extensions.persistedQuery`, if any
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            return None
+    if not isinstance(extensions, dict):
+        return None
+    persisted = extensions.get("persistedQuery")
+    if not isinstance(persisted, dict) or persisted.get("version", 1) != 1:
+        return None
+    return persisted.get("sha256Hash")
+
+
+def resolve_query(query, sha256):
+    """
+    Turn the (query, hash) pair of a request into the query text to execute.
+
+    - hash only: look the text up in the allowlist or the shared registry,
+      raising PersistedQueryNotFound so the client retries with the full text;
+    - hash + text: check the hash and size of the text, which the caller
+      registers with `register_query` once it has validated;
+    - text only: accepted unless GRAPHQL_PERSISTED_QUERIES_ONLY is set, in which
+      case only texts from the allowlist are.
+    """
+    only_persisted = settings.GRAPHQL_PERSISTED_QUERIES_ONLY
+    if sha256:
+        known = allowlist().get(sha256)
+        if known is not None:
+            return known
+        if only_persisted:
+            # In allowlist mode clients cannot register new operations
+            raise PersistedQueryNotFound()
+        if not query:
+            query = cache.get(PERSISTED_QUERY_KEY.format(sha256))
+            if query is None:
+                raise PersistedQueryNotFound()
+            return query
+        if query_hash(query) != sha256:
+            raise GraphQLError("provided sha does not match query")
+        max_length = settings.GRAPHQL_PERSISTED_QUERY_MAX_LENGTH
+        if len(query) > max_length:
+            raise GraphQLError(f"persisted query exceeds the maximum of {max_length} characters")
+        return query
+
+    if query and only_persisted and query_hash(query) not in allowlist():
+        raise PersistedQueryNotSupported()
+    return query
+
+
+# Share a validated operation with the other workers for GRAPHQL_PERSISTED_QUERY_TTL seconds
+def register_query(sha256, query):
+    if sha256 in allowlist():
+        return
+    cache.set(PERSISTED_QUERY_KEY.format(sha256), query, timeout=settings.GRAPHQL_PERSISTED_QUERY_TTL)
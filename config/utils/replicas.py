@@ -0,0 +1,124 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Replica serving the reads of the GraphQL query running in this context (None: primary)
+current_replica = ContextVar("db_replica", default=None)
+
+# Seconds behind the primary, for a replica on streaming replication (0 once it has replayed
+# everything it received, NULL on a primary)
+LAG_SQL = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+_lags = {}
+_lags_lock = threading.Lock()
+
+
+class ReplicaRouter:
+    """
+    Send the reads of GraphQL query operations to a read replica, everything else to the primary.
+
+    Reads only leave the primary inside `route_operation` for a query, so
+    mutations, admin pages, cron jobs and management commands never see a
+    lagging copy. Writes always go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return current_replica.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+def _measure_lag(alias):
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        # No replication to measure (e.g. a SQLite copy used for local testing)
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+# Replication lag of a replica in seconds, re-measured at most every REPLICA_LAG_CHECK_SECONDS
+def replica_lag(alias):
+    now = time.monotonic()
+    with _lags_lock:
+        cached = _lags.get(alias)
+    if cached is not None and now - cached[1] < settings.REPLICA_LAG_CHECK_SECONDS:
+        return cached[0]
+    try:
+        lag = _measure_lag(alias)
+    except DatabaseError:
+        logger.warning("Read replica %s is unreachable; reading from the primary", alias, exc_info=True)
+        lag = float("inf")
+    with _lags_lock:
+        _lags[alias] = (lag, now)
+    return lag
+
+
+# A replica within REPLICA_MAX_LAG_SECONDS of the primary, or None to stay on the primary
+def choose_replica():
+    healthy = [
+        alias for alias in settings.DATABASE_REPLICAS
+        if replica_lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS
+    ]
+    return random.choice(healthy) if healthy else None
+
+
+def _pin_key(user):
+    return f"db_pinned_{user.pk}"
+
+
+# Keep a user's reads on the primary for REPLICA_PIN_SECONDS (read-your-writes), across processes
+def pin_to_primary(user):
+    cache.set(_pin_key(user), 1, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return cache.get(_pin_key(user)) is not None
+
+
+@contextmanager
+def route_operation(request, operation_type):
+    """Run one GraphQL operation on a replica (queries) or on the primary (everything else)."""
+    if not settings.DATABASE_REPLICAS:
+        yield None
+        return
+
+    user = getattr(request, "user", None)
+    authenticated = user is not None and user.is_authenticated
+    if operation_type == "mutation":
+        try:
+            yield None
+        finally:
+            if authenticated:
+                pin_to_primary(user)
+        return
+
+    alias = None
+    if operation_type == "query" and not (authenticated and is_pinned(user)):
+        alias = choose_replica()
+    token = current_replica.set(alias)
+    try:
+        yield alias
+    finally:
+        current_replica.reset(token)
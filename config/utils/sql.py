@@ -0,0 +1,95 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+
+def _to_python(field, value):
+    # Raw cursors skip the ORM's converters (SQLite hands back datetimes as text)
+    value = field.to_python(value)
+    if isinstance(value, datetime) and settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def _placeholder(field):
+    # Postgres types the literals of a SELECT list as text: cast them to the column type
+    if connection.vendor == "postgresql":
+        return f"%s::{field.cast_db_type(connection)}"
+    return "%s"
+
+
+def _instance(model, values, returning, row):
+    fields = {model._meta.get_field(name).attname: value for name, value in values.items()}
+    for name, value in zip(returning, row):
+        field = model._meta.get_field(name)
+        fields[field.attname] = _to_python(field, value)
+    return model(**fields)
+
+
+def insert_unique_many(model, fk, parent_ids, values, returning=("id",)):
+    """
+    Insert one row per id of `parent_ids` referencing it through the foreign key `fk`, in a
+    single statement:
+
+        INSERT INTO <table> (<fk>, <values>) SELECT <parent pk>, %s... FROM <parent>
+        WHERE <pk> IN (%s, ...) ON CONFLICT DO NOTHING RETURNING <fk>, <returning>
+
+    Returns the instances actually inserted: parent ids that do not exist, or
+    whose row a unique constraint already holds (even one committed by a
+    concurrent request a moment ago), are simply absent. Duplicates therefore
+    never raise IntegrityError. Needs ON CONFLICT and RETURNING (Postgres, SQLite 3.35+).
+    """
+    parent_ids = list(parent_ids)
+    if not parent_ids:
+        return []
+    meta = model._meta
+    qn = connection.ops.quote_name
+    fk_field = meta.get_field(fk)
+    parent = fk_field.related_model._meta
+    fields = [meta.get_field(name) for name in values]
+    columns = ", ".join(qn(field.column) for field in [fk_field] + fields)
+    placeholders = "".join(f", {_placeholder(field)}" for field in fields)
+    returned = ", ".join(qn(meta.get_field(name).column) for name in (fk, *returning))
+    sql = (
+        f"INSERT INTO {qn(meta.db_table)} ({columns}) "
+        f"SELECT {qn(parent.pk.column)}{placeholders} FROM {qn(parent.db_table)} "
+        f"WHERE {qn(parent.pk.column)} IN ({', '.join(['%s'] * len(parent_ids))}) "
+        f"ON CONFLICT DO NOTHING RETURNING {returned}"
+    )
+    params = [field.get_db_prep_save(values[field.name], connection) for field in fields] + parent_ids
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [_instance(model, dict(values, **{fk: row[0]}), returning, row[1:]) for row in rows]
+
+
+# Single-parent form of `insert_unique_many`: the new instance, or None if nothing was inserted
+def insert_unique(model, fk, parent_id, values, returning=("id",)):
+    rows = insert_unique_many(model, fk, [parent_id], values, returning)
+    return rows[0] if rows else None
+
+
+def delete_returning(model, filters, returning=("id",)):
+    """
+    `DELETE FROM <table> WHERE <col> = %s AND ... RETURNING <returning>` in a single statement.
+
+    Returns the deleted instance (filters plus returned columns), or None if
+    nothing matched. Meant for rows matched by a unique constraint.
+    """
+    meta = model._meta
+    qn = connection.ops.quote_name
+    fields = [meta.get_field(name) for name in filters]
+    where = " AND ".join(f"{qn(field.column)} = %s" for field in fields)
+    sql = (
+        f"DELETE FROM {qn(meta.db_table)} WHERE {where} "
+        f"RETURNING {', '.join(qn(meta.get_field(name).column) for name in returning)}"
+    )
+    params = [field.get_db_prep_value(filters[field.name], connection) for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return _instance(model, filters, returning, row)
@@ -0,0 +1,172 @@
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import QuerySet
+from promise import Promise
+
+from . import metrics
+
+logger = logging.getLogger("graphql.tracing")
+
+# Tracer of the GraphQL operation running in this context (None when not traced)
+current_tracer = ContextVar("graphql_tracer", default=None)
+
+# Bucket for queries issued outside any resolver, e.g. DataLoader batches dispatched later
+DEFERRED = "(deferred)"
+
+
+class Tracer:
+    """
+    Per-operation timings, aggregated by resolver path.
+
+    List indexes are dropped from paths (`posts.0.author` and `posts.1.author`
+    are both `posts.author`), so a trace stays small however many rows the
+    operation returns.
+    """
+
+    def __init__(self, operation_name=None, expose=False):
+        self.operation_name = operation_name
+        self.expose = expose
+        self.started = time.perf_counter()
+        self.duration = None
+        self.resolvers = {}
+        # Resolver stack per thread (root fields may resolve concurrently)
+        self._local = threading.local()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.caches = {}
+
+    @property
+    def stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _entry(self, path):
+        entry = self.resolvers.get(path)
+        if entry is None:
+            entry = self.resolvers[path] = {"count": 0, "time": 0.0, "max": 0.0, "sql_count": 0, "sql_time": 0.0}
+        return entry
+
+    def resolved(self, path, elapsed):
+        entry = self._entry(path)
+        entry["count"] += 1
+        entry["time"] += elapsed
+        entry["max"] = max(entry["max"], elapsed)
+
+    # connection.execute_wrapper hook: time each query and charge it to the running resolver
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_count += 1
+            self.sql_time += elapsed
+            entry = self._entry(self.stack[-1] if self.stack else DEFERRED)
+            entry["sql_count"] += 1
+            entry["sql_time"] += elapsed
+
+    def cache(self, name, hits, misses):
+        counts = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+        counts["hits"] += hits
+        counts["misses"] += misses
+
+    def as_dict(self):
+        return {
+            "operationName": self.operation_name,
+            "durationMs": _ms(self.duration),
+            "sql": {"count": self.sql_count, "durationMs": _ms(self.sql_time)},
+            "cache": self.caches,
+            "resolvers": [
+                {
+                    "path": path,
+                    "count": entry["count"],
+                    "durationMs": _ms(entry["time"]),
+                    "maxMs": _ms(entry["max"]),
+                    "sqlCount": entry["sql_count"],
+                    "sqlMs": _ms(entry["sql_time"]),
+                }
+                # Slowest first
+                for path, entry in sorted(self.resolvers.items(), key=lambda item: -item[1]["time"])
+            ],
+        }
+
+
+def _ms(seconds):
+    return round((seconds or 0) * 1000, 3)
+
+
+# Tracer for a GraphQL request: always when the debug header is sent (and allowed), else sampled
+def tracer_for(request, operation_name=None):
+    header = request.headers.get(settings.GRAPHQL_TRACING_HEADER)
+    user = getattr(request, "user", None)
+    expose = bool(header) and (settings.DEBUG or bool(user and user.is_staff))
+    if expose or random.random() < settings.GRAPHQL_TRACING_SAMPLE_RATE:
+        return Tracer(operation_name, expose=expose)
+    return None
+
+
+@contextmanager
+def wrap_connections(*wrappers):
+    """Install execute wrappers on every database connection of the current thread."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            for wrapper in wrappers:
+                stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+@contextmanager
+def trace(tracer):
+    """Run the enclosed execution under `tracer` (a no-op for None), then log it."""
+    if tracer is None:
+        yield None
+        return
+    token = current_tracer.set(tracer)
+    try:
+        with wrap_connections(tracer):
+            yield tracer
+    finally:
+        current_tracer.reset(token)
+        tracer.duration = time.perf_counter() - tracer.started
+        logger.info(json.dumps(tracer.as_dict()))
+
+
+# Cache lookups, counted in the metrics and in the current trace, e.g. record_cache("post", hits=18, misses=2)
+def record_cache(name, hits=0, misses=0):
+    metrics.record_cache(name, hits, misses)
+    tracer = current_tracer.get()
+    if tracer is not None:
+        tracer.cache(name, hits, misses)
+
+
+class TracingMiddleware:
+    """Graphene middleware timing every resolver of a traced operation."""
+
+    def resolve(self, next, root, info, **args):
+        tracer = current_tracer.get()
+        if tracer is None:
+            return next(root, info, **args)
+
+        path = ".".join(str(key) for key in info.path if not isinstance(key, int))
+        tracer.stack.append(path)
+        started = time.perf_counter()
+        try:
+            result = next(root, info, **args)
+            value = result.get() if isinstance(result, Promise) and result.is_fulfilled else result
+            if isinstance(value, QuerySet):
+                # Evaluate here (the executor would do it later) so the SQL is charged to this resolver
+                len(value)
+            return result
+        finally:
+            tracer.resolved(path, time.perf_counter() - started)
+            tracer.stack.pop()